@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+历史报告离线回补
+功能：按日期范围用进程池并行重新生成报告，正文来自发布时归档的行情和本地历史日线，
+封面按 config.json 中的 cover_encoder 设置编码；全程不联网、不发布，只把HTML和JPEG写入输出目录
+（<输出目录>/<YYYY-MM-DD>/<报告>[-<附加图文>].html / .jpg）。没有归档数据的日期跳过。
+
+用法: python backfill.py --start 2025-10-01 --end 2026-09-30 [--reports morning,evening] [--output backfill] [--workers 8] [--config config.json]
+"""
+
+import contextlib
+import html
+import io
+import os
+import time
+from datetime import date, timedelta
+
+from local_store import read_json, write_bytes
+
+
+DEFAULT_REPORTS = ['morning', 'evening']
+DEFAULT_OUTPUT = 'backfill'
+
+HTML_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+</head>
+<body>
+{content}
+</body>
+</html>
+"""
+
+# 工作进程内的发布器（每个进程按 配置+报告 各创建一次，共用字体、封面图层和历史库连接）
+_publishers = {}
+
+
+def _publisher(config_path, name):
+    from publisher import get_report_class, load_report_modules
+
+    key = (config_path, name)
+    if key not in _publishers:
+        load_report_modules((read_json(config_path, {}) or {}).get('report_modules', []))
+        _publishers[key] = get_report_class(name)(config_path)
+    return _publishers[key]
+
+
+def _file_stems(publisher):
+    """与图文一一对应的输出文件名（不含扩展名）"""
+    return [publisher.name] + [f"{publisher.name}-{article}" for article in publisher.extra_articles]
+
+
+def _render_day(job):
+    """进程池任务：离线生成某个报告某天的全部图文并写入输出目录，返回写入的图文数（跳过时为0）"""
+    config_path, name, day, output = job
+    with contextlib.redirect_stdout(io.StringIO()):
+        publisher = _publisher(config_path, name)
+        articles = publisher.render(day)
+    if not articles:
+        return 0
+    directory = os.path.join(output, day.isoformat())
+    for stem, article in zip(_file_stems(publisher), articles):
+        page = HTML_PAGE.format(title=html.escape(article['title']), content=article['content'])
+        write_bytes(os.path.join(directory, f"{stem}.html"), page.encode('utf-8'))
+        write_bytes(os.path.join(directory, f"{stem}.jpg"), article['cover'])
+    return len(articles)
+
+
+def backfill(reports, days, output=DEFAULT_OUTPUT, config_path='config.json', workers=None):
+    """
+    用进程池离线回补报告
+
+    Args:
+        reports: 报告类型名称列表
+        days: date 列表
+        output: 输出目录
+        config_path: 配置文件路径
+        workers: 进程数，默认CPU核数
+
+    Returns:
+        {报告名称: (生成的天数, 跳过的天数)}
+    """
+    # 进程池只在回补时需要，发布程序不导入本模块
+    from concurrent.futures import ProcessPoolExecutor
+
+    from cover_cache import date_label
+    from cover_encoder import CoverEncoder
+    from cover_renderer import render_cover
+    from publisher import get_report_class, load_report_modules
+
+    # 各封面主题的编码参数在主进程中选定并落盘一次，工作进程直接按缓存的参数编码；
+    # 主进程不创建发布器，避免把历史库连接带进fork出的工作进程
+    config = read_json(config_path, {}) or {}
+    load_report_modules(config.get('report_modules', []))
+    encoder = CoverEncoder.from_config(config)
+    themes = set()
+    for name in reports:
+        cls = get_report_class(name)
+        themes.add(cls.theme)
+        themes.update(cls.available_articles[article]['theme']
+                      for article in config.get(name, {}).get('articles', []) if article in cls.available_articles)
+    if days:
+        for theme in sorted(themes):
+            encoder.options_for(theme, render_cover(theme, date_label(days[0])))
+
+    jobs = [(config_path, name, day, output) for name in reports for day in days]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        counts = list(executor.map(_render_day, jobs, chunksize=max(1, len(jobs) // 64)))
+    results = {}
+    for (_, name, _, _), count in zip(jobs, counts):
+        rendered, skipped = results.get(name, (0, 0))
+        results[name] = (rendered + 1, skipped) if count else (rendered, skipped + 1)
+    return results
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="按日期范围离线回补报告（不联网、不发布）")
+    parser.add_argument('--start', required=True, help="开始日期 YYYY-MM-DD")
+    parser.add_argument('--end', default=None, help="结束日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument('--reports', default=','.join(DEFAULT_REPORTS), help="逗号分隔的报告类型")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f"输出目录（默认 {DEFAULT_OUTPUT}）")
+    parser.add_argument('--workers', type=int, default=None, help="进程数（默认CPU核数）")
+    parser.add_argument('--config', default='config.json', help="配置文件路径")
+    args = parser.parse_args(argv)
+
+    try:
+        start = date.fromisoformat(args.start)
+        end = date.fromisoformat(args.end) if args.end else date.today()
+    except ValueError as e:
+        parser.error(f"无效的日期: {e}")
+    reports = [name.strip() for name in args.reports.split(',') if name.strip()]
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+    began = time.perf_counter()
+    try:
+        results = backfill(reports, days, args.output, args.config, args.workers)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 2
+    elapsed = time.perf_counter() - began
+    total = sum(rendered for rendered, _ in results.values())
+    print(f"✓ 回补完成：{len(days)}天 × {len(reports)}种报告，生成{total}份，耗时{elapsed:.1f}秒"
+          f"（{total / elapsed if elapsed else 0:.1f}份/秒）")
+    for name, (rendered, skipped) in results.items():
+        print(f"  {name}: 生成{rendered}天，无归档数据跳过{skipped}天")
+    print(f"  输出目录: {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
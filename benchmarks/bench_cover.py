@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+封面渲染基准测试
+对比旧版逐行绘制渐变的渲染方式与缓存图层渲染引擎的单张封面耗时
+
+用法: python benchmarks/bench_cover.py [渲染次数]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageChops, ImageDraw, Image  # noqa: E402
+
+import cover_renderer  # noqa: E402
+
+
+def legacy_text(draw, width, y, text, font, fill, shadow_offset):
+    """旧版文字绘制：每次测量边框，阴影和正文各光栅化一次"""
+    bbox = draw.textbbox((0, 0), text, font=font)
+    x = (width - (bbox[2] - bbox[0])) // 2
+    draw.text((x + shadow_offset, y + shadow_offset), text, font=font, fill=(0, 0, 0))
+    draw.text((x, y), text, font=font, fill=fill)
+
+
+def legacy_render(theme_name, date_str, fonts):
+    """旧版渲染流程：720次 draw.rectangle + 每次重绘装饰和标题"""
+    theme = cover_renderer.THEMES[theme_name]
+    title_font, date_font, _ = fonts
+    width, height = cover_renderer.COVER_SIZE
+    image = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(image)
+    for y in range(height):
+        draw.rectangle([(0, y), (width, y+1)], fill=theme.row_color(y, height))
+    for decorate in theme.decorations:
+        decorate(draw, theme, width, height)
+    legacy_text(draw, width, 250, theme.title, title_font, theme.accent_color, 3)
+    legacy_text(draw, width, 420, date_str, date_font, (255, 255, 255), 2)
+    return image
+
+
+def measure(func, rounds):
+    """返回每次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for i in range(rounds):
+        func(i)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    fonts = cover_renderer.load_cover_fonts()
+
+    print("="*60)
+    print(f"封面渲染基准测试（每项 {rounds} 次，尺寸 {cover_renderer.COVER_SIZE}）")
+    print("="*60)
+
+    for theme_name in cover_renderer.THEMES:
+        dates = [f"2026年{m:02d}月{d:02d}日" for m in range(1, 13) for d in range(1, 29)]
+
+        # 结果一致性检查
+        cover_renderer.clear_cache()
+        diff = ImageChops.difference(legacy_render(theme_name, dates[0], fonts),
+                                     cover_renderer.render_cover(theme_name, dates[0], fonts))
+        identical = diff.getbbox() is None
+
+        before = measure(lambda i: legacy_render(theme_name, dates[i % len(dates)], fonts), rounds)
+        cover_renderer.clear_cache()
+        cold_start = time.perf_counter()
+        cover_renderer.render_cover(theme_name, dates[0], fonts)
+        cold = (time.perf_counter() - cold_start) * 1000
+        after = measure(lambda i: cover_renderer.render_cover(theme_name, dates[i % len(dates)], fonts), rounds)
+
+        print(f"\n主题: {theme_name}（像素一致: {'是' if identical else '否'}）")
+        print(f"  旧版逐行绘制:   {before:8.2f} ms/张")
+        print(f"  引擎首次(冷):   {cold:8.2f} ms/张")
+        print(f"  引擎缓存(热):   {after:8.2f} ms/张")
+        print(f"  加速比:         {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
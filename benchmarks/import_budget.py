@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+启动导入耗时检查
+功能：用 `python -X importtime` 在子进程中测量各入口（cli.py 子命令、两个发布模块）自身的导入耗时，
+超出预算或导入了不该加载的重依赖（PIL、requests）时以退出码1结束。解释器启动本身的导入（site等）不计入。
+
+用法:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --scale 2      # 较慢的机器上放宽预算
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 不需要绘图和网络的入口不应加载的模块
+HEAVY = ('PIL', 'requests')
+
+# (名称, 解释器参数, 预算ms, 不应导入的模块)
+CASES = [
+    ('cli --help', ['cli.py', '--help'], 25, HEAVY),
+    ('cli check', ['cli.py', 'check'], 25, HEAVY),
+    ('cli schedule --list', ['cli.py', 'schedule', '--list'], 50, HEAVY),
+    ('import morning_report_publisher', ['-c', 'import morning_report_publisher'], 100, HEAVY),
+    ('import market_report_publisher', ['-c', 'import market_report_publisher'], 100, HEAVY),
+]
+
+
+def import_profile(args):
+    """
+    运行一次 -X importtime
+
+    Returns:
+        [(模块名, 累计耗时us, 是否为顶层导入)]
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(cumulative), not name[1:].startswith(' ')))
+    return entries
+
+
+def measure(args, baseline, repeat):
+    """返回 (最小导入耗时ms, 导入的全部模块)；只统计解释器启动之外的顶层导入"""
+    best, modules = None, set()
+    for _ in range(repeat):
+        entries = import_profile(args)
+        total = sum(cumulative for name, cumulative, top in entries if top and name not in baseline)
+        best = total if best is None else min(best, total)
+        modules.update(name for name, _, _ in entries)
+    return best / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动导入耗时检查")
+    parser.add_argument('--repeat', type=int, default=5, help="每个入口测量次数（取最小值）")
+    parser.add_argument('--scale', type=float, default=1.0, help="预算倍数")
+    args = parser.parse_args()
+
+    baseline = {name for name, _, top in import_profile(['-c', 'pass']) if top}
+    print("="*60)
+    print(f"启动导入耗时检查（{len(CASES)} 个入口，预算倍数 {args.scale:g}）")
+    print("="*60)
+    problems = []
+    for name, case_args, budget_ms, forbidden in CASES:
+        elapsed_ms, modules = measure(case_args, baseline, args.repeat)
+        budget_ms *= args.scale
+        loaded = sorted(module for module in forbidden if module in modules)
+        status = "✓" if elapsed_ms <= budget_ms and not loaded else "✗"
+        print(f"  {status} {name:<32} {elapsed_ms:7.1f} ms（预算 {budget_ms:.0f} ms）")
+        if elapsed_ms > budget_ms:
+            problems.append(f"{name}: 导入耗时 {elapsed_ms:.1f} ms，超出预算 {budget_ms:.0f} ms")
+        if loaded:
+            problems.append(f"{name}: 不应导入 {', '.join(loaded)}")
+
+    if problems:
+        print("\n✗ 超出导入预算：")
+        for line in problems:
+            print(f"  {line}")
+        return 1
+    print("\n✓ 所有入口均在导入预算内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
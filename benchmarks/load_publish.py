@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+发布链路压测
+功能：启动本地微信替身服务（可注入延迟分布、45009频率限制、40001/42001 token失效和连接中断），
+多个并发发布器反复创建草稿，统计吞吐、尾延迟、各类故障次数以及限流重放和token刷新次数。全程离线运行。
+
+用法:
+    python benchmarks/load_publish.py --workers 8 --duration 10 --latency lognormal:0.05:0.5
+    python benchmarks/load_publish.py --rate-limit 0.05 --invalid-token 0.01 --drop 0.01
+    python benchmarks/load_publish.py --per-second 20     # 按每秒20次的额度平滑草稿请求
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run_benchmarks import BenchEnv, quiet  # noqa: E402
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="发布链路压测")
+    parser.add_argument('--report', choices=['evening', 'morning'], default='evening')
+    parser.add_argument('--workers', type=int, default=8, help="并发发布器数量")
+    parser.add_argument('--duration', type=float, default=10.0, help="压测时长（秒）")
+    parser.add_argument('--latency', default='lognormal:0.05:0.5',
+                        help="替身服务延迟分布：秒数 / uniform:最小:最大 / lognormal:中位数:sigma")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="45009 频率限制概率")
+    parser.add_argument('--invalid-token', type=float, default=0.0, help="40001 token吊销概率")
+    parser.add_argument('--drop', type=float, default=0.0, help="连接中断概率")
+    parser.add_argument('--per-second', type=float, default=None,
+                        help="草稿接口的每秒额度（默认不限速，见 wechat_api.py）")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    quotas = None
+    if args.per_second:
+        quotas = {'/cgi-bin/draft/add': {'daily': None, 'per_second': args.per_second}}
+    env = BenchEnv(wechat_latency=args.latency, wechat_faults={
+        'rate_limit': args.rate_limit, 'invalid_token': args.invalid_token,
+        'drop': args.drop, 'seed': args.seed,
+    }, wechat_quotas=quotas)
+    samples = []
+    outcomes = {'success': 0, 'failure': 0}
+    guard = threading.Lock()
+
+    def worker(publisher, content, media_id, deadline):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            ok = publisher.create_wechat_draft("压测草稿", content, media_id)
+            elapsed = (time.perf_counter() - start) * 1000
+            with guard:
+                samples.append(elapsed)
+                outcomes['success' if ok else 'failure'] += 1
+
+    try:
+        template = env.evening if args.report == 'evening' else env.morning
+        publishers = [type(template)(env.config_path) for _ in range(args.workers)]
+        with quiet():
+            content = template._generate_content(*(env.evening_data if args.report == 'evening'
+                                                   else env.morning_data), date.today())
+            for publisher in publishers:
+                publisher.get_wechat_access_token()
+            cover = template.generate_cover_image(env.date_str)
+            template.get_wechat_access_token()
+            media_id = template.upload_image_to_wechat(cover)
+        if not media_id:
+            print("✗ 封面上传失败，无法压测")
+            return 1
+
+        print(f"压测 {args.report}：{args.workers} 个并发发布器，{args.duration:.0f} 秒，延迟分布 {args.latency}")
+        started = time.perf_counter()
+        deadline = started + args.duration
+        threads = [threading.Thread(target=worker, args=(publisher, content, media_id, deadline))
+                   for publisher in publishers]
+        # redirect_stdout 作用于整个进程，只在主线程中切换一次
+        with quiet():
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+        fault_counts = dict(env.wechat_server.fault_counts)
+        headroom = template.wechat.headroom('wxbenchmark')
+    finally:
+        env.close()
+
+    samples.sort()
+    total = len(samples)
+    print(f"\n请求数: {total}（成功 {outcomes['success']}，失败 {outcomes['failure']}）")
+    print(f"吞吐: {outcomes['success'] / elapsed:.1f} 草稿/秒")
+    print(f"延迟: p50 {percentile(samples, 0.5):.1f}ms  p90 {percentile(samples, 0.9):.1f}ms  "
+          f"p99 {percentile(samples, 0.99):.1f}ms  max {samples[-1] if samples else 0:.1f}ms")
+    print(f"注入故障: {json.dumps(fault_counts, ensure_ascii=False)}")
+    for row in headroom:
+        print(f"{row['path']}: 调用{row['calls']}次，排队{row['waited']:.1f}秒，"
+              f"限流重放{row['limited']}次，刷新token{row['refreshed']}次")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+发布流程基准测试套件
+功能：对封面生成、报告渲染、草稿请求体编码（微基准）以及早报/晚报完整发布流程
+（端到端，连接本地行情替身和微信替身服务）测量耗时和峰值内存，
+结果可保存为JSON基线，再次运行时与基线对比，超过阈值即判定为性能回退（退出码1）。
+全程离线运行。
+
+用法:
+    python benchmarks/run_benchmarks.py                   # 运行并与基线对比
+    python benchmarks/run_benchmarks.py --save-baseline   # 运行并保存为基线
+    python benchmarks/run_benchmarks.py -k report --rounds 50
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+# 峰值内存差异小于该值（KB）时不判定为回退，避免小对象分配的抖动
+MEMORY_NOISE_KB = 64
+
+CASES = []
+
+
+def case(name, kind='micro'):
+    """登记基准用例：被装饰函数接收 BenchEnv，返回每轮调用的无参函数"""
+    def register(factory):
+        CASES.append((name, kind, factory))
+        return factory
+    return register
+
+
+class BenchEnv:
+    """基准测试环境：临时缓存目录、本地替身服务和两个发布器实例"""
+
+    def __init__(self, wechat_latency=0.0, market_latency=0.0, wechat_faults=None, wechat_quotas=None):
+        self.workdir = tempfile.mkdtemp(prefix='mip-bench-')
+        self.previous_cwd = os.getcwd()
+        os.environ['MIP_CACHE_DIR'] = os.path.join(self.workdir, 'cache')
+        os.chdir(self.workdir)
+
+        import market_data_stub
+        import wechat_stub
+        self.market_server, market_base = market_data_stub.start_stub_server(latency=market_latency)
+        self.wechat_server, wechat_base = wechat_stub.start_stub_server(latency=wechat_latency,
+                                                                        **(wechat_faults or {}))
+
+        import market_report_publisher
+        import morning_report_publisher
+        from wechat_api import DEFAULT_QUOTAS
+
+        self.config_path = os.path.join(self.workdir, 'config.json')
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                # 替身服务没有调用额度，默认不限速（见 wechat_api.py）
+                'wechat': {'appid': 'wxbenchmark', 'secret': 'benchmark', 'api_base': wechat_base,
+                           'quotas': wechat_quotas or {path: None for path in DEFAULT_QUOTAS}},
+                'aliyun': {'api_key': 'benchmark'},
+                # 端到端用例每轮都重新采集行情，不复用上一轮的结果
+                'data_sources': {'eastmoney_base': market_base, 'eastmoney_his_base': market_base,
+                                 'sina_base': market_base, 'share_seconds': 0},
+            }, f)
+
+        with quiet():
+            self.evening = market_report_publisher.MarketReportPublisher(self.config_path)
+            self.morning = morning_report_publisher.MorningReportPublisher(self.config_path)
+            self.evening_data = (self.evening.fetch_market_data(), self.evening.fetch_history())
+            self.morning_data = (self.morning.fetch_market_data(), self.morning.fetch_history())
+        self.date_str = datetime.now().strftime("%Y年%m月%d日")
+
+    def close(self):
+        self.market_server.shutdown()
+        self.wechat_server.shutdown()
+        os.chdir(self.previous_cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽发布器的过程输出"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+# ------------------------------------------------------------ 用例
+
+@case('cover.evening')
+def bench_cover_evening(env):
+    return lambda: env.evening.generate_cover_image(env.date_str)
+
+
+@case('cover.morning')
+def bench_cover_morning(env):
+    return lambda: env.morning.generate_cover_image(env.date_str)
+
+
+@case('report.evening')
+def bench_report_evening(env):
+    return lambda: env.evening.generate_market_report(*env.evening_data)
+
+
+@case('report.morning')
+def bench_report_morning(env):
+    return lambda: env.morning.generate_morning_report(*env.morning_data)
+
+
+@case('rank.boards')
+def bench_rank_boards(env):
+    # 5000个板块/个股的全量快照，取涨跌幅和主力净流入的前后10名
+    import random
+
+    from market_data import Quote
+    from ranking import RankTable, negative, positive
+
+    rng = random.Random(0)
+    records = [Quote(f"BK{i:04d}", f"板块{i}", 1000.0, round(rng.gauss(0, 2), 2), None,
+                     rng.gauss(0, 5e8) if i % 10 else None) for i in range(5000)]
+
+    def rank():
+        table = RankTable.from_records(records)
+        return (table.top(10, 'change_pct', where={'change_pct': positive}),
+                table.bottom(10, 'change_pct', where={'change_pct': negative}),
+                table.top(10, 'net_inflow', where={'change_pct': positive}, tie_break=('change_pct',)),
+                table.bottom(10, 'net_inflow', where={'change_pct': negative}))
+    return rank
+
+
+@case('payload.evening')
+def bench_payload_evening(env):
+    content = env.evening.generate_market_report(*env.evening_data)
+    return lambda: env.evening._draft_payload(f"{env.date_str} 行情晚报", content, 'BENCH_MEDIA_ID')
+
+
+@case('payload.morning')
+def bench_payload_morning(env):
+    content = env.morning.generate_morning_report(*env.morning_data)
+    return lambda: env.morning._draft_payload(f"{env.date_str} 行情早报", content, 'BENCH_MEDIA_ID')
+
+
+def _publish(publisher):
+    def run():
+        # 共享HTTP客户端的调用记录会随轮次累积，每轮清空以免影响内存统计
+        publisher.http.records.clear()
+        # 每轮都完整发布一次，不沿用运行日志中已完成的阶段
+        if not publisher.run(fresh=True):
+            raise RuntimeError("发布流程失败")
+    return run
+
+
+@case('publish.evening', kind='e2e')
+def bench_publish_evening(env):
+    return _publish(env.evening)
+
+
+@case('publish.morning', kind='e2e')
+def bench_publish_morning(env):
+    return _publish(env.morning)
+
+
+# ------------------------------------------------------------ 测量与对比
+
+def measure(func, rounds, warmup=1, min_sample_ms=5.0):
+    """
+    测量耗时和峰值内存
+
+    单次调用过快的用例每个样本循环多次（类似timeit的自动校准），
+    峰值内存为 tracemalloc 统计的Python堆峰值，不含PIL等C扩展的分配。
+
+    Returns:
+        {'rounds', 'number', 'median_ms', 'p95_ms', 'min_ms', 'peak_kb'}
+    """
+    with quiet():
+        for _ in range(warmup):
+            func()
+        start = time.perf_counter()
+        func()
+        once_ms = (time.perf_counter() - start) * 1000
+        number = max(1, int(min_sample_ms / max(once_ms, 1e-3)))
+
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) * 1000 / number)
+
+        # 峰值内存单独测一轮（tracemalloc 会拖慢执行，不计入耗时）
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    samples.sort()
+    return {
+        'rounds': rounds,
+        'number': number,
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        'min_ms': round(samples[0], 4),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    与基线对比
+
+    Returns:
+        回退说明列表，为空表示没有回退
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if current['median_ms'] > base['median_ms'] * (1 + threshold):
+            regressions.append(f"{name}: 耗时 {base['median_ms']:.3f}ms -> {current['median_ms']:.3f}ms")
+        if (current['peak_kb'] > base['peak_kb'] * (1 + threshold)
+                and current['peak_kb'] - base['peak_kb'] > MEMORY_NOISE_KB):
+            regressions.append(f"{name}: 峰值内存 {base['peak_kb']:.0f}KB -> {current['peak_kb']:.0f}KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="发布流程基准测试")
+    parser.add_argument('-k', dest='pattern', default='', help="只运行名称包含该字符串的用例")
+    parser.add_argument('--rounds', type=int, default=None,
+                        help="每个用例的测量轮数（默认微基准30轮、端到端5轮）")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="回退阈值（相对基线的增幅，默认0.25）")
+    parser.add_argument('--output', help="把本次结果另存为JSON")
+    parser.add_argument('--wechat-latency', type=float, default=0.0, help="微信替身服务每次响应的延迟（秒）")
+    args = parser.parse_args()
+
+    selected = [(name, kind, factory) for name, kind, factory in CASES if args.pattern in name]
+    print("="*60)
+    print(f"发布流程基准测试（{len(selected)} 个用例，Python {platform.python_version()}）")
+    print("="*60)
+
+    env = BenchEnv(wechat_latency=args.wechat_latency)
+    results = {}
+    try:
+        for name, kind, factory in selected:
+            rounds = args.rounds or (30 if kind == 'micro' else 5)
+            with quiet():
+                func = factory(env)
+            results[name] = dict(measure(func, rounds), kind=kind)
+            r = results[name]
+            print(f"  {name:<18} {r['median_ms']:9.3f} ms（p95 {r['p95_ms']:.3f}，min {r['min_ms']:.3f}）"
+                  f"  Python堆峰值 {r['peak_kb']:8.1f} KB")
+    finally:
+        env.close()
+
+    report = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                 'created_at': datetime.now().isoformat(timespec='seconds')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ 基线已保存: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\n⚠ 未找到基线文件，使用 --save-baseline 生成")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n✗ 性能回退（阈值 {args.threshold:.0%}）：")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\n✓ 未发现性能回退（阈值 {args.threshold:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+统一命令行入口
+功能：用子命令发布早报/晚报（或在一个进程内依次发布任意几种报告）、离线回补历史报告、启动常驻调度、检查字体和打包技能；每个子命令只导入自己需要的模块
+（PIL、requests 等较重的依赖在真正用到时才加载），启动时先检查依赖是否已安装，缺失时给出安装命令。
+
+用法:
+    python cli.py morning [--config config.json] [--fresh] [--date YYYY-MM-DD]
+    python cli.py evening [--config config.json] [--fresh] [--date YYYY-MM-DD]
+    python cli.py run <report> [<report> ...] [--config config.json] [--fresh] [--date YYYY-MM-DD]
+    python cli.py backfill --start YYYY-MM-DD [--end YYYY-MM-DD] [--reports morning,evening] [--output backfill] [--workers 8]
+    python cli.py schedule [--config config.json] [--list]
+    python cli.py fonts [--refresh] [--test]
+    python cli.py package <skill_directory> [output_directory]
+    python cli.py check
+"""
+
+import argparse
+import importlib.util
+import sys
+
+
+# 模块名 -> pip 包名
+PACKAGES = {
+    'requests': 'requests',
+    'PIL': 'Pillow',
+}
+
+# 各子命令需要的第三方模块
+COMMAND_DEPENDENCIES = {
+    'morning': ('requests', 'PIL'),
+    'evening': ('requests', 'PIL'),
+    'run': ('requests', 'PIL'),
+    'backfill': ('requests', 'PIL'),
+    'schedule': ('requests', 'PIL'),
+    'fonts': ('PIL',),
+    'package': (),
+    'check': tuple(PACKAGES),
+}
+
+
+def missing_dependencies(modules):
+    """返回未安装的模块（只查找，不导入）"""
+    return [module for module in modules if importlib.util.find_spec(module) is None]
+
+
+def check_dependencies(command):
+    """检查子命令的依赖，全部已安装时返回True，否则打印安装命令"""
+    missing = missing_dependencies(COMMAND_DEPENDENCIES[command])
+    if not missing:
+        return True
+    packages = " ".join(PACKAGES[module] for module in missing)
+    print(f"✗ 缺少依赖: {', '.join(missing)}")
+    print(f"请先安装: pip install {packages}")
+    return False
+
+
+def _day(text):
+    """argparse 类型：YYYY-MM-DD 格式的日期"""
+    from datetime import date
+
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的日期: {text}（格式 YYYY-MM-DD）") from None
+
+
+def _publish(args):
+    from publisher import run_reports
+
+    names = args.reports if args.command == 'run' else [args.command]
+    try:
+        results = run_reports(names, args.config, fresh=args.fresh, as_of=args.date)
+    except FileNotFoundError:
+        print(f"✗ 错误：找不到配置文件 {args.config}")
+        print("请先填写配置文件中的微信公众号和阿里云API信息")
+        return 1
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 2
+    if len(results) > 1:
+        print("\n" + "，".join(f"{name} {'✓' if success else '✗'}" for name, success in results.items()))
+    return 0 if all(results.values()) else 1
+
+
+def _backfill(args):
+    import backfill
+
+    argv = ['--start', args.start, '--reports', args.reports, '--output', args.output, '--config', args.config]
+    argv += ['--end', args.end] if args.end else []
+    argv += ['--workers', str(args.workers)] if args.workers else []
+    return backfill.main(argv)
+
+
+def _schedule(args):
+    import scheduler
+
+    if args.list:
+        scheduler.print_upcoming(args.config)
+        return 0
+    return scheduler.serve_forever(args.config)
+
+
+def _fonts(args):
+    import font_checker
+
+    font_checker.main([flag for flag, enabled in (('--refresh', args.refresh), ('--test', args.test))
+                       if enabled])
+    return 0
+
+
+def _package(args):
+    import package_skill
+
+    package_skill.main([args.skill_dir] + ([args.output_dir] if args.output_dir else []))
+    return 0
+
+
+def _check(args):
+    print("✓ 依赖已全部安装")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="金融行情早报+晚报 自动发布系统")
+    commands = parser.add_subparsers(dest='command', metavar='<command>')
+    commands.required = True
+
+    for name, help_text in (('morning', "生成并发布早报"), ('evening', "生成并发布晚报")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--config', default='config.json', help="配置文件路径")
+        command.add_argument('--fresh', action='store_true', help="忽略今天的运行日志，从头重新发布")
+        command.add_argument('--date', type=_day, default=None, help="报告日期 YYYY-MM-DD（默认今天，历史日期使用归档行情）")
+        command.set_defaults(handler=_publish)
+
+    command = commands.add_parser('run', help="在同一进程内依次发布多种报告（共用连接池、token、字体和行情）")
+    command.add_argument('reports', nargs='+', metavar='report',
+                         help="报告类型（内置: morning、evening、sectors；可用 config.json 的 report_modules 扩展）")
+    command.add_argument('--config', default='config.json', help="配置文件路径")
+    command.add_argument('--fresh', action='store_true', help="忽略今天的运行日志，从头重新发布")
+    command.add_argument('--date', type=_day, default=None, help="报告日期 YYYY-MM-DD（默认今天，历史日期使用归档行情）")
+    command.set_defaults(handler=_publish)
+
+    command = commands.add_parser('backfill', help="按日期范围离线回补报告HTML和封面（不联网、不发布，见 backfill.py）")
+    command.add_argument('--start', required=True, help="开始日期 YYYY-MM-DD")
+    command.add_argument('--end', default=None, help="结束日期 YYYY-MM-DD（默认今天）")
+    command.add_argument('--reports', default='morning,evening', help="逗号分隔的报告类型")
+    command.add_argument('--output', default='backfill', help="输出目录")
+    command.add_argument('--workers', type=int, default=None, help="进程数（默认CPU核数）")
+    command.add_argument('--config', default='config.json', help="配置文件路径")
+    command.set_defaults(handler=_backfill)
+
+    command = commands.add_parser('schedule', help="常驻进程定时发布（见 scheduler.py）")
+    command.add_argument('--config', default='config.json', help="配置文件路径")
+    command.add_argument('--list', action='store_true', help="只列出各任务接下来的触发时间")
+    command.set_defaults(handler=_schedule)
+
+    command = commands.add_parser('fonts', help="检查中文字体")
+    command.add_argument('--refresh', action='store_true', help="重建字体索引")
+    command.add_argument('--test', action='store_true', help="用第一个可用字体进行渲染测试")
+    command.set_defaults(handler=_fonts)
+
+    command = commands.add_parser('package', help="打包技能目录为 .skill 文件")
+    command.add_argument('skill_dir', help="技能目录")
+    command.add_argument('output_dir', nargs='?', help="输出目录（默认技能目录的上级目录）")
+    command.set_defaults(handler=_package)
+
+    command = commands.add_parser('check', help="只检查依赖是否已安装")
+    command.set_defaults(handler=_check)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not check_dependencies(args.command):
+        return 2
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+封面归档
+功能：封面在内存中编码后直接上传，不再写入工作目录；需要留存时在 config.json 的
+cover_archive 中配置归档目录，并按保留天数和保留数量自动清理旧文件。
+"""
+
+import os
+import time
+
+
+class CoverArchive:
+    """封面归档目录"""
+
+    def __init__(self, directory, keep_days=30, keep_count=None):
+        """
+        Args:
+            directory: 归档目录
+            keep_days: 保留天数，超过的文件在每次归档后删除（None表示不按天数清理）
+            keep_count: 最多保留的文件数（None表示不限）
+        """
+        self.directory = directory
+        self.keep_days = keep_days
+        self.keep_count = keep_count
+
+    @classmethod
+    def from_config(cls, config):
+        """config.json 配置了 cover_archive.dir 时返回归档，否则返回None（不落盘）"""
+        settings = config.get('cover_archive') or {}
+        if not settings.get('dir'):
+            return None
+        return cls(settings['dir'], settings.get('keep_days', 30), settings.get('keep_count'))
+
+    def save(self, name, data):
+        """写入一张封面并按保留策略清理，返回文件路径"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.prune()
+        return path
+
+    def prune(self):
+        """删除超出保留策略的封面，返回删除的文件数"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.is_file() and entry.name.endswith('.jpg')]
+        except FileNotFoundError:
+            return 0
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+
+        expired = []
+        if self.keep_count is not None:
+            expired.extend(entries[self.keep_count:])
+            entries = entries[:self.keep_count]
+        if self.keep_days is not None:
+            cutoff = time.time() - self.keep_days * 86400
+            expired.extend(entry for entry in entries if entry.stat().st_mtime < cutoff)
+
+        removed = 0
+        for entry in expired:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+封面预渲染缓存
+功能：封面只取决于主题和日期，可以提前用进程池按日期范围、主题批量渲染，
+按 config.json 中的 cover_encoder 设置编码后写入缓存目录；run() 生成封面时先查缓存，命中则跳过渲染。
+
+用法: python cover_cache.py --start 2026-03-01 --end 2026-03-31 [--themes morning,evening] [--workers 8] [--config config.json]
+"""
+
+import hashlib
+import os
+import time
+from datetime import date, timedelta
+
+from cover_encoder import CoverEncoder
+from font_index import select_cover_fonts
+from local_store import cache_path, read_json, write_bytes
+
+
+# 渲染结果格式变化（尺寸、绘制逻辑）时递增，使旧缓存失效；编码参数变化由编码器标识区分
+RENDER_VERSION = 1
+
+# 缓存文件超过该天数未更新时由 prune 清理
+MAX_AGE_DAYS = 90
+
+
+def date_label(day):
+    """封面上的日期文字，与 run() 中的 date_str 一致"""
+    return day.strftime("%Y年%m月%d日")
+
+
+def _font_signature():
+    """当前会被选中的字体（字体变化后缓存自动失效）"""
+    title_candidates, date_candidates = select_cover_fonts()
+    return "|".join(f"{faces[0]['path']}#{faces[0]['index']}" if faces else "default"
+                    for faces in (title_candidates, date_candidates))
+
+
+class CoverCache:
+    """按 主题+日期+字体+编码配置 寻址的封面缓存"""
+
+    def __init__(self, directory=None, encoder=None):
+        """
+        Args:
+            directory: 缓存目录，默认为缓存目录下的 covers
+            encoder: CoverEncoder，默认使用默认编码配置
+        """
+        self.directory = directory or cache_path('covers')
+        self.encoder = encoder or CoverEncoder()
+
+    def path(self, theme, date_str):
+        key = f"{RENDER_VERSION}|{self.encoder.signature}|{theme}|{date_str}|{_font_signature()}"
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{theme}-{digest}.jpg")
+
+    def get(self, theme, date_str):
+        """返回缓存的封面JPEG字节，未命中返回None"""
+        try:
+            with open(self.path(theme, date_str), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, theme, date_str, data):
+        write_bytes(self.path(theme, date_str), data)
+
+    def prune(self, max_age_days=MAX_AGE_DAYS):
+        """删除过旧的缓存文件，返回删除的数量"""
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if entry.name.endswith('.jpg') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+
+def _render_into_cache(job):
+    """进程池任务：渲染一张封面并写入缓存（每个进程各自缓存字体和图层）"""
+    from cover_renderer import encode_cover, render_cover
+
+    path, theme, date_str, options, force = job
+    if not force and os.path.exists(path):
+        return False
+    write_bytes(path, encode_cover(render_cover(theme, date_str), **options))
+    return True
+
+
+def prerender(themes, days, workers=None, force=False, directory=None, encoder=None):
+    """
+    用进程池批量预渲染封面
+
+    Args:
+        themes: 主题名称列表（见 cover_renderer.THEMES）
+        days: date 列表
+        workers: 进程数，默认CPU核数
+        force: 为True时覆盖已缓存的封面
+        encoder: CoverEncoder，默认使用默认编码配置
+
+    Returns:
+        新渲染的封面数量
+    """
+    # 进程池只在预渲染时需要，发布程序导入本模块时不加载 multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    from cover_renderer import render_cover
+
+    cache = CoverCache(directory, encoder)
+    # 各主题的编码参数在主进程中选定一次，工作进程直接按参数编码
+    options = {theme: cache.encoder.options_for(theme, render_cover(theme, date_label(days[0])))
+               for theme in themes} if days else {}
+    jobs = [(cache.path(theme, date_label(day)), theme, date_label(day), options[theme], force)
+            for day in days for theme in themes]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return sum(executor.map(_render_into_cache, jobs, chunksize=max(1, len(jobs) // 32)))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cover_renderer import THEMES
+
+    parser = argparse.ArgumentParser(description="批量预渲染封面")
+    parser.add_argument('--start', default=date.today().isoformat(), help="开始日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument('--end', default=None, help="结束日期 YYYY-MM-DD（默认开始日期后30天）")
+    parser.add_argument('--themes', default='morning,evening', help=f"逗号分隔的主题（可选: {','.join(THEMES)}）")
+    parser.add_argument('--workers', type=int, default=None, help="进程数（默认CPU核数）")
+    parser.add_argument('--force', action='store_true', help="覆盖已缓存的封面")
+    parser.add_argument('--config', default='config.json', help="配置文件路径（读取 cover_encoder 设置）")
+    args = parser.parse_args()
+
+    start = date.fromisoformat(args.start)
+    end = date.fromisoformat(args.end) if args.end else start + timedelta(days=30)
+    themes = [theme.strip() for theme in args.themes.split(',') if theme.strip()]
+    unknown = [theme for theme in themes if theme not in THEMES]
+    if unknown:
+        parser.error(f"未知主题: {', '.join(unknown)}")
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+    encoder = CoverEncoder.from_config(read_json(args.config, {}) or {})
+    began = time.perf_counter()
+    rendered = prerender(themes, days, args.workers, args.force, encoder=encoder)
+    elapsed = time.perf_counter() - began
+    cache = CoverCache(encoder=encoder)
+    removed = cache.prune()
+    print(f"✓ 预渲染完成：{len(days)}天 × {len(themes)}个主题，新渲染{rendered}张，耗时{elapsed:.1f}秒")
+    print(f"  缓存目录: {cache.directory}（清理过期封面{removed}张）")
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+封面自适应JPEG编码
+功能：按主题用二分法查找满足感知阈值（与无损渲染结果的SSIM）和字节预算的最低质量，
+配合渐进式编码、优化霍夫曼表和色度抽样选项缩小封面体积；选出的参数按主题缓存并落盘，
+之后的封面直接按缓存参数编码。SSIM搜索每个主题要几秒，只在预渲染（cover_cache.py）、回补和调度器预热时执行，
+发布时没有缓存参数的主题按最高质量编码（超出字节预算时只按体积降低质量）。
+"""
+
+import io
+import threading
+from operator import mul
+
+from local_store import cache_path, read_json, write_json
+
+
+# SSIM 常数（8位图像，K1=0.01，K2=0.03）
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+# 计算SSIM的分块边长（与JPEG的8x8块对齐）
+SSIM_BLOCK = 8
+
+# 默认感知阈值：渐变背景在该阈值下看不出色带和块效应
+MIN_SSIM = 0.998
+MIN_QUALITY = 60
+MAX_QUALITY = 95
+
+
+def ssim(reference, candidate, block=SSIM_BLOCK):
+    """
+    计算两张同尺寸图片亮度通道的平均SSIM（不重叠分块）
+
+    Args:
+        reference: 参考图片（无损渲染结果）
+        candidate: 待比较图片（JPEG解码结果）
+        block: 分块边长
+
+    Returns:
+        0~1 之间的相似度，1表示完全一致
+    """
+    width, height = reference.size
+    if candidate.size != reference.size:
+        raise ValueError("SSIM 需要两张尺寸相同的图片")
+    ref = reference.convert('L').tobytes()
+    cand = candidate.convert('L').tobytes()
+    columns = width // block
+    pixels = block * block
+    total, count = 0.0, 0
+    for top in range(0, height - block + 1, block):
+        sum_x, sum_y = [0] * columns, [0] * columns
+        sum_xx, sum_yy, sum_xy = [0] * columns, [0] * columns, [0] * columns
+        for y in range(top, top + block):
+            row_x = ref[y * width:(y + 1) * width]
+            row_y = cand[y * width:(y + 1) * width]
+            for column in range(columns):
+                xs = row_x[column * block:(column + 1) * block]
+                ys = row_y[column * block:(column + 1) * block]
+                sum_x[column] += sum(xs)
+                sum_y[column] += sum(ys)
+                sum_xx[column] += sum(map(mul, xs, xs))
+                sum_yy[column] += sum(map(mul, ys, ys))
+                sum_xy[column] += sum(map(mul, xs, ys))
+        for column in range(columns):
+            mean_x, mean_y = sum_x[column] / pixels, sum_y[column] / pixels
+            var_x = sum_xx[column] / pixels - mean_x * mean_x
+            var_y = sum_yy[column] / pixels - mean_y * mean_y
+            covariance = sum_xy[column] / pixels - mean_x * mean_y
+            total += (((2 * mean_x * mean_y + _C1) * (2 * covariance + _C2))
+                      / ((mean_x * mean_x + mean_y * mean_y + _C1) * (var_x + var_y + _C2)))
+            count += 1
+    return total / count if count else 1.0
+
+
+class CoverEncoder:
+    """按主题自适应选择JPEG质量的封面编码器"""
+
+    def __init__(self, min_ssim=MIN_SSIM, max_bytes=None, min_quality=MIN_QUALITY,
+                 max_quality=MAX_QUALITY, subsampling='4:2:0', progressive=True, optimize=True,
+                 adaptive=True, state_path=None):
+        """
+        Args:
+            min_ssim: 感知阈值，编码结果与无损渲染的SSIM不低于该值
+            max_bytes: 字节预算，None表示不限制；与感知阈值不能同时满足时优先满足预算
+            min_quality / max_quality: 质量搜索范围
+            subsampling: 色度抽样（'4:4:4' / '4:2:2' / '4:2:0'）
+            progressive: 是否使用渐进式JPEG
+            optimize: 是否优化霍夫曼表
+            adaptive: 为False时固定使用 max_quality，不做搜索
+            state_path: 各主题编码参数的缓存文件
+        """
+        if not 1 <= min_quality <= max_quality <= 100:
+            raise ValueError(f"无效的质量范围: {min_quality}~{max_quality}")
+        self.min_ssim = min_ssim
+        self.max_bytes = max_bytes
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.subsampling = subsampling
+        self.progressive = progressive
+        self.optimize = optimize
+        self.adaptive = adaptive
+        self.state_path = state_path or cache_path('cover_encoder.json')
+        self._lock = threading.Lock()
+        self._settings = None
+
+    @classmethod
+    def from_config(cls, config):
+        settings = config.get('cover_encoder') or {}
+        return cls(min_ssim=settings.get('min_ssim', MIN_SSIM),
+                   max_bytes=settings.get('max_kb') and settings['max_kb'] * 1024,
+                   min_quality=settings.get('min_quality', MIN_QUALITY),
+                   max_quality=settings.get('max_quality', MAX_QUALITY),
+                   subsampling=settings.get('subsampling', '4:2:0'),
+                   progressive=settings.get('progressive', True),
+                   optimize=settings.get('optimize', True),
+                   adaptive=settings.get('adaptive', True))
+
+    @property
+    def signature(self):
+        """编码配置的标识（配置变化后缓存的参数和预渲染封面失效）"""
+        if not self.adaptive:
+            return f"q{self.max_quality}|{self.subsampling}|{self.progressive:d}{self.optimize:d}"
+        return (f"ssim{self.min_ssim}|{self.max_bytes}|q{self.min_quality}-{self.max_quality}"
+                f"|{self.subsampling}|{self.progressive:d}{self.optimize:d}")
+
+    def _options(self, quality):
+        return {'quality': quality, 'subsampling': self.subsampling,
+                'progressive': self.progressive, 'optimize': self.optimize}
+
+    def _encode(self, image, quality):
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', **self._options(quality))
+        return buffer.getvalue()
+
+    def _key(self, theme, image):
+        return f"{theme}|{self.signature}|{image.width}x{image.height}"
+
+    def _cached_quality(self, key):
+        if self._settings is None:
+            self._settings = read_json(self.state_path, {}) or {}
+        entry = self._settings.get(key)
+        return entry['quality'] if entry else None
+
+    def _search(self, image):
+        """
+        查找满足感知阈值（和字节预算）的最低质量
+
+        Returns:
+            (质量, SSIM, 字节数)
+        """
+        from PIL import Image
+
+        encoded, scores = {}, {}
+
+        def size(quality):
+            if quality not in encoded:
+                encoded[quality] = self._encode(image, quality)
+            return len(encoded[quality])
+
+        def score(quality):
+            if quality not in scores:
+                size(quality)
+                scores[quality] = ssim(image, Image.open(io.BytesIO(encoded[quality])))
+            return scores[quality]
+
+        # SSIM 随质量单调上升：二分查找达到阈值的最低质量
+        low, high = self.min_quality, self.max_quality
+        if score(high) >= self.min_ssim:
+            while low < high:
+                middle = (low + high) // 2
+                if score(middle) >= self.min_ssim:
+                    high = middle
+                else:
+                    low = middle + 1
+        quality = high
+
+        quality = self._fit_budget(quality, size)
+        return quality, score(quality), size(quality)
+
+    def _fit_budget(self, quality, size):
+        """
+        超出字节预算时取预算内的最高质量（仍超出时使用最低质量）
+
+        Args:
+            quality: 不考虑预算时选出的质量
+            size: 质量 -> 编码字节数的函数
+        """
+        if not self.max_bytes or size(quality) <= self.max_bytes:
+            return quality
+        low, high = self.min_quality, quality - 1
+        quality = self.min_quality
+        while low <= high:
+            middle = (low + high) // 2
+            if size(middle) <= self.max_bytes:
+                quality, low = middle, middle + 1
+            else:
+                high = middle - 1
+        if size(quality) > self.max_bytes:
+            print(f"⚠ 封面在最低质量{quality}下仍超出字节预算（{size(quality) // 1024}KB）")
+        return quality
+
+    def is_searched(self, theme, image):
+        """某个主题是否已有缓存的编码参数（不需要搜索）"""
+        if not self.adaptive:
+            return True
+        with self._lock:
+            return self._cached_quality(self._key(theme, image)) is not None
+
+    def options_for(self, theme, image, search=True):
+        """
+        获取某个主题的编码参数（没有缓存时用 image 搜索并缓存）
+
+        Args:
+            search: 为False时不搜索，没有缓存参数时返回None
+
+        Returns:
+            传给 Image.save 的参数字典（quality / subsampling / progressive / optimize）
+        """
+        if not self.adaptive:
+            return self._options(self.max_quality)
+        key = self._key(theme, image)
+        with self._lock:
+            quality = self._cached_quality(key)
+            if quality is None and not search:
+                return None
+            if quality is None:
+                quality, similarity, length = self._search(image)
+                print(f"✓ 封面编码参数（{theme}）: 质量{quality}，SSIM {similarity:.4f}，{length // 1024}KB")
+                self._settings[key] = {'quality': quality, 'ssim': round(similarity, 5), 'bytes': length}
+                try:
+                    write_json(self.state_path, self._settings)
+                except OSError as e:
+                    print(f"⚠ 封面编码参数写入失败: {e}")
+        return self._options(quality)
+
+    def encode(self, image, theme, search=True):
+        """
+        按主题缓存的参数编码封面，返回JPEG字节
+
+        Args:
+            search: 为True时没有缓存参数（或缓存参数超出字节预算）就做SSIM搜索；
+                为False时不搜索，按缓存参数或最高质量编码，超出字节预算时只按体积降低质量
+        """
+        options = self.options_for(theme, image, search)
+        quality = options['quality'] if options else self.max_quality
+        data = self._encode(image, quality)
+        if (self.adaptive and self.max_bytes and len(data) > self.max_bytes
+                and quality > self.min_quality):
+            if not search:
+                encoded = {quality: data}
+
+                def size(candidate):
+                    if candidate not in encoded:
+                        encoded[candidate] = self._encode(image, candidate)
+                    return len(encoded[candidate])
+
+                return encoded[self._fit_budget(quality, size)]
+            # 缓存的参数是用其他日期的封面选出的，这张超出预算时用它重新选择
+            with self._lock:
+                self._settings.pop(self._key(theme, image), None)
+            data = self._encode(image, self.options_for(theme, image)['quality'])
+        return data
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+封面渲染引擎
+功能：按主题一次性生成渐变背景，并缓存背景+装饰+标题图层，
+每次生成封面只需在图层副本上绘制日期；文字按 (字体, 字符) 缓存字形蒙版，
+排版结果按 (字体, 文字) 缓存，阴影和正文共用同一份蒙版
+"""
+
+import io
+import math
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+from font_index import select_cover_fonts
+
+
+# 默认封面尺寸（16:9）
+COVER_SIZE = (1280, 720)
+
+
+def _draw_gold_pattern(draw, theme, width, height):
+    """绘制金色线条和圆形装饰"""
+    for i in range(5):
+        x = 100 + i * 250
+        draw.line([(x, 100), (x+150, 200)], fill=theme.accent_color, width=3)
+        draw.ellipse([x+100, 250, x+180, 330], outline=theme.accent_color, width=2)
+
+
+def _draw_up_arrow(draw, theme, width, height):
+    """绘制股票上涨箭头（晚报）"""
+    arrow_color = (34, 197, 94)  # 绿色
+    draw.polygon([(width-150, 550), (width-100, 500), (width-50, 550),
+                  (width-80, 550), (width-80, 620), (width-120, 620),
+                  (width-120, 550)], fill=arrow_color)
+
+
+def _draw_sun(draw, theme, width, height):
+    """绘制太阳图标（早报，象征早晨）"""
+    sun_color = (255, 223, 0)
+    sun_center = (150, 150)
+    sun_radius = 60
+    draw.ellipse([sun_center[0]-sun_radius, sun_center[1]-sun_radius,
+                  sun_center[0]+sun_radius, sun_center[1]+sun_radius],
+                 fill=sun_color)
+
+    # 太阳光芒
+    for angle in range(0, 360, 45):
+        rad = math.radians(angle)
+        x1 = sun_center[0] + int((sun_radius + 10) * math.cos(rad))
+        y1 = sun_center[1] + int((sun_radius + 10) * math.sin(rad))
+        x2 = sun_center[0] + int((sun_radius + 30) * math.cos(rad))
+        y2 = sun_center[1] + int((sun_radius + 30) * math.sin(rad))
+        draw.line([(x1, y1), (x2, y2)], fill=sun_color, width=5)
+
+
+class CoverTheme:
+    """封面主题：渐变参数、标题、强调色和装饰绘制函数"""
+
+    def __init__(self, name, title, gradient, accent_color, decorations):
+        """
+        Args:
+            name: 主题名称（缓存键）
+            title: 标题文字
+            gradient: 每个通道的 (起始值, 结束值, 系数)，按 R、G、B 顺序
+            accent_color: 标题及装饰的强调色
+            decorations: 装饰绘制函数列表，签名为 (draw, theme, width, height)
+        """
+        self.name = name
+        self.title = title
+        self.gradient = gradient
+        self.accent_color = accent_color
+        self.decorations = decorations
+
+    def row_color(self, y, height):
+        """计算第y行的渐变颜色（与逐行绘制的公式完全一致）"""
+        return tuple(int(start + (end - start) * y / height * factor)
+                     for start, end, factor in self.gradient)
+
+
+THEMES = {
+    # 深蓝到深蓝金色混合 + 金色装饰 + 绿色上涨箭头
+    'evening': CoverTheme(
+        name='evening',
+        title="行情晚报",
+        gradient=((13, 218, 0.3), (27, 165, 0.3), (62, 32, 0.3)),
+        accent_color=(218, 165, 32),
+        decorations=[_draw_gold_pattern, _draw_up_arrow],
+    ),
+    # 橙红到金黄（象征朝阳） + 金色装饰 + 太阳
+    'morning': CoverTheme(
+        name='morning',
+        title="行情早报",
+        gradient=((255, 218, 0.5), (140, 165, 0.8), (0, 32, 0.3)),
+        accent_color=(255, 215, 0),
+        decorations=[_draw_gold_pattern, _draw_sun],
+    ),
+    # 晚报附加图文：沿用晚报配色，标题不同
+    'sectors': CoverTheme(
+        name='sectors',
+        title="板块详情",
+        gradient=((13, 218, 0.3), (27, 165, 0.3), (62, 32, 0.3)),
+        accent_color=(218, 165, 32),
+        decorations=[_draw_gold_pattern, _draw_up_arrow],
+    ),
+    'commodities': CoverTheme(
+        name='commodities',
+        title="商品期货",
+        gradient=((13, 218, 0.3), (27, 165, 0.3), (62, 32, 0.3)),
+        accent_color=(218, 165, 32),
+        decorations=[_draw_gold_pattern],
+    ),
+}
+
+# 已完成的背景+装饰+标题图层缓存，键为 (主题, 尺寸, 字体)
+_layer_cache = {}
+
+# 日期文字中反复出现的字符，预先光栅化
+DATE_GLYPHS = "0123456789年月日-/ "
+
+# 排版缓存最多保留的文字数（批量生成不同日期的封面时按最近使用淘汰）
+TEXT_CACHE_SIZE = 256
+
+# 字形缓存：(字体, 字符) -> 步进宽度；(字体, 前字符, 后字符) -> 字距调整；
+# (字体, 字符, 小数像素偏移) -> (蒙版, 字形边框)
+_advance_cache = {}
+_kerning_cache = {}
+_glyph_cache = {}
+# 排版缓存：(字体, 文字) -> (蒙版, 文字边框)
+_text_cache = OrderedDict()
+_text_lock = threading.Lock()
+
+
+def render_gradient(theme, size=COVER_SIZE):
+    """
+    一次性生成渐变背景
+
+    渐变只沿纵向变化，因此先计算一列像素（每行一个颜色），
+    再横向拉伸到整幅宽度，替代逐行调用 draw.rectangle。
+    """
+    width, height = size
+    column = Image.new('RGB', (1, height))
+    column.putdata([theme.row_color(y, height) for y in range(height)])
+    return column.resize((width, height), Image.NEAREST)
+
+
+def _load_first(candidates, size):
+    """按顺序加载候选字体，返回 (字体, 条目)；正常情况下第一个候选即可加载成功"""
+    for face in candidates:
+        try:
+            return ImageFont.truetype(face['path'], size, index=face['index']), face
+        except Exception as e:
+            print(f"⚠ 字体加载失败: {face['path']} ({e})")
+    return None, None
+
+
+_fonts = None
+
+
+def load_cover_fonts():
+    """
+    加载标题和日期字体（从字体索引中选择，支持Windows、Linux和macOS）
+
+    Returns:
+        (标题字体, 日期字体, 字体缓存键)
+    """
+    global _fonts
+    if _fonts is not None:
+        return _fonts
+
+    title_candidates, date_candidates = select_cover_fonts()
+    title_font, title_face = _load_first(title_candidates, 120)
+    date_font, date_face = _load_first(date_candidates, 50)
+
+    if title_font is not None and date_font is not None:
+        print(f"✓ 成功加载字体: {title_face['path']}")
+        font_key = f"{title_face['path']}#{title_face['index']}"
+        _fonts = (title_font, date_font, font_key)
+        return _fonts
+
+    # 如果所有字体都失败，使用默认字体
+    print("⚠ 警告：未找到中文字体，使用默认字体（可能无法显示中文）")
+    print("💡 建议：在Linux上安装中文字体")
+    print("   Ubuntu/Debian: sudo apt-get install fonts-wqy-zenhei")
+    print("   CentOS/RHEL: sudo yum install wqy-zenhei-fonts")
+    print("")
+    print("🔍 调试信息：安装字体后运行以下命令重建字体索引")
+    print("   python font_checker.py --refresh")
+    _fonts = (ImageFont.load_default(), ImageFont.load_default(), None)
+    return _fonts
+
+
+def _advance(font, char):
+    value = _advance_cache.get((font, char))
+    if value is None:
+        value = _advance_cache[(font, char)] = font.getlength(char)
+    return value
+
+
+def _kerning(font, previous, char):
+    key = (font, previous, char)
+    value = _kerning_cache.get(key)
+    if value is None:
+        value = _kerning_cache[key] = (font.getlength(previous + char)
+                                       - _advance(font, previous) - _advance(font, char))
+    return value
+
+
+def _glyph(font, char, phase):
+    """
+    单个字符的蒙版（按小数像素偏移分别缓存，与整串绘制时的抗锯齿完全一致）
+
+    Returns:
+        (L模式蒙版, 字形边框)，蒙版左上角对应 (字形边框左侧, 字形边框顶部)
+    """
+    key = (font, char, phase)
+    glyph = _glyph_cache.get(key)
+    if glyph is None:
+        bbox = font.getbbox(char)
+        # 小数偏移最多让字形向右多占1像素
+        mask = Image.new('L', (bbox[2] - bbox[0] + 2, max(bbox[3] - bbox[1], 1)))
+        ImageDraw.Draw(mask).text((phase - bbox[0], -bbox[1]), char, font=font, fill=255)
+        glyph = _glyph_cache[key] = (mask, bbox)
+    return glyph
+
+
+def _layout_glyphs(font, text):
+    """用缓存的步进宽度和字距排版，返回 (蒙版, 文字边框)，结果与 font.getbbox + draw.text 一致"""
+    placed, pen, previous = [], 0.0, None
+    for char in text:
+        if previous is not None:
+            pen += _advance(font, previous) + _kerning(font, previous, char)
+        origin = math.floor(pen)
+        glyph_mask, glyph_bbox = _glyph(font, char, pen - origin)
+        placed.append((pen, origin, glyph_mask, glyph_bbox))
+        previous = char
+
+    bbox = (math.floor(min(pen + glyph_bbox[0] for pen, _, _, glyph_bbox in placed)),
+            min(glyph_bbox[1] for _, _, _, glyph_bbox in placed),
+            math.ceil(max(pen + glyph_bbox[2] for pen, _, _, glyph_bbox in placed)),
+            max(glyph_bbox[3] for _, _, _, glyph_bbox in placed))
+    mask = Image.new('L', (bbox[2] - bbox[0], bbox[3] - bbox[1]))
+    for _, origin, glyph_mask, glyph_bbox in placed:
+        left, top = origin + glyph_bbox[0] - bbox[0], glyph_bbox[1] - bbox[1]
+        region = (left, top, left + glyph_mask.width, top + glyph_mask.height)
+        # 相邻字形的抗锯齿边缘可能重叠，取较大值（与整串光栅化相同）
+        mask.paste(ImageChops.lighter(mask.crop(region), glyph_mask), region[:2])
+    return mask, bbox
+
+
+def _rasterize_text(font, text):
+    """整串光栅化（非矢量字体或空字符串）"""
+    bbox = font.getbbox(text)
+    mask = Image.new('L', (max(bbox[2] - bbox[0], 1), max(bbox[3] - bbox[1], 1)))
+    ImageDraw.Draw(mask).text((-bbox[0], -bbox[1]), text, font=font, fill=255)
+    return mask, bbox
+
+
+def text_mask(font, text):
+    """
+    获取（必要时排版并缓存）文字蒙版
+
+    Args:
+        font: 字体对象（字体对象本身带有字号，同一字体不同字号是不同的键）
+        text: 文字
+
+    Returns:
+        (L模式蒙版, 文字边框)，边框与 draw.textbbox((0, 0), text, font) 相同
+    """
+    key = (font, text)
+    with _text_lock:
+        cached = _text_cache.get(key)
+        if cached is not None:
+            _text_cache.move_to_end(key)
+            return cached
+        if isinstance(font, ImageFont.FreeTypeFont) and text:
+            cached = _layout_glyphs(font, text)
+        else:
+            cached = _rasterize_text(font, text)
+        _text_cache[key] = cached
+        if len(_text_cache) > TEXT_CACHE_SIZE:
+            _text_cache.popitem(last=False)
+        return cached
+
+
+def warm_glyphs(font, chars=DATE_GLYPHS):
+    """预先光栅化常用字符（整像素位置），常驻进程预热时调用"""
+    if not isinstance(font, ImageFont.FreeTypeFont):
+        return
+    with _text_lock:
+        for char in chars:
+            _advance(font, char)
+            _glyph(font, char, 0.0)
+
+
+def _draw_centered_text(image, y, text, font, fill, shadow_offset):
+    """水平居中绘制带阴影的文字（阴影和正文共用一份缓存的蒙版）"""
+    mask, bbox = text_mask(font, text)
+    x = (image.width - (bbox[2] - bbox[0])) // 2
+    image.paste((0, 0, 0), (x + bbox[0] + shadow_offset, y + bbox[1] + shadow_offset), mask)
+    image.paste(fill, (x + bbox[0], y + bbox[1]), mask)
+
+
+def get_base_layer(theme_name, title_font, font_key, size=COVER_SIZE):
+    """获取（必要时生成并缓存）背景+装饰+标题图层"""
+    key = (theme_name, size, font_key)
+    layer = _layer_cache.get(key)
+    if layer is None:
+        theme = THEMES[theme_name]
+        width, height = size
+        layer = render_gradient(theme, size)
+        draw = ImageDraw.Draw(layer)
+        for decorate in theme.decorations:
+            decorate(draw, theme, width, height)
+        # 标题阴影 + 标题主体
+        _draw_centered_text(layer, 250, theme.title, title_font, theme.accent_color, 3)
+        _layer_cache[key] = layer
+    return layer
+
+
+def render_cover(theme_name, date_str, fonts=None, size=COVER_SIZE):
+    """
+    渲染封面图片
+
+    Args:
+        theme_name: 主题名称（'morning' / 'evening'）
+        date_str: 日期文字
+        fonts: (标题字体, 日期字体, 字体缓存键)，缺省时自动加载
+        size: 封面尺寸
+
+    Returns:
+        PIL.Image 对象
+    """
+    title_font, date_font, font_key = fonts or load_cover_fonts()
+    image = get_base_layer(theme_name, title_font, font_key, size).copy()
+    # 日期阴影 + 日期主体（白色）
+    _draw_centered_text(image, 420, date_str, date_font, (255, 255, 255), 2)
+    return image
+
+
+def encode_cover(image, quality=95, **options):
+    """把封面编码为JPEG字节（内存中完成，不落盘）；options 为其他JPEG参数（见 cover_encoder.py）"""
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality, **options)
+    return buffer.getvalue()
+
+
+def clear_cache():
+    """清空图层缓存和文字缓存"""
+    _layer_cache.clear()
+    with _text_lock:
+        _text_cache.clear()
+        _glyph_cache.clear()
+        _advance_cache.clear()
+        _kerning_cache.clear()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+草稿图文组装
+功能：把一篇或多篇文章（各自带封面 thumb_media_id）组装为一次 draft/add 请求，
+发送前按微信草稿接口的限制检查篇数、标题和正文长度，避免整批被拒后浪费调用次数。
+"""
+
+import json
+
+
+# 微信草稿接口限制：每个草稿最多8篇图文，正文少于2万字符且小于1MB，标题不超过64字
+MAX_ARTICLES = 8
+MAX_TITLE_CHARS = 64
+MAX_CONTENT_CHARS = 20000
+MAX_CONTENT_BYTES = 1024 * 1024
+
+
+def build_article(title, content, thumb_media_id, digest="", author="yuaner"):
+    """组装单篇图文"""
+    return {
+        "title": title,
+        "author": author,
+        "digest": digest,
+        "content": content,
+        "content_source_url": "",
+        "thumb_media_id": thumb_media_id,
+        "need_open_comment": 0,
+        "only_fans_can_comment": 0
+    }
+
+
+def check_batch(articles):
+    """
+    检查一批图文是否满足草稿接口的限制
+
+    Returns:
+        问题说明列表，为空表示可以发送
+    """
+    problems = []
+    if not articles:
+        problems.append("草稿中没有图文")
+    if len(articles) > MAX_ARTICLES:
+        problems.append(f"图文数量{len(articles)}篇，超过上限{MAX_ARTICLES}篇")
+    for number, article in enumerate(articles, 1):
+        if not article.get('thumb_media_id'):
+            problems.append(f"第{number}篇缺少封面 thumb_media_id")
+        if len(article['title']) > MAX_TITLE_CHARS:
+            problems.append(f"第{number}篇标题{len(article['title'])}字，超过上限{MAX_TITLE_CHARS}字")
+        content = article['content']
+        if len(content) >= MAX_CONTENT_CHARS:
+            problems.append(f"第{number}篇正文{len(content)}字符，需少于{MAX_CONTENT_CHARS}字符")
+        size = len(content.encode('utf-8'))
+        if size >= MAX_CONTENT_BYTES:
+            problems.append(f"第{number}篇正文{size / 1024:.0f}KB，需小于1MB")
+    return problems
+
+
+def encode_draft(articles):
+    """draft/add 请求体（UTF-8编码的JSON）"""
+    return json.dumps({"articles": articles}, ensure_ascii=False).encode('utf-8')
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+多公众号分发
+功能：行情数据、报告正文和封面只生成一次，再用有界线程池把获取token、上传封面、
+创建草稿分发到 config.json 中 accounts 列出的多个公众号，并汇总每个公众号的结果。
+"""
+
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import current_scope, stage_scope
+
+# 同时处理的公众号数量上限（可用 config.json 的 fanout.max_workers 修改）
+DEFAULT_MAX_WORKERS = 8
+
+
+class AccountResult:
+    """单个公众号的发布结果"""
+
+    def __init__(self, name, appid):
+        self.name = name
+        self.appid = appid
+        self.success = False
+        self.resumed = False
+        self.error = None
+        self.timings = {}
+
+    def summary(self):
+        timings = "，".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in self.timings.items())
+        if self.resumed:
+            status = "✓ 已在上次运行中完成"
+        else:
+            status = "✓ 成功" if self.success else f"✗ 失败（{self.error}）"
+        return f"{self.name}（{self.appid}）：{status}；{timings}"
+
+
+def account_publisher(publisher, account):
+    """
+    复制发布器并切换到指定公众号（共享HTTP连接池、token存储和素材缓存）
+
+    Args:
+        publisher: 发布器实例（publisher.ReportPublisher 的子类）
+        account: {'name', 'appid', 'secret', 'api_base'(可选)}
+    """
+    clone = copy.copy(publisher)
+    clone.wechat_appid = account['appid']
+    clone.wechat_secret = account['secret']
+    clone.api_base = account.get('api_base', publisher.api_base).rstrip('/')
+    clone.access_token = None
+    clone.token_expires_at = None
+    clone.stale_media_ids = set()
+    return clone
+
+
+class AccountFanout:
+    """把发布步骤分发到多个公众号"""
+
+    def __init__(self, publisher, accounts, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max(1, min(max_workers, len(accounts)))
+        self.publishers = [account_publisher(publisher, account) for account in accounts]
+        self.results = [AccountResult(account.get('name', account['appid']), account['appid'])
+                        for account in accounts]
+
+    @classmethod
+    def from_config(cls, publisher):
+        """config.json 配置了 accounts 列表时返回分发器，否则返回None（单公众号模式）"""
+        accounts = publisher.config.get('accounts')
+        if not accounts:
+            return None
+        max_workers = publisher.config.get('fanout', {}).get('max_workers', DEFAULT_MAX_WORKERS)
+        return cls(publisher, accounts, max_workers)
+
+    def __len__(self):
+        return len(self.publishers)
+
+    def _map(self, func):
+        # 工作线程沿用调用方所在的流程阶段，HTTP请求指标才能归属到该阶段
+        scope = current_scope()
+
+        def call(publisher, result):
+            with stage_scope(*scope):
+                return func(publisher, result)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(call, self.publishers, self.results))
+
+    @staticmethod
+    def _timed(result, stage, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            result.timings[stage] = time.perf_counter() - start
+
+    def prefetch_tokens(self):
+        """
+        并行获取所有公众号的access_token（流程阶段）
+
+        Returns:
+            获取成功的公众号数量；全部失败时返回None
+        """
+        def fetch(publisher, result):
+            token = self._timed(result, 'token', publisher.get_wechat_access_token)
+            if not token:
+                result.error = "获取access_token失败"
+            return bool(token)
+
+        succeeded = sum(self._map(fetch))
+        return succeeded or None
+
+    def publish(self, articles, covers, journal=None):
+        """
+        并行上传封面并创建草稿（流程阶段）
+
+        Args:
+            articles: 草稿图文列表（见 _generate_articles）
+            covers: 与图文一一对应的封面（JPEG字节）
+            journal: RunJournal；已记录完成的公众号不再重复创建草稿
+
+        Returns:
+            发布成功的公众号数量；全部失败时返回None
+        """
+        def publish_one(publisher, result):
+            if journal is not None and journal.account_done(result.appid):
+                result.success = result.resumed = True
+                return True
+            if not publisher.access_token:
+                return False
+            media_ids = self._timed(result, 'upload', publisher.upload_covers, covers)
+            if not media_ids:
+                result.error = "封面上传失败"
+                return False
+            draft_id = self._timed(result, 'draft', publisher._publish_draft,
+                                   articles, covers, media_ids)
+            result.success = bool(draft_id)
+            if not result.success:
+                result.error = "草稿创建失败"
+            elif journal is not None:
+                journal.record_account(result.appid, draft_id)
+            return result.success
+
+        succeeded = sum(self._map(publish_one))
+        return succeeded or None
+
+    @property
+    def success(self):
+        return all(result.success for result in self.results)
+
+    def summary_lines(self):
+        succeeded = sum(result.success for result in self.results)
+        return [result.summary() for result in self.results] + [
+            f"共{len(self.results)}个公众号，成功{succeeded}个，失败{len(self.results) - succeeded}个"]
@@ -5,10 +5,11 @@
 用于检测系统中可用的中文字体
 """
 
-import os
 import sys
 from PIL import Image, ImageDraw, ImageFont
 
+from font_index import font_dirs, get_font_index, select_cover_fonts
+
 
 def check_font_file(font_path, font_size=60):
     """检查单个字体文件是否可用"""
@@ -19,76 +20,38 @@ def check_font_file(font_path, font_size=60):
         return False, str(e)
 
 
-def find_chinese_fonts():
-    """查找系统中的中文字体"""
+def find_chinese_fonts(refresh=False):
+    """查找系统中的中文字体（读取与发布程序共用的字体索引）"""
     print("="*60)
     print("字体检测工具 - 查找系统中的中文字体")
     print("="*60)
     print()
     
-    # 常见字体路径
-    font_paths = [
-        # Windows
-        ("Windows - 微软雅黑粗体", "C:/Windows/Fonts/msyhbd.ttc"),
-        ("Windows - 微软雅黑", "C:/Windows/Fonts/msyh.ttc"),
-        ("Windows - 黑体", "C:/Windows/Fonts/simhei.ttf"),
-        ("Windows - 宋体", "C:/Windows/Fonts/simsun.ttc"),
-        
-        # Linux - 文泉驿
-        ("Linux - 文泉驿正黑 (路径1)", "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc"),
-        ("Linux - 文泉驿正黑 (路径2)", "/usr/share/fonts/wqy-zenhei/wqy-zenhei.ttc"),
-        ("Linux - 文泉驿微米黑", "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc"),
-        
-        # Linux - Droid
-        ("Linux - Droid Fallback", "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf"),
-        
-        # Linux - Noto
-        ("Linux - Noto CJK (路径1)", "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc"),
-        ("Linux - Noto CJK (路径2)", "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc"),
-        
-        # Linux - AR PL
-        ("Linux - AR PL UMing", "/usr/share/fonts/truetype/arphic/uming.ttc"),
-        ("Linux - AR PL UKai", "/usr/share/fonts/truetype/arphic/ukai.ttc"),
-        
-        # macOS
-        ("macOS - 苹方", "/System/Library/Fonts/PingFang.ttc"),
-        ("macOS - 宋体", "/Library/Fonts/Songti.ttc"),
-        ("macOS - 黑体", "/System/Library/Fonts/STHeiti Medium.ttc"),
-    ]
+    print("扫描字体目录..." if refresh else "读取字体索引（字体目录有变化时自动重新扫描）...")
+    for directory in font_dirs():
+        print(f"   {directory}")
+    print()
     
+    index = get_font_index(refresh)
     available_fonts = []
-    unavailable_fonts = []
-    
-    print("检查预定义字体路径...")
-    print()
     
-    for name, path in font_paths:
-        exists = os.path.exists(path)
-        if exists:
-            is_usable, message = check_font_file(path)
-            if is_usable:
-                print(f"✅ {name}")
-                print(f"   路径: {path}")
-                available_fonts.append((name, path))
-            else:
-                print(f"⚠️  {name} (文件存在但无法加载)")
-                print(f"   路径: {path}")
-                print(f"   错误: {message}")
-                unavailable_fonts.append((name, path, message))
-        else:
-            unavailable_fonts.append((name, path, "文件不存在"))
+    for face in index['faces']:
+        if face['missing']:
+            continue
+        print(f"✅ {face['name']}")
+        print(f"   路径: {face['path']}" + (f" (索引 {face['index']})" if face['index'] else ""))
+        available_fonts.append((face['name'], face['path'], face['index']))
     
     print()
     print("="*60)
-    print(f"检测结果：找到 {len(available_fonts)} 个可用字体")
+    print(f"检测结果：共扫描 {len(index['faces'])} 个字体，找到 {len(available_fonts)} 个可用中文字体")
     print("="*60)
     
     if available_fonts:
+        title_candidates, _ = select_cover_fonts()
         print()
-        print("可用的字体：")
-        for i, (name, path) in enumerate(available_fonts, 1):
-            print(f"{i}. {name}")
-            print(f"   {path}")
+        print(f"封面将使用的字体：{title_candidates[0]['name']}")
+        print(f"   {title_candidates[0]['path']}")
     else:
         print()
         print("❌ 未找到任何可用的中文字体！")
@@ -100,7 +63,7 @@ def find_chinese_fonts():
     return available_fonts
 
 
-def test_font_rendering(font_path):
+def test_font_rendering(font_path, font_index=0):
     """测试字体渲染效果"""
     print()
     print("="*60)
@@ -113,8 +76,8 @@ def test_font_rendering(font_path):
         draw = ImageDraw.Draw(img)
         
         # 加载字体
-        title_font = ImageFont.truetype(font_path, 120)
-        date_font = ImageFont.truetype(font_path, 50)
+        title_font = ImageFont.truetype(font_path, 120, index=font_index)
+        date_font = ImageFont.truetype(font_path, 50, index=font_index)
         
         # 绘制测试文字
         title_text = "行情晚报"
@@ -156,10 +119,11 @@ def test_font_rendering(font_path):
         return False
 
 
-def main():
-    """主函数"""
+def main(argv=None):
+    """主函数（参数: --refresh 重建字体索引，--test 渲染测试）"""
+    argv = sys.argv[1:] if argv is None else argv
     # 查找可用字体
-    available_fonts = find_chinese_fonts()
+    available_fonts = find_chinese_fonts(refresh='--refresh' in argv)
     
     if not available_fonts:
         print()
@@ -167,17 +131,19 @@ def main():
         print("   1. 运行命令查找系统字体: fc-list :lang=zh")
         print("   2. 查找字体文件: find /usr/share/fonts -name '*.ttf' -o -name '*.ttc'")
         print("   3. 检查字体是否安装: dpkg -l | grep font")
+        print("   4. 安装字体后重建索引: python3 font_checker.py --refresh")
         sys.exit(1)
     
     # 测试第一个可用字体
     print()
-    if len(sys.argv) > 1 and sys.argv[1] == '--test':
-        name, path = available_fonts[0]
+    if '--test' in argv:
+        name, path, face_index = available_fonts[0]
         print(f"使用字体进行渲染测试: {name}")
         print(f"字体路径: {path}")
-        test_font_rendering(path)
+        test_font_rendering(path, face_index)
     else:
         print("💡 提示：运行 'python3 font_checker.py --test' 可进行渲染测试")
+        print("💡 提示：安装新字体后运行 'python3 font_checker.py --refresh' 重建字体索引")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+中文字体索引
+功能：扫描一次系统字体目录，直接解析字体文件的cmap表，记录哪些字体覆盖封面
+需要渲染的字符，并把结果写入磁盘缓存（字体目录的修改时间变化时自动重建）。
+发布程序和 font_checker.py 共用该索引，冷启动只需加载一次 truetype 字体。
+"""
+
+import os
+import struct
+import sys
+
+from local_store import cache_path, read_json, write_json
+
+
+# 封面需要渲染的全部字符（标题、日期数字、年月日）
+REQUIRED_TEXT = "行情晚报行情早报板块详情商品期货0123456789年月日"
+
+INDEX_VERSION = 2
+INDEX_FILE = 'font_index.json'
+
+FONT_EXTENSIONS = ('.ttf', '.ttc', '.otf', '.otc')
+
+# 按优先级排列的字体文件名（小写），标题优先粗体，日期优先常规体
+TITLE_PREFERENCE = [
+    'msyhbd.ttc', 'msyh.ttc', 'simhei.ttf',
+    'wqy-zenhei.ttc', 'wqy-microhei.ttc',
+    'droidsansfallbackfull.ttf',
+    'notosanscjk-bold.ttc', 'notosanscjk-regular.ttc',
+    'uming.ttc', 'ukai.ttc',
+    'pingfang.ttc', 'songti.ttc', 'stheiti medium.ttc', 'simsun.ttc',
+]
+DATE_PREFERENCE = [
+    'msyh.ttc', 'simhei.ttf',
+    'wqy-zenhei.ttc', 'wqy-microhei.ttc',
+    'droidsansfallbackfull.ttf',
+    'notosanscjk-regular.ttc', 'notosanscjk-bold.ttc',
+    'uming.ttc', 'ukai.ttc',
+    'pingfang.ttc', 'songti.ttc', 'stheiti medium.ttc', 'simsun.ttc',
+    'msyhbd.ttc',
+]
+
+
+def font_dirs():
+    """返回当前平台的系统字体目录列表"""
+    home = os.path.expanduser('~')
+    if os.name == 'nt':
+        windir = os.environ.get('WINDIR', 'C:/Windows')
+        local = os.environ.get('LOCALAPPDATA', os.path.join(home, 'AppData', 'Local'))
+        return [os.path.join(windir, 'Fonts'),
+                os.path.join(local, 'Microsoft', 'Windows', 'Fonts')]
+    if sys.platform == 'darwin':
+        return ['/System/Library/Fonts', '/Library/Fonts',
+                os.path.join(home, 'Library', 'Fonts')]
+    return ['/usr/share/fonts', '/usr/local/share/fonts',
+            os.path.join(home, '.fonts'),
+            os.path.join(home, '.local', 'share', 'fonts')]
+
+
+# ---------------------------------------------------------------- 字体文件解析
+
+def _read(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("字体文件被截断")
+    return data
+
+
+def _face_offsets(f):
+    """返回文件中每个字体的表目录偏移（.ttc/.otc 含多个字体）"""
+    tag = _read(f, 0, 4)
+    if tag == b'ttcf':
+        count = struct.unpack('>I', _read(f, 8, 4))[0]
+        return list(struct.unpack(f'>{count}I', _read(f, 12, 4 * count)))
+    return [0]
+
+
+def _table_directory(f, offset):
+    """读取表目录，返回 {标签: (偏移, 长度)}"""
+    num_tables = struct.unpack('>H', _read(f, offset + 4, 2))[0]
+    raw = _read(f, offset + 12, 16 * num_tables)
+    tables = {}
+    for i in range(num_tables):
+        tag, _, table_offset, length = struct.unpack('>4sIII', raw[16*i:16*i+16])
+        tables[tag] = (table_offset, length)
+    return tables
+
+
+def _covered_format4(data, chars):
+    seg_count = struct.unpack('>H', data[6:8])[0] // 2
+    ends = struct.unpack(f'>{seg_count}H', data[14:14 + 2*seg_count])
+    starts_at = 16 + 2*seg_count
+    starts = struct.unpack(f'>{seg_count}H', data[starts_at:starts_at + 2*seg_count])
+    deltas_at = starts_at + 2*seg_count
+    deltas = struct.unpack(f'>{seg_count}h', data[deltas_at:deltas_at + 2*seg_count])
+    ranges_at = deltas_at + 2*seg_count
+    ranges = struct.unpack(f'>{seg_count}H', data[ranges_at:ranges_at + 2*seg_count])
+
+    covered = set()
+    for ch in chars:
+        code = ord(ch)
+        if code > 0xFFFF:
+            continue
+        for i in range(seg_count):
+            if ends[i] >= code:
+                break
+        else:
+            continue
+        if starts[i] > code:
+            continue
+        if ranges[i] == 0:
+            glyph = (code + deltas[i]) & 0xFFFF
+        else:
+            addr = ranges_at + 2*i + ranges[i] + 2*(code - starts[i])
+            glyph = struct.unpack('>H', data[addr:addr+2])[0]
+            if glyph:
+                glyph = (glyph + deltas[i]) & 0xFFFF
+        if glyph:
+            covered.add(ch)
+    return covered
+
+
+def _covered_format12(data, chars):
+    num_groups = struct.unpack('>I', data[12:16])[0]
+    codes = {ord(ch): ch for ch in chars}
+    covered = set()
+    for i in range(num_groups):
+        start, end, start_glyph = struct.unpack('>III', data[16 + 12*i:28 + 12*i])
+        for code, ch in codes.items():
+            if start <= code <= end and start_glyph + code - start:
+                covered.add(ch)
+    return covered
+
+
+def _covered_chars(f, cmap_offset, chars):
+    """根据cmap表返回字体覆盖的字符集合"""
+    num_records = struct.unpack('>H', _read(f, cmap_offset + 2, 2))[0]
+    raw = _read(f, cmap_offset + 4, 8 * num_records)
+    subtables = {}
+    for i in range(num_records):
+        platform, encoding, offset = struct.unpack('>HHI', raw[8*i:8*i+8])
+        subtables[(platform, encoding)] = cmap_offset + offset
+
+    # 优先使用完整Unicode子表（格式12），其次是BMP子表（格式4）
+    for key in ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3)):
+        if key not in subtables:
+            continue
+        offset = subtables[key]
+        fmt = struct.unpack('>H', _read(f, offset, 2))[0]
+        if fmt == 12:
+            length = struct.unpack('>I', _read(f, offset + 4, 4))[0]
+            return _covered_format12(_read(f, offset, length), chars)
+        if fmt == 4:
+            length = struct.unpack('>H', _read(f, offset + 2, 2))[0]
+            return _covered_format4(_read(f, offset, length), chars)
+    return set()
+
+
+def _face_name(f, name_offset):
+    """读取字体全名（优先简体中文，其次英文）"""
+    fmt, count, string_offset = struct.unpack('>HHH', _read(f, name_offset, 6))
+    raw = _read(f, name_offset + 6, 12 * count)
+    candidates = {}
+    for i in range(count):
+        platform, encoding, language, name_id, length, offset = \
+            struct.unpack('>6H', raw[12*i:12*i+12])
+        if name_id != 4 or platform != 3:
+            continue
+        candidates[language] = (name_offset + string_offset + offset, length)
+    for language in (0x804, 0x409):
+        if language in candidates:
+            offset, length = candidates[language]
+            return _read(f, offset, length).decode('utf-16-be', 'replace')
+    if candidates:
+        offset, length = next(iter(candidates.values()))
+        return _read(f, offset, length).decode('utf-16-be', 'replace')
+    return None
+
+
+def inspect_font_file(path, chars=REQUIRED_TEXT):
+    """
+    解析字体文件中的每个字体
+
+    Returns:
+        [{'path', 'index', 'name', 'missing'}]，missing 为字体缺失的字符
+    """
+    faces = []
+    with open(path, 'rb') as f:
+        for index, offset in enumerate(_face_offsets(f)):
+            tables = _table_directory(f, offset)
+            covered = set()
+            if b'cmap' in tables:
+                covered = _covered_chars(f, tables[b'cmap'][0], set(chars))
+            name = None
+            if b'name' in tables:
+                try:
+                    name = _face_name(f, tables[b'name'][0])
+                except (ValueError, struct.error):
+                    name = None
+            missing = ''.join(sorted(set(chars) - covered))
+            faces.append({
+                'path': path,
+                'index': index,
+                'name': name or os.path.basename(path),
+                'missing': missing,
+            })
+    return faces
+
+
+# ---------------------------------------------------------------- 索引与缓存
+
+def _scan():
+    """扫描全部字体目录，返回 (目录修改时间签名, 字体列表)"""
+    signature = {}
+    faces = []
+    for root_dir in font_dirs():
+        if not os.path.isdir(root_dir):
+            signature[root_dir] = None
+            continue
+        for directory, _, files in os.walk(root_dir):
+            signature[directory] = os.stat(directory).st_mtime
+            for file_name in sorted(files):
+                if not file_name.lower().endswith(FONT_EXTENSIONS):
+                    continue
+                path = os.path.join(directory, file_name)
+                try:
+                    faces.extend(inspect_font_file(path))
+                except (OSError, ValueError, struct.error):
+                    # 损坏或无法解析的字体文件直接跳过
+                    continue
+    return signature, faces
+
+
+def _is_fresh(index):
+    """检查缓存的目录修改时间签名是否仍然有效"""
+    if not index or index.get('version') != INDEX_VERSION:
+        return False
+    if set(index.get('dirs', {})) & set(font_dirs()) != set(font_dirs()):
+        return False
+    for directory, mtime in index['dirs'].items():
+        try:
+            current = os.stat(directory).st_mtime
+        except OSError:
+            current = None
+        if current != mtime:
+            return False
+    return True
+
+
+_index = None
+
+
+def get_font_index(refresh=False):
+    """
+    获取字体索引（进程内缓存 -> 磁盘缓存 -> 重新扫描）
+
+    Args:
+        refresh: 为True时忽略缓存强制重新扫描
+    """
+    global _index
+    if not refresh and _index is not None:
+        return _index
+
+    path = cache_path(INDEX_FILE)
+    index = None if refresh else read_json(path)
+    if not _is_fresh(index):
+        signature, faces = _scan()
+        index = {'version': INDEX_VERSION, 'dirs': signature, 'faces': faces}
+        try:
+            write_json(path, index)
+        except OSError as e:
+            print(f"⚠ 字体索引缓存写入失败: {e}")
+    _index = index
+    return index
+
+
+def chinese_fonts(refresh=False):
+    """返回覆盖全部封面字符的字体列表"""
+    return [face for face in get_font_index(refresh)['faces'] if not face['missing']]
+
+
+def _rank(face, preference):
+    name = os.path.basename(face['path']).lower()
+    position = preference.index(name) if name in preference else len(preference)
+    return position, face['index'], face['path']
+
+
+def select_cover_fonts(refresh=False):
+    """
+    按优先级选择封面字体
+
+    Returns:
+        (标题字体候选列表, 日期字体候选列表)，每项为字体索引条目
+    """
+    faces = chinese_fonts(refresh)
+    return (sorted(faces, key=lambda face: _rank(face, TITLE_PREFERENCE)),
+            sorted(faces, key=lambda face: _rank(face, DATE_PREFERENCE)))
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+日线历史行情存储
+功能：把指数日线保存在本地SQLite（按 品种+日期 聚簇存储，开启内存映射），
+每次只增量拉取上次保存之后缺失的交易日，并用SQL窗口/聚合查询批量计算
+年初至今涨跌幅、N日涨跌幅和区间成交额，供报告生成时直接读取。
+每次发布采集的行情也按 报告+日期 归档，供离线回补（见 backfill.py）按历史日期重新渲染。
+"""
+
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from http_client import get_client
+from local_store import cache_path
+from market_data import INSTRUMENTS, MarketSnapshot, Quote
+from metrics import current_scope, stage_scope
+
+
+EASTMONEY_HIS_BASE = "https://push2his.eastmoney.com"
+
+# 各报告需要历史统计的品种
+EVENING_HISTORY = ['sh_index', 'cyb_index', 'sz_composite']
+MORNING_HISTORY = ['dji', 'spx', 'ndx']
+
+# 回补时日线补位的最大间隔（天）：截止日之前这么多天内没有日线的品种不补
+MAX_BAR_AGE_DAYS = 7
+
+# 首次拉取时回溯的天数（覆盖上一年末收盘，便于计算年初至今涨跌幅）
+INITIAL_LOOKBACK_DAYS = 400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_bars (
+    symbol TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    open   REAL,
+    close  REAL NOT NULL,
+    high   REAL,
+    low    REAL,
+    volume REAL,
+    amount REAL,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID
+"""
+
+# 发布时采集的行情快照：category 为空表示行情品种，否则为板块分类；seq 保持板块顺序
+SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot_quotes (
+    report     TEXT NOT NULL,
+    date       TEXT NOT NULL,
+    category   TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    seq        INTEGER NOT NULL,
+    name       TEXT NOT NULL,
+    price      REAL,
+    change_pct REAL,
+    amount     REAL,
+    net_inflow REAL,
+    unit       TEXT,
+    decimals   INTEGER,
+    source     TEXT,
+    PRIMARY KEY (report, date, category, key)
+) WITHOUT ROWID
+"""
+
+
+class HistoryStore:
+    """日线行情存储（线程安全）"""
+
+    def __init__(self, db_path=None, his_base=EASTMONEY_HIS_BASE, http=None):
+        """
+        Args:
+            db_path: 数据库文件路径，默认为缓存目录下的 history.db
+            his_base: 东方财富历史K线接口地址（可指向本地替身服务）
+            http: HttpClient，缺省使用共享客户端
+        """
+        self.db_path = db_path or cache_path('history.db')
+        self.his_base = his_base.rstrip('/')
+        self.http = http or get_client()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA mmap_size=268435456")
+        self._conn.execute(SCHEMA)
+        self._conn.execute(SNAPSHOT_SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        """从 config.json 的 data_sources / history 段创建（均可省略）"""
+        sources = config.get('data_sources', {})
+        return cls(db_path=config.get('history', {}).get('db_path'),
+                   his_base=sources.get('eastmoney_his_base', EASTMONEY_HIS_BASE))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------ 写入与增量拉取
+
+    def last_dates(self, symbols):
+        """返回 {品种: 最后一个已保存交易日}"""
+        placeholders = ','.join('?' * len(symbols))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT symbol, MAX(date) FROM daily_bars WHERE symbol IN ({placeholders}) GROUP BY symbol",
+                list(symbols)).fetchall()
+        return dict(rows)
+
+    def insert_bars(self, symbol, bars):
+        """写入日线，bars 为 (日期, 开, 收, 高, 低, 成交量, 成交额) 列表"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO daily_bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(symbol,) + tuple(bar) for bar in bars])
+            self._conn.commit()
+
+    def _fetch_klines(self, symbol, begin, end):
+        """从东方财富拉取 [begin, end] 区间的日K线"""
+        response = self.http.get(
+            f"{self.his_base}/api/qt/stock/kline/get",
+            params={
+                'secid': INSTRUMENTS[symbol].code,
+                'fields1': 'f1,f2,f3',
+                'fields2': 'f51,f52,f53,f54,f55,f56,f57',
+                'klt': '101',   # 日线
+                'fqt': '1',     # 前复权
+                'beg': begin.strftime('%Y%m%d'),
+                'end': end.strftime('%Y%m%d'),
+            },
+        )
+        bars = []
+        for line in ((response.json().get('data') or {}).get('klines') or []):
+            day, open_, close, high, low, volume, amount = line.split(',')[:7]
+            bars.append((day, float(open_), float(close), float(high), float(low),
+                         float(volume), float(amount)))
+        return bars
+
+    def update(self, symbols, as_of=None, max_workers=4):
+        """
+        增量更新：每个品种从最后保存的日期起请求（含该日，盘中运行写入的当日K线在下次更新时被收盘数据覆盖）
+
+        Args:
+            symbols: 品种代码列表（见 market_data.INSTRUMENTS）
+            as_of: 更新截止日期，默认今天
+
+        Returns:
+            {品种: 新增的K线数量}（不含覆盖的已有日期）
+        """
+        as_of = as_of or date.today()
+        last = self.last_dates(symbols)
+        jobs = {}
+        for symbol in symbols:
+            if symbol in last:
+                begin = datetime.strptime(last[symbol], '%Y-%m-%d').date()
+            else:
+                begin = as_of - timedelta(days=INITIAL_LOOKBACK_DAYS)
+            if begin <= as_of:
+                jobs[symbol] = begin
+
+        # 工作线程沿用调用方所在的流程阶段，HTTP请求指标才能归属到该阶段
+        scope = current_scope()
+
+        def update_one(symbol):
+            try:
+                with stage_scope(*scope):
+                    bars = self._fetch_klines(symbol, jobs[symbol], as_of)
+            except Exception as e:
+                print(f"⚠ 历史行情拉取失败（{symbol}）: {e}")
+                return 0
+            self.insert_bars(symbol, bars)
+            return sum(1 for bar in bars if bar[0] > last.get(symbol, ''))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            counts = dict(zip(jobs, executor.map(update_one, jobs)))
+        return {symbol: counts.get(symbol, 0) for symbol in symbols}
+
+    # ------------------------------------------------------------ 查询
+
+    def closes(self, symbol, start=None, end=None):
+        """按列返回区间收盘价：(日期列表, 收盘价列表)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, close FROM daily_bars WHERE symbol = ? AND date >= ? AND date <= ? "
+                "ORDER BY date",
+                (symbol, start or '0000-00-00', end or '9999-99-99')).fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def ytd_change(self, symbols, as_of=None):
+        """
+        批量计算年初至今涨跌幅（%）：截止日收盘相对上一年最后一个交易日收盘
+
+        Returns:
+            {品种: 涨跌幅}，数据不足的品种不出现在结果中
+        """
+        as_of = (as_of or date.today()).isoformat()
+        year_start = as_of[:4] + '-01-01'
+        placeholders = ','.join('?' * len(symbols))
+        query = f"""
+            WITH latest AS (
+                SELECT symbol, close FROM daily_bars b
+                WHERE symbol IN ({placeholders}) AND date = (
+                    SELECT MAX(date) FROM daily_bars WHERE symbol = b.symbol AND date <= ?)
+            ), base AS (
+                SELECT symbol, close FROM daily_bars b
+                WHERE symbol IN ({placeholders}) AND date = (
+                    SELECT MAX(date) FROM daily_bars WHERE symbol = b.symbol AND date < ?)
+            )
+            SELECT latest.symbol, (latest.close / base.close - 1) * 100
+            FROM latest JOIN base ON latest.symbol = base.symbol
+        """
+        with self._lock:
+            rows = self._conn.execute(query, list(symbols) + [as_of] + list(symbols) + [year_start]).fetchall()
+        return dict(rows)
+
+    def n_day_change(self, symbols, days, as_of=None):
+        """批量计算近N个交易日涨跌幅（%）"""
+        as_of = (as_of or date.today()).isoformat()
+        placeholders = ','.join('?' * len(symbols))
+        query = f"""
+            SELECT symbol, (close / base_close - 1) * 100 FROM (
+                SELECT symbol, date, close,
+                       LAG(close, ?) OVER (PARTITION BY symbol ORDER BY date) AS base_close,
+                       ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY date DESC) AS recency
+                FROM daily_bars WHERE symbol IN ({placeholders}) AND date <= ?
+            ) WHERE recency = 1 AND base_close IS NOT NULL
+        """
+        with self._lock:
+            rows = self._conn.execute(query, [days] + list(symbols) + [as_of]).fetchall()
+        return dict(rows)
+
+    def turnover(self, symbols, days, as_of=None):
+        """批量计算近N个交易日累计成交额（元）"""
+        as_of = (as_of or date.today()).isoformat()
+        placeholders = ','.join('?' * len(symbols))
+        query = f"""
+            SELECT symbol, SUM(amount) FROM (
+                SELECT symbol, amount,
+                       ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY date DESC) AS recency
+                FROM daily_bars WHERE symbol IN ({placeholders}) AND date <= ?
+            ) WHERE recency <= ? GROUP BY symbol
+        """
+        with self._lock:
+            rows = self._conn.execute(query, list(symbols) + [as_of, days]).fetchall()
+        return dict(rows)
+
+    def bar_quotes(self, symbols, as_of=None, max_age_days=MAX_BAR_AGE_DAYS):
+        """
+        用截止日（含）之前最近一根日线构造行情记录（涨跌幅相对前一根日线），供回补时补位
+
+        Returns:
+            {品种: Quote}，截止日之前 max_age_days 天内没有日线的品种不出现在结果中
+        """
+        as_of = as_of or date.today()
+        placeholders = ','.join('?' * len(symbols))
+        query = f"""
+            SELECT symbol, close, prev_close, amount FROM (
+                SELECT symbol, date, close, amount,
+                       LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS prev_close,
+                       ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY date DESC) AS recency
+                FROM daily_bars WHERE symbol IN ({placeholders}) AND date <= ?
+            ) WHERE recency = 1 AND prev_close IS NOT NULL AND date >= ?
+        """
+        with self._lock:
+            rows = self._conn.execute(query, list(symbols) + [
+                as_of.isoformat(), (as_of - timedelta(days=max_age_days)).isoformat()]).fetchall()
+        quotes = {}
+        for symbol, close, prev_close, amount in rows:
+            instrument = INSTRUMENTS[symbol]
+            quotes[symbol] = Quote(symbol, instrument.name, close, (close / prev_close - 1) * 100, amount,
+                                   unit=instrument.unit, decimals=instrument.decimals, source='history')
+        return quotes
+
+    # ------------------------------------------------------------ 行情快照归档
+
+    def save_snapshot(self, report, day, snapshot):
+        """
+        归档某个报告在某天发布时采集的行情（同一天重复发布时覆盖）
+
+        只覆盖本次采集到的品种和板块：之后某次部分数据源失败的重新运行不会抹掉已归档的完整行情
+        """
+        rows = [(report, day.isoformat(), '', quote.key, 0) + tuple(quote[1:])
+                for quote in snapshot.quotes.values()]
+        for category, boards in snapshot.boards.items():
+            rows += [(report, day.isoformat(), category, quote.key, seq) + tuple(quote[1:])
+                     for seq, quote in enumerate(boards)]
+        with self._lock:
+            # 板块的成分每次都可能不同，整个板块替换；单个品种按主键覆盖
+            self._conn.executemany("DELETE FROM snapshot_quotes WHERE report = ? AND date = ? AND category = ?",
+                                   [(report, day.isoformat(), category) for category in snapshot.boards])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO snapshot_quotes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def load_snapshot(self, report, day, keys, board_categories=()):
+        """
+        读取归档的行情快照
+
+        Returns:
+            MarketSnapshot（没有归档的品种和板块列入 missing），fetched_at 为 None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, key, name, price, change_pct, amount, net_inflow, unit, decimals, source "
+                "FROM snapshot_quotes WHERE report = ? AND date = ? ORDER BY category, seq",
+                (report, day.isoformat())).fetchall()
+        quotes, boards = {}, {}
+        for category, key, *fields in rows:
+            quote = Quote(key, *fields)
+            if not category:
+                quotes[key] = quote
+            else:
+                boards.setdefault(category, []).append(quote)
+        quotes = {key: quotes[key] for key in keys if key in quotes}
+        boards = {category: boards[category] for category in board_categories if category in boards}
+        missing = [key for key in keys if key not in quotes]
+        missing += [category for category in board_categories if category not in boards]
+        return MarketSnapshot(quotes, boards, missing, {}, None)
+
+
+def history_summary(store, symbols, as_of=None, days=5):
+    """
+    报告用的历史统计
+
+    Returns:
+        {'ytd': {品种: 年初至今涨跌幅}, 'change': {品种: 近N日涨跌幅},
+         'turnover': {品种: 近N日成交额}, 'days': N}
+    """
+    return {
+        'ytd': store.ytd_change(symbols, as_of),
+        'change': store.n_day_change(symbols, days, as_of),
+        'turnover': store.turnover(symbols, days, as_of),
+        'days': days,
+    }
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+共享HTTP客户端
+功能：基于连接池的 requests.Session，保持长连接，区分连接/读取超时，
+对幂等请求按带抖动的指数退避自动重试，并记录每个请求的耗时、收发字节数和微信错误码。
+两个发布程序的全部微信接口调用都通过这里发出。
+requests 在创建客户端时才导入，只导入本模块（例如读取 WECHAT_API_BASE）不会加载它。
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from metrics import current_scope
+
+
+WECHAT_API_BASE = "https://api.weixin.qq.com"
+
+# 默认超时（秒）：建立连接 / 等待响应
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+# 可重试的HTTP状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# 保留的请求记录条数（常驻进程中旧记录自动丢弃）
+MAX_RECORDS = 5000
+
+# 只从不超过该大小的JSON响应中解析 errcode
+ERRCODE_SCAN_BYTES = 64 * 1024
+
+
+def _body_size(body):
+    """请求体字节数（流式请求体无法预知时返回0）"""
+    if isinstance(body, bytes):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    return 0
+
+
+def _errcode(response):
+    """微信接口在HTTP 200中返回的 errcode（非0时），其他情况返回None"""
+    content = response.content
+    if len(content) > ERRCODE_SCAN_BYTES or b'"errcode"' not in content:
+        return None
+    try:
+        errcode = json.loads(content).get('errcode')
+    except (ValueError, AttributeError):
+        return None
+    return errcode or None
+
+
+class HttpClient:
+    """带连接池、重试和耗时记录的HTTP客户端（线程安全）"""
+
+    def __init__(self, pool_size=10, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        """
+        Args:
+            pool_size: 每个主机保持的最大连接数
+            max_retries: 最大重试次数（不含首次请求）
+            backoff_base: 退避基数（秒），第n次重试最长等待 backoff_base * 2**n
+            backoff_max: 单次退避的最长等待（秒）
+            connect_timeout: 默认连接超时（秒）
+            read_timeout: 默认读取超时（秒）
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = (connect_timeout, read_timeout)
+        self.records = deque(maxlen=MAX_RECORDS)
+        self._records_lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        # 重试由本类自行处理（需要抖动退避和耗时记录），适配器层不再重试
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _backoff(self, attempt):
+        """全抖动指数退避：在 [0, min(上限, 基数*2^attempt)] 内随机等待"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, method, url, status, elapsed, attempts, error=None, response=None):
+        # 只记录路径，避免把 access_token 等查询参数写进日志
+        parts = urlsplit(url)
+        pipeline, stage = current_scope()
+        record = {
+            'method': method,
+            'host': parts.netloc,
+            'path': parts.path,
+            'status': status,
+            'elapsed': elapsed,
+            'attempts': attempts,
+            'error': error,
+            'sent': _body_size(response.request.body) if response is not None else 0,
+            'received': len(response.content) if response is not None else 0,
+            'errcode': _errcode(response) if response is not None else None,
+            'pipeline': pipeline,
+            'stage': stage,
+        }
+        with self._records_lock:
+            record['seq'] = next(self._sequence)
+            self.records.append(record)
+        return record
+
+    def mark(self):
+        """返回当前位置，之后可用 records_since 取出此后的请求记录"""
+        with self._records_lock:
+            return self.records[-1]['seq'] if self.records else 0
+
+    def records_since(self, mark=0, pipeline=None):
+        """
+        返回 mark 之后的请求记录
+
+        Args:
+            mark: mark() 的返回值
+            pipeline: 只返回该流程发出的请求（同一进程内并发执行多个流程时用于区分）
+        """
+        with self._records_lock:
+            records = list(self.records)
+        return [record for record in records
+                if record['seq'] > mark and (pipeline is None or record['pipeline'] == pipeline)]
+
+    def request(self, method, url, idempotent=None, timeout=None, **kwargs):
+        """
+        发送请求
+
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            idempotent: 是否幂等（幂等请求在网络错误和5xx/429时重试）；
+                默认按HTTP方法判断。非幂等请求只在连接超时（请求尚未发出）时重试
+            timeout: 秒数或 (连接超时, 读取超时)，默认使用客户端配置
+            **kwargs: 透传给 requests.Session.request
+
+        Returns:
+            requests.Response；重试耗尽后抛出最后一次的异常
+        """
+        import requests
+
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        timeout = timeout or self.timeout
+
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except requests.exceptions.ConnectTimeout as e:
+                error, retryable = e, True
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error, retryable = e, idempotent
+            else:
+                if idempotent and response.status_code in RETRY_STATUS and attempt <= self.max_retries:
+                    response.close()
+                    time.sleep(self._backoff(attempt - 1))
+                    continue
+                self._record(method, url, response.status_code,
+                             time.perf_counter() - start, attempt, response=response)
+                return response
+
+            if not retryable or attempt > self.max_retries:
+                self._record(method, url, None, time.perf_counter() - start, attempt,
+                             error=type(error).__name__)
+                raise error
+            print(f"⚠ 请求失败（{type(error).__name__}），第{attempt}次重试...")
+            time.sleep(self._backoff(attempt - 1))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def latency_summary(self, records=None):
+        """返回请求的耗时摘要行（默认为全部已记录的请求）"""
+        if records is None:
+            records = self.records_since()
+        lines = []
+        for record in records:
+            status = record['status'] if record['status'] is not None else record['error']
+            retry = f"，重试{record['attempts'] - 1}次" if record['attempts'] > 1 else ""
+            errcode = f"，errcode {record['errcode']}" if record['errcode'] else ""
+            lines.append(f"{record['method']} {record['path']} -> {status}{errcode}，"
+                         f"耗时{record['elapsed'] * 1000:.0f}ms{retry}")
+        return lines
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_guard = threading.Lock()
+
+
+def get_client():
+    """返回进程内共享的 HttpClient"""
+    global _client
+    with _client_guard:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""
+行情数据采集
+功能：并发获取早报、晚报需要的指数、期货、板块行情。
+同一数据源的多个品种合并为一次批量请求（东方财富 ulist、新浪 hq 多代码查询），
+不同数据源并行请求，每个数据源有独立的耗时预算，超出预算的品种记为缺失而不阻塞发布；
+全部缺失（或缺失比例超过配置的上限）时由 MarketSnapshot.require 判定为采集失败。
+接口说明见 financial-report-publisher/references/data-sources.md
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import NamedTuple, Optional
+
+from http_client import get_client
+from metrics import current_scope, stage_scope
+
+
+EASTMONEY_BASE = "https://push2.eastmoney.com"
+SINA_BASE = "https://hq.sinajs.cn"
+
+# 每个数据源的耗时预算（秒）
+DEFAULT_BUDGETS = {'eastmoney': 3.0, 'sina': 3.0}
+
+# 单次批量请求最多包含的品种数
+BATCH_SIZE = 50
+
+# 东方财富板块分类（fs参数）
+BOARD_FILTERS = {
+    'industry': 'm:90+t:2',   # 行业板块
+    'concept': 'm:90+t:3',    # 概念板块
+}
+
+
+class Instrument(NamedTuple):
+    """品种定义"""
+    key: str                  # 内部代码
+    name: str                 # 显示名称
+    source: str               # 数据源：eastmoney / sina
+    code: str                 # 数据源代码（东方财富secid / 新浪symbol）
+    unit: str = ''            # 价格单位
+    decimals: int = 2         # 价格小数位
+
+
+class Quote(NamedTuple):
+    """行情记录"""
+    key: str
+    name: str
+    price: float
+    change_pct: float
+    amount: Optional[float] = None       # 成交额（元）
+    net_inflow: Optional[float] = None   # 主力净流入（元）
+    unit: str = ''
+    decimals: int = 2
+    source: str = ''
+
+
+class MarketDataUnavailable(RuntimeError):
+    """行情缺失过多，不能用于生成报告"""
+
+
+class MarketSnapshot:
+    """一次采集的结果"""
+
+    def __init__(self, quotes, boards, missing, timings, fetched_at):
+        self.quotes = quotes          # {品种代码: Quote}
+        self.boards = boards          # {板块分类: [Quote]}
+        self.missing = missing        # 未获取到的品种代码
+        self.timings = timings        # {数据源: 耗时秒数}
+        self.fetched_at = fetched_at
+
+    def get(self, key):
+        return self.quotes.get(key)
+
+    def require(self, max_missing=None):
+        """
+        检查采集结果能否用于生成报告
+
+        Args:
+            max_missing: 允许缺失的比例（0~1），None 表示只要不是全部缺失即可
+
+        Returns:
+            self；全部缺失或缺失比例超过 max_missing 时抛出 MarketDataUnavailable
+        """
+        total = len(self.quotes) + len(self.boards) + len(self.missing)
+        ratio = len(self.missing) / total if total else 0
+        if ratio >= 1 or (max_missing is not None and ratio > max_missing):
+            raise MarketDataUnavailable(f"{len(self.missing)}/{total}项行情未获取到: {', '.join(self.missing)}")
+        return self
+
+
+INSTRUMENTS = {instrument.key: instrument for instrument in [
+    # A股指数（深证综指仅用于计算两市成交额）
+    Instrument('sh_index', '上证指数', 'eastmoney', '1.000001', '点'),
+    Instrument('sz_index', '深证成指', 'eastmoney', '0.399001', '点'),
+    Instrument('cyb_index', '创业板指', 'eastmoney', '0.399006', '点'),
+    Instrument('sz_composite', '深证综指', 'eastmoney', '0.399106', '点'),
+    # 美股指数
+    Instrument('dji', '道琼斯指数', 'eastmoney', '100.DJIA', '点'),
+    Instrument('spx', '标普500指数', 'eastmoney', '100.SPX', '点'),
+    Instrument('ndx', '纳斯达克指数', 'eastmoney', '100.NDX', '点'),
+    Instrument('vix', '恐慌指数VIX', 'eastmoney', '100.VIX', ''),
+    # 亚太指数
+    Instrument('n225', '日经225指数', 'eastmoney', '100.N225', '点'),
+    Instrument('kospi', '韩国综合指数', 'eastmoney', '100.KS11', '点'),
+    Instrument('hsi', '恒生指数', 'eastmoney', '100.HSI', '点'),
+    # 国内期货
+    Instrument('au_main', '沪金主连', 'eastmoney', '113.aum', '元/克'),
+    Instrument('ag_main', '沪银主连', 'eastmoney', '113.agm', '元/千克', 0),
+    Instrument('sc_main', '上期所原油', 'eastmoney', '142.scm', '元/桶', 0),
+    Instrument('cu_main', '沪铜', 'eastmoney', '113.cum', '元/吨', 0),
+    Instrument('rb_main', '螺纹钢', 'eastmoney', '113.rbm', '元/吨', 0),
+    # 外盘期货
+    Instrument('comex_gold', 'COMEX黄金', 'sina', 'hf_GC', '美元/盎司', 1),
+    Instrument('wti', 'WTI原油', 'sina', 'hf_CL', '美元/桶'),
+    Instrument('btc', '比特币', 'sina', 'hf_BTC', '美元', 0),
+    # 美股行业ETF（代表板块涨跌）
+    Instrument('us_energy', '能源板块', 'eastmoney', '107.XLE'),
+    Instrument('us_health', '医疗保健', 'eastmoney', '107.XLV'),
+    Instrument('us_industrial', '工业板块', 'eastmoney', '107.XLI'),
+    Instrument('us_tech', '科技板块', 'eastmoney', '107.XLK'),
+    Instrument('us_financial', '金融板块', 'eastmoney', '107.XLF'),
+    Instrument('us_realestate', '房地产', 'eastmoney', '107.XLRE'),
+    Instrument('us_utilities', '公用事业', 'eastmoney', '107.XLU'),
+    Instrument('us_consumer', '可选消费', 'eastmoney', '107.XLY'),
+    Instrument('us_staples', '必需消费', 'eastmoney', '107.XLP'),
+    Instrument('us_materials', '原材料', 'eastmoney', '107.XLB'),
+    Instrument('us_comm', '通信服务', 'eastmoney', '107.XLC'),
+    # 美股明星个股
+    Instrument('nvda', '英伟达(NVDA)', 'eastmoney', '105.NVDA', '美元'),
+    Instrument('tsla', '特斯拉(TSLA)', 'eastmoney', '105.TSLA', '美元'),
+    Instrument('msft', '微软(MSFT)', 'eastmoney', '105.MSFT', '美元'),
+    Instrument('aapl', '苹果(AAPL)', 'eastmoney', '105.AAPL', '美元'),
+    Instrument('amzn', '亚马逊(AMZN)', 'eastmoney', '105.AMZN', '美元'),
+    Instrument('meta', 'Meta(META)', 'eastmoney', '105.META', '美元'),
+    Instrument('googl', '谷歌(GOOGL)', 'eastmoney', '105.GOOGL', '美元'),
+]}
+
+US_SECTORS = ['us_energy', 'us_health', 'us_industrial', 'us_tech', 'us_financial',
+              'us_realestate', 'us_utilities', 'us_consumer', 'us_staples',
+              'us_materials', 'us_comm']
+US_STARS = ['nvda', 'tsla', 'msft', 'aapl', 'amzn', 'meta', 'googl']
+
+# 各报告需要的品种和板块
+EVENING_INSTRUMENTS = ['sh_index', 'sz_index', 'cyb_index', 'sz_composite',
+                       'dji', 'spx', 'ndx',
+                       'comex_gold', 'au_main', 'ag_main', 'wti', 'sc_main', 'cu_main', 'rb_main']
+EVENING_BOARDS = ['industry']
+MORNING_INSTRUMENTS = (['dji', 'spx', 'ndx', 'vix', 'n225', 'kospi', 'hsi',
+                        'comex_gold', 'wti', 'btc'] + US_SECTORS + US_STARS)
+MORNING_BOARDS = []
+
+
+def _to_float(value):
+    """东方财富缺失值为 '-'"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _timed(scope, func, *args):
+    """在调用方的流程阶段内执行函数并返回 (耗时秒数, 结果)"""
+    start = time.perf_counter()
+    # 工作线程沿用提交任务的流程阶段，HTTP请求指标才能归属到该阶段
+    with stage_scope(*scope):
+        result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class MarketDataClient:
+    """行情采集客户端"""
+
+    def __init__(self, eastmoney_base=EASTMONEY_BASE, sina_base=SINA_BASE, budgets=None,
+                 http=None, max_workers=8):
+        """
+        Args:
+            eastmoney_base: 东方财富接口地址（可指向本地替身服务）
+            sina_base: 新浪接口地址
+            budgets: 各数据源耗时预算（秒），缺省使用 DEFAULT_BUDGETS
+            http: HttpClient，缺省使用共享客户端
+            max_workers: 并发请求数
+        """
+        self.eastmoney_base = eastmoney_base.rstrip('/')
+        self.sina_base = sina_base.rstrip('/')
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.http = http or get_client()
+        self.max_workers = max_workers
+
+    @classmethod
+    def from_config(cls, config):
+        """从 config.json 的 data_sources 段创建（该段可省略）"""
+        sources = config.get('data_sources', {})
+        return cls(eastmoney_base=sources.get('eastmoney_base', EASTMONEY_BASE),
+                   sina_base=sources.get('sina_base', SINA_BASE),
+                   budgets=sources.get('budgets'))
+
+    # ------------------------------------------------------------ 东方财富
+
+    def _fetch_eastmoney(self, instruments, budget):
+        """批量获取东方财富行情（ulist 接口一次查询多个secid）"""
+        by_secid = {instrument.code: instrument for instrument in instruments}
+        response = self.http.get(
+            f"{self.eastmoney_base}/api/qt/ulist.np/get",
+            params={
+                'fltt': '2',
+                'invt': '2',
+                'secids': ','.join(by_secid),
+                'fields': 'f12,f13,f14,f2,f3,f6,f62',
+            },
+            timeout=(min(3, budget), budget),
+        )
+        quotes = {}
+        for row in ((response.json().get('data') or {}).get('diff') or []):
+            instrument = by_secid.get(f"{row.get('f13')}.{row.get('f12')}")
+            price, change_pct = _to_float(row.get('f2')), _to_float(row.get('f3'))
+            if instrument is None or price is None or change_pct is None:
+                continue
+            quotes[instrument.key] = Quote(
+                instrument.key, instrument.name, price, change_pct,
+                amount=_to_float(row.get('f6')), net_inflow=_to_float(row.get('f62')),
+                unit=instrument.unit, decimals=instrument.decimals, source='eastmoney')
+        return quotes
+
+    def _fetch_boards(self, category, budget, page_size=100):
+        """获取东方财富板块全量列表（按涨跌幅排序，分页直到取完）"""
+        boards = []
+        page = 1
+        while True:
+            response = self.http.get(
+                f"{self.eastmoney_base}/api/qt/clist/get",
+                params={
+                    'pn': str(page), 'pz': str(page_size), 'po': '1', 'np': '1',
+                    'fltt': '2', 'invt': '2', 'fid': 'f3',
+                    'fs': BOARD_FILTERS[category],
+                    'fields': 'f12,f14,f2,f3,f62',
+                },
+                timeout=(min(3, budget), budget),
+            )
+            data = response.json().get('data') or {}
+            rows = data.get('diff') or []
+            for row in rows:
+                price, change_pct = _to_float(row.get('f2')), _to_float(row.get('f3'))
+                if price is None or change_pct is None:
+                    continue
+                boards.append(Quote(row.get('f12'), row.get('f14'), price, change_pct,
+                                    net_inflow=_to_float(row.get('f62')), source='eastmoney'))
+            if not rows or page * page_size >= data.get('total', 0):
+                return boards
+            page += 1
+
+    # ------------------------------------------------------------ 新浪
+
+    def _fetch_sina(self, instruments, budget):
+        """批量获取新浪行情（list 参数一次查询多个代码）"""
+        by_symbol = {instrument.code: instrument for instrument in instruments}
+        response = self.http.get(
+            f"{self.sina_base}/list={','.join(by_symbol)}",
+            headers={'Referer': 'https://finance.sina.com.cn'},
+            timeout=(min(3, budget), budget),
+        )
+        quotes = {}
+        for line in response.content.decode('gbk', 'replace').splitlines():
+            if '=' not in line:
+                continue
+            head, _, body = line.partition('=')
+            symbol = head.strip().replace('var hq_str_', '')
+            instrument = by_symbol.get(symbol)
+            fields = body.strip().strip(';').strip('"').split(',')
+            if instrument is None or len(fields) < 8:
+                continue
+            try:
+                if symbol.startswith('hf_'):
+                    # 外盘期货：0 最新价，7 昨结算
+                    price, previous = float(fields[0]), float(fields[7])
+                else:
+                    # 沪深行情：2 昨收，3 最新价
+                    price, previous = float(fields[3]), float(fields[2])
+            except ValueError:
+                continue
+            if not previous:
+                continue
+            quotes[instrument.key] = Quote(
+                instrument.key, instrument.name, price,
+                round((price - previous) / previous * 100, 2),
+                unit=instrument.unit, decimals=instrument.decimals, source='sina')
+        return quotes
+
+    # ------------------------------------------------------------ 并发调度
+
+    def fetch(self, keys, board_categories=()):
+        """
+        并发获取行情
+
+        Args:
+            keys: 品种代码列表（见 INSTRUMENTS）
+            board_categories: 需要的板块分类（见 BOARD_FILTERS）
+
+        Returns:
+            MarketSnapshot；超出预算或请求失败的品种记入 missing
+        """
+        instruments = [INSTRUMENTS[key] for key in dict.fromkeys(keys)]
+        tasks = []  # (数据源, 标识, 函数, 参数)
+        for source, fetcher in (('eastmoney', self._fetch_eastmoney), ('sina', self._fetch_sina)):
+            group = [instrument for instrument in instruments if instrument.source == source]
+            for batch in _chunks(group, BATCH_SIZE):
+                tasks.append((source, 'quotes', fetcher, (batch, self.budgets[source])))
+        for category in board_categories:
+            tasks.append(('eastmoney', category, self._fetch_boards,
+                          (category, self.budgets['eastmoney'])))
+
+        quotes, boards, timings = {}, {}, {}
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        scope = current_scope()
+        try:
+            futures = {executor.submit(_timed, scope, func, *args): (source, kind)
+                       for source, kind, func, args in tasks}
+            for source in dict.fromkeys(source for source, _, _, _ in tasks):
+                # 每个数据源在自己的预算内等待，超时的请求直接放弃
+                deadline = start + self.budgets[source]
+                pending = [future for future, (s, _) in futures.items() if s == source]
+                done, not_done = wait(pending, timeout=max(0, deadline - time.perf_counter()))
+                for future in done:
+                    _, kind = futures[future]
+                    try:
+                        elapsed, result = future.result()
+                    except Exception as e:
+                        print(f"⚠ 行情请求失败（{source}）: {e}")
+                        continue
+                    timings[source] = max(timings.get(source, 0), elapsed)
+                    if kind == 'quotes':
+                        quotes.update(result)
+                    else:
+                        boards[kind] = result
+                if not_done:
+                    print(f"⚠ 行情数据源 {source} 超出耗时预算 {self.budgets[source]}秒")
+                    timings[source] = self.budgets[source]
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        missing = [instrument.key for instrument in instruments if instrument.key not in quotes]
+        missing += [category for category in board_categories if category not in boards]
+        return MarketSnapshot(quotes, boards, missing, timings, time.time())
+
+
+# ---------------------------------------------------------------- 格式化
+
+def format_change(change_pct):
+    """涨跌幅文字：涨1.26% / 跌1.26% / 平"""
+    if change_pct > 0:
+        return f"涨{change_pct:.2f}%"
+    if change_pct < 0:
+        return f"跌{-change_pct:.2f}%"
+    return "平"
+
+
+def format_price(quote):
+    """带单位的价格文字"""
+    return f"{quote.price:.{quote.decimals}f}{quote.unit}"
+
+
+def format_money(amount, inflow_word="净流入", outflow_word="净流出"):
+    """资金流向文字（亿元）"""
+    if amount >= 0:
+        return f"{inflow_word}{amount / 1e8:.2f}亿元"
+    return f"{outflow_word}{-amount / 1e8:.2f}亿元"
+
+
+def format_turnover(amount):
+    """成交额文字：1.98万亿元 / 8650亿元"""
+    if amount >= 1e12:
+        return f"{amount / 1e12:.2f}万亿元"
+    return f"{amount / 1e8:.0f}亿元"
+
+
+# 板块名称对应的图标，未列出的板块使用默认图标
+BOARD_EMOJI = {
+    '半导体': '🚀', '消费电子': '📱', '船舶制造': '🚢', '航天航空': '✈️',
+    '互联网服务': '📉', '有色金属': '🔩', '光伏设备': '☀️', '小金属': '🔋',
+    '能源板块': '⛽', '医疗保健': '💊', '工业板块': '🏭', '科技板块': '💻',
+    '金融板块': '💳', '房地产': '🏠', '公用事业': '💡', '可选消费': '🛍️',
+    '必需消费': '🛒', '原材料': '⛏️', '通信服务': '📡',
+}
+
+
+def board_emoji(name, default):
+    return BOARD_EMOJI.get(name, default)
+
+
+def format_quote_line(snapshot, key):
+    """单个品种的一行文字，缺失时显示暂无数据"""
+    quote = snapshot.get(key)
+    if quote is None:
+        return f"{INSTRUMENTS[key].name}：暂无数据"
+    return f"{quote.name}：{format_price(quote)}，{format_change(quote.change_pct)}"
+
+
+if __name__ == "__main__":
+    # 用法: python market_data.py [--stub]  打印早报、晚报需要的全部行情
+    import sys
+
+    if '--stub' in sys.argv:
+        from market_data_stub import start_stub_server
+        server, base_url = start_stub_server()
+        client = MarketDataClient(eastmoney_base=base_url, sina_base=base_url)
+    else:
+        client = MarketDataClient()
+
+    snapshot = client.fetch(EVENING_INSTRUMENTS + MORNING_INSTRUMENTS,
+                            EVENING_BOARDS + MORNING_BOARDS)
+    for key in snapshot.quotes:
+        print(format_quote_line(snapshot, key))
+    for category, boards in snapshot.boards.items():
+        print(f"板块（{category}）: {len(boards)} 个")
+    print(f"缺失: {snapshot.missing or '无'}")
+    print("耗时: " + "，".join(f"{source} {elapsed * 1000:.0f}ms"
+                             for source, elapsed in snapshot.timings.items()))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+行情数据源本地替身服务
+功能：用 fixtures/market_data 下录制的行情数据模拟东方财富 push2/push2his 和新浪 hq 接口，
+用于离线运行发布流程、基准测试和调试数据采集层。
+
+用法: python market_data_stub.py [端口] [延迟秒数]
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'market_data')
+
+# clist 接口的 fs 参数与录制文件的对应关系
+BOARD_FIXTURES = {
+    'm:90+t:2': 'eastmoney_boards_industry.json',
+    'm:90+t:3': 'eastmoney_boards_concept.json',
+}
+
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    """读取录制的行情数据"""
+    def load_json(name):
+        path = os.path.join(fixtures_dir, name)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    ulist = {f"{row['f13']}.{row['f12']}": row for row in load_json('eastmoney_ulist.json')}
+    boards = {fs: load_json(name) for fs, name in BOARD_FIXTURES.items()}
+    klines = load_json('eastmoney_klines.json') or {}
+    sina = {}
+    with open(os.path.join(fixtures_dir, 'sina_hq.txt'), 'r', encoding='utf-8') as f:
+        for line in f:
+            if '=' in line:
+                sina[line.split('=')[0].replace('var hq_str_', '').strip()] = line.strip()
+    return {'ulist': ulist, 'boards': boards, 'klines': klines, 'sina': sina}
+
+
+class MarketDataStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type='application/json; charset=utf-8'):
+        time.sleep(self.server.latency)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 调用方超出耗时预算后已断开连接
+            self.close_connection = True
+
+    def _send_json(self, data):
+        self._send(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        fixtures = self.server.fixtures
+
+        if parts.path == '/api/qt/ulist.np/get':
+            rows = [fixtures['ulist'][secid] for secid in query.get('secids', '').split(',')
+                    if secid in fixtures['ulist']]
+            self._send_json({'rc': 0, 'data': {'total': len(rows), 'diff': rows}})
+        elif parts.path == '/api/qt/clist/get':
+            rows = list(fixtures['boards'].get(query.get('fs'), []))
+            field = query.get('fid', 'f3')
+            rows.sort(key=lambda row: row.get(field, 0), reverse=query.get('po', '1') == '1')
+            page, size = int(query.get('pn', 1)), int(query.get('pz', 20))
+            page_rows = rows[(page - 1) * size:page * size]
+            self._send_json({'rc': 0, 'data': {'total': len(rows), 'diff': page_rows}})
+        elif parts.path == '/api/qt/stock/kline/get':
+            begin = query.get('beg', '0')
+            end = query.get('end', '99999999')
+            klines = [line for line in fixtures['klines'].get(query.get('secid'), [])
+                      if begin <= line[:10].replace('-', '') <= end]
+            self._send_json({'rc': 0, 'data': {'code': query.get('secid'), 'klines': klines}})
+        elif parts.path.startswith('/list='):
+            symbols = unquote(parts.path[len('/list='):]).split(',')
+            lines = [fixtures['sina'].get(symbol, f'var hq_str_{symbol}="";') for symbol in symbols]
+            self._send('\n'.join(lines).encode('gbk'), 'application/javascript; charset=GBK')
+        else:
+            self.send_error(404)
+
+
+def start_stub_server(port=0, latency=0.0, fixtures_dir=FIXTURES_DIR):
+    """
+    在后台线程启动替身服务
+
+    Args:
+        port: 监听端口（0表示随机端口）
+        latency: 每个响应的附加延迟（秒）
+        fixtures_dir: 录制数据目录
+
+    Returns:
+        (server, base_url)，用 server.shutdown() 停止
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), MarketDataStubHandler)
+    server.daemon_threads = True
+    server.fixtures = load_fixtures(fixtures_dir)
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 18080
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    server, base_url = start_stub_server(port, latency)
+    print(f"✓ 行情替身服务已启动: {base_url}")
+    print("  在 config.json 中配置 data_sources.eastmoney_base / eastmoney_his_base / sina_base 指向该地址")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+封面素材缓存（按内容寻址）
+功能：记录每个公众号下"封面内容哈希 -> 永久素材media_id"的映射。
+同一封面（重跑、重试、多账号）再次上传前先查缓存，命中则直接复用media_id，
+不再占用永久素材配额；素材在服务器上被删除后，对应条目会被清除。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from local_store import FileLock, cache_path, read_json, write_json
+
+
+# 草稿接口返回该错误码表示 thumb_media_id 无效（素材已被删除）
+INVALID_MEDIA_ERRCODE = 40007
+
+
+def content_hash(data):
+    """计算封面内容的SHA-256哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class MediaCache:
+    """按公众号分文件存储的 内容哈希 -> media_id 缓存"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or cache_path('media')
+        self._lock = threading.Lock()
+
+    def _paths(self, appid):
+        base = os.path.join(self.directory, appid)
+        return base + '.json', base + '.lock'
+
+    def _update(self, appid, mutate):
+        """在锁内读取、修改并写回缓存文件"""
+        data_path, lock_path = self._paths(appid)
+        with self._lock, FileLock(lock_path):
+            entries = read_json(data_path, {})
+            result = mutate(entries)
+            write_json(data_path, entries)
+            return result
+
+    def lookup(self, appid, digest):
+        """查找内容哈希对应的缓存条目，未命中返回None"""
+        return read_json(self._paths(appid)[0], {}).get(digest)
+
+    def store(self, appid, digest, media_id, url=None, size=None):
+        """记录上传结果"""
+        entry = {'media_id': media_id, 'url': url, 'size': size, 'uploaded_at': time.time()}
+
+        def mutate(entries):
+            entries[digest] = entry
+        self._update(appid, mutate)
+        return entry
+
+    def evict_media(self, appid, media_ids):
+        """清除指定media_id的条目，返回清除的数量"""
+        media_ids = set(media_ids)
+
+        def mutate(entries):
+            stale = [digest for digest, entry in entries.items() if entry['media_id'] in media_ids]
+            for digest in stale:
+                del entries[digest]
+            return len(stale)
+        return self._update(appid, mutate)
+
+    def prune(self, appid, access_token, http, api_base):
+        """
+        与服务器素材列表对账，清除已在服务器上删除的素材条目
+
+        Args:
+            appid: 公众号AppID
+            access_token: 有效的access_token
+            http: HttpClient
+            api_base: 微信接口地址
+
+        Returns:
+            清除的条目数量；获取素材列表失败时返回None
+        """
+        url = f"{api_base}/cgi-bin/material/batchget_material?access_token={access_token}"
+        remote = set()
+        offset = 0
+        while True:
+            body = json.dumps({'type': 'image', 'offset': offset, 'count': 20})
+            result = http.post(url, data=body, idempotent=True,
+                               headers={'Content-Type': 'application/json'}).json()
+            if 'item' not in result:
+                print(f"✗ 获取素材列表失败: {result}")
+                return None
+            remote.update(item['media_id'] for item in result['item'])
+            offset += len(result['item'])
+            if not result['item'] or offset >= result.get('total_count', 0):
+                break
+
+        cached = {entry['media_id'] for entry in read_json(self._paths(appid)[0], {}).values()}
+        return self.evict_media(appid, cached - remote)
+
+
+_cache = None
+_cache_guard = threading.Lock()
+
+
+def get_media_cache():
+    """返回进程内共享的 MediaCache"""
+    global _cache
+    with _cache_guard:
+        if _cache is None:
+            _cache = MediaCache()
+        return _cache
+
+
+if __name__ == "__main__":
+    # 用法: python media_cache.py [config.json]  与服务器素材列表对账并清除失效条目
+    import sys
+
+    from http_client import WECHAT_API_BASE, get_client
+    from token_store import get_token_store
+
+    config_path = sys.argv[1] if len(sys.argv) > 1 else 'config.json'
+    with open(config_path, 'r', encoding='utf-8') as f:
+        wechat = json.load(f)['wechat']
+
+    api_base = wechat.get('api_base', WECHAT_API_BASE).rstrip('/')
+    token, _ = get_token_store().get_token(wechat['appid'], wechat['secret'], api_base=api_base)
+    if not token:
+        sys.exit(1)
+    removed = get_media_cache().prune(wechat['appid'], token, get_client(), api_base)
+    if removed is None:
+        sys.exit(1)
+    print(f"✓ 素材缓存对账完成，清除 {removed} 个失效条目")
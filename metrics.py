@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+发布流程指标
+功能：记录当前线程正在执行的流程和阶段（HTTP请求据此归属到阶段），
+每次 run() 结束后把各阶段耗时/CPU时间、每个HTTP请求的耗时、字节数、重试次数和
+微信错误码写入 JSON Lines 日志，并生成 Prometheus textfile collector 文件用于告警。
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from local_store import cache_path, write_bytes
+
+
+_scope = threading.local()
+
+
+def current_scope():
+    """返回当前线程的 (流程名称, 阶段名称)，不在流程中时为 (None, None)"""
+    return getattr(_scope, 'pipeline', None), getattr(_scope, 'stage', None)
+
+
+@contextlib.contextmanager
+def stage_scope(pipeline, stage):
+    """在该作用域内发出的HTTP请求归属到指定流程阶段"""
+    previous = current_scope()
+    _scope.pipeline, _scope.stage = pipeline, stage
+    try:
+        yield
+    finally:
+        _scope.pipeline, _scope.stage = previous
+
+
+def run_record(report, result, http_records):
+    """
+    汇总一次发布的指标
+
+    Args:
+        report: 报告名称（'evening' / 'morning'）
+        result: PipelineResult
+        http_records: 本次发布期间的HTTP请求记录（见 HttpClient.records_since）
+    """
+    stages = []
+    for stage in result.stages.values():
+        stages.append({'name': stage.name, 'status': result.status(stage.name),
+                       'wall': round(stage.duration, 6), 'cpu': round(stage.cpu, 6)})
+    return {
+        'timestamp': time.time(),
+        'report': report,
+        'success': result.success,
+        'elapsed': round(result.elapsed, 6),
+        'critical_path': [stage.name for stage in result.critical_path()],
+        'stages': stages,
+        'http': [{key: record[key] for key in ('stage', 'method', 'path', 'status', 'elapsed',
+                                                 'attempts', 'sent', 'received', 'errcode', 'error')}
+                 for record in http_records],
+    }
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(record):
+    """把一次发布的指标转换为 Prometheus 文本格式"""
+    samples = {}
+
+    def add(name, help_text, labels, value):
+        metric = samples.setdefault(name, (help_text, {}))[1]
+        key = ','.join(f'{label}="{_label_value(v)}"' for label, v in [('report', record['report'])] + labels)
+        metric[key] = metric.get(key, 0) + value
+
+    add('mip_publish_success', "最近一次发布是否成功", [], int(record['success']))
+    add('mip_publish_last_run_timestamp_seconds', "最近一次发布的时间", [], record['timestamp'])
+    add('mip_publish_duration_seconds', "最近一次发布的总耗时", [], record['elapsed'])
+    for stage in record['stages']:
+        labels = [('stage', stage['name'])]
+        add('mip_stage_duration_seconds', "各阶段耗时", labels, stage['wall'])
+        add('mip_stage_cpu_seconds', "各阶段CPU时间", labels, stage['cpu'])
+        add('mip_stage_success', "各阶段是否成功（沿用上次结果或无需执行记为1，跳过记为0）", labels,
+            int(stage['status'] in ('ok', 'restored', 'unneeded')))
+    for http in record['http']:
+        labels = [('stage', http['stage'] or ''), ('path', http['path'])]
+        status = http['status'] if http['status'] is not None else http['error']
+        add('mip_http_requests', "HTTP请求数", labels + [('status', status)], 1)
+        add('mip_http_request_seconds', "HTTP请求累计耗时", labels, http['elapsed'])
+        add('mip_http_retries', "HTTP重试次数", labels, http['attempts'] - 1)
+        add('mip_http_sent_bytes', "HTTP请求体字节数", labels, http['sent'])
+        add('mip_http_received_bytes', "HTTP响应体字节数", labels, http['received'])
+        if http['errcode']:
+            add('mip_wechat_errors', "微信接口返回的错误码次数",
+                labels + [('errcode', http['errcode'])], 1)
+
+    lines = []
+    for name, (help_text, values) in samples.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{{{labels}}} {value:g}" if isinstance(value, int) else
+                     f"{name}{{{labels}}} {value:.6f}" for labels, value in values.items())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """把每次发布的指标写入 JSON Lines 日志和 Prometheus textfile"""
+
+    def __init__(self, jsonl_path=None, prometheus_dir=None):
+        """
+        Args:
+            jsonl_path: JSON Lines 日志路径，默认为缓存目录下的 metrics.jsonl
+            prometheus_dir: node_exporter textfile collector 目录，为空时不生成
+        """
+        self.jsonl_path = jsonl_path or cache_path('metrics.jsonl')
+        self.prometheus_dir = prometheus_dir
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        settings = config.get('metrics', {})
+        return cls(settings.get('jsonl'), settings.get('prometheus_dir'))
+
+    def export(self, report, result, http_records):
+        """写出一次发布的指标，返回指标记录；写入失败只打印警告"""
+        record = run_record(report, result, http_records)
+        try:
+            with self._lock:
+                directory = os.path.dirname(os.path.abspath(self.jsonl_path))
+                os.makedirs(directory, exist_ok=True)
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if self.prometheus_dir:
+                # textfile collector 只读取 .prom 文件，先写临时文件再原子替换
+                path = os.path.join(self.prometheus_dir, f"mip_{report}.prom")
+                write_bytes(path, prometheus_text(record).encode('utf-8'))
+        except OSError as e:
+            print(f"⚠ 指标写入失败: {e}")
+        return record
@@ -46,15 +46,17 @@ def create_skill_package(skill_dir, output_dir=None):
     print(f"  文件大小: {skill_file.stat().st_size / 1024:.2f} KB")
     return skill_file
 
-if __name__ == "__main__":
+def main(argv=None):
+    """命令行入口：<skill_directory> [output_directory]"""
     import sys
     
-    if len(sys.argv) < 2:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
         print("用法: python package_skill.py <skill_directory> [output_directory]")
         sys.exit(1)
     
-    skill_dir = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    skill_dir = argv[0]
+    output_dir = argv[1] if len(argv) > 1 else None
     
     try:
         create_skill_package(skill_dir, output_dir)
@@ -63,3 +65,6 @@ if __name__ == "__main__":
         import traceback
         traceback.print_exc()
         sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+发布流程依赖图执行器
+功能：把 run() 的各个步骤声明为带依赖关系的阶段，用线程池并行执行互不依赖的阶段
+（例如获取token、生成封面、生成正文），并统计每个阶段耗时、CPU时间和关键路径。
+提供运行日志（见 run_journal）时，已完成的检查点阶段直接沿用上次的输出，从第一个未完成的阶段继续。
+"""
+
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import stage_scope
+
+
+class Stage:
+    """流程中的一个阶段"""
+
+    def __init__(self, name, func, deps=(), label=None, failure_message=None, checkpoint=False):
+        """
+        Args:
+            name: 阶段名称，依赖阶段的结果以该名称作为关键字参数传入
+            func: 阶段函数，接收依赖阶段的结果；返回None或False视为失败
+            deps: 依赖的阶段名称
+            label: 阶段开始时打印的提示
+            failure_message: 阶段失败时打印的提示
+            checkpoint: 成功后把输出写入运行日志（输出必须可以JSON序列化）；也可以是函数，
+                以 (输出, **依赖阶段的结果) 调用，返回False时本次输出不写入日志（下次运行重新执行）
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.label = label
+        self.failure_message = failure_message
+        self.checkpoint = checkpoint
+        self.start = None
+        self.end = None
+        self.cpu = 0.0
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+
+class PipelineResult:
+    """流程执行结果"""
+
+    def __init__(self, stages, results, failed, skipped, started, finished, restored=(), unneeded=()):
+        self.stages = stages
+        self.results = results
+        self.failed = failed
+        self.skipped = skipped
+        self.restored = list(restored)
+        self.unneeded = list(unneeded)
+        self.started = started
+        self.finished = finished
+
+    @property
+    def success(self):
+        return not self.failed and not self.skipped
+
+    @property
+    def elapsed(self):
+        return self.finished - self.started
+
+    def status(self, name):
+        """阶段状态：ok / failed / skipped / restored（沿用运行日志）/ unneeded（下游均已完成，无需执行）"""
+        for status, names in (('failed', self.failed), ('skipped', self.skipped),
+                              ('restored', self.restored), ('unneeded', self.unneeded)):
+            if name in names:
+                return status
+        return 'ok'
+
+    def critical_path(self):
+        """
+        计算关键路径：从最后完成的阶段出发，沿着"最晚完成的依赖"回溯
+
+        Returns:
+            按执行顺序排列的阶段列表
+        """
+        done = [stage for stage in self.stages.values() if stage.end is not None]
+        if not done:
+            return []
+        stage = max(done, key=lambda s: s.end)
+        path = [stage]
+        while True:
+            deps = [self.stages[name] for name in stage.deps if self.stages[name].end is not None]
+            if not deps:
+                break
+            stage = max(deps, key=lambda s: s.end)
+            path.append(stage)
+        return list(reversed(path))
+
+    def timing_lines(self):
+        """返回各阶段耗时与关键路径的摘要行"""
+        lines = []
+        for stage in self.stages.values():
+            if stage.end is None:
+                continue
+            offset = (stage.start - self.started) * 1000
+            lines.append(f"{stage.name}: 耗时{stage.duration * 1000:.0f}ms，CPU{stage.cpu * 1000:.0f}ms"
+                         f"（开始于+{offset:.0f}ms）")
+        if self.restored:
+            lines.append(f"沿用上次运行: {', '.join(self.restored)}")
+        path = self.critical_path()
+        if path:
+            chain = " -> ".join(f"{stage.name}({stage.duration * 1000:.0f}ms)" for stage in path)
+            lines.append(f"关键路径: {chain}")
+        lines.append(f"总耗时: {self.elapsed * 1000:.0f}ms")
+        return lines
+
+
+class Pipeline:
+    """按依赖关系并行执行阶段的流程"""
+
+    def __init__(self, max_workers=4, name=None, journal=None):
+        """
+        Args:
+            max_workers: 并行执行的最大阶段数
+            name: 流程名称，阶段内发出的HTTP请求按该名称和阶段名称归属（见 metrics）
+            journal: RunJournal，为None时不记录检查点
+        """
+        self.max_workers = max_workers
+        self.name = name
+        self.journal = journal
+        self.stages = {}
+
+    def add(self, name, func, deps=(), label=None, failure_message=None, checkpoint=False):
+        """添加阶段（依赖的阶段必须先添加）"""
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"阶段 {name} 依赖未定义的阶段 {dep}")
+        self.stages[name] = Stage(name, func, deps, label, failure_message, checkpoint)
+        return self
+
+    def _restore(self):
+        """
+        从运行日志恢复已完成的检查点阶段
+
+        Returns:
+            (恢复的输出, 无需执行的阶段)：只被已恢复阶段依赖的上游阶段不再执行
+        """
+        restored = {}
+        if self.journal is not None:
+            for stage in self.stages.values():
+                if stage.checkpoint:
+                    done, value = self.journal.get(stage.name)
+                    if done:
+                        restored[stage.name] = value
+
+        # 阶段按依赖顺序添加，逆序遍历即可先确定下游是否需要执行
+        needed = set()
+        for name in reversed(list(self.stages)):
+            if name in restored:
+                continue
+            dependents = [stage.name for stage in self.stages.values() if name in stage.deps]
+            if not dependents or any(dependent in needed for dependent in dependents):
+                needed.add(name)
+        unneeded = [name for name in self.stages if name not in restored and name not in needed]
+        return restored, unneeded
+
+    @staticmethod
+    def _should_record(stage, value, results):
+        """阶段输出是否写入运行日志"""
+        if callable(stage.checkpoint):
+            return bool(stage.checkpoint(value, **{dep: results[dep] for dep in stage.deps}))
+        return bool(stage.checkpoint)
+
+    def _execute(self, stage, results):
+        if stage.label:
+            print(f"\n{stage.label}")
+        # 阶段在线程池的单个线程内执行，线程CPU时间即为该阶段的CPU时间
+        # （阶段内部再开线程的部分不计入）
+        cpu_start = time.thread_time()
+        stage.start = time.perf_counter()
+        try:
+            with stage_scope(self.name, stage.name):
+                return stage.func(**{dep: results[dep] for dep in stage.deps})
+        except Exception as e:
+            print(f"✗ 阶段 {stage.name} 异常: {e}")
+            traceback.print_exc()
+            return None
+        finally:
+            stage.end = time.perf_counter()
+            stage.cpu = time.thread_time() - cpu_start
+
+    def run(self):
+        """
+        执行流程：依赖全部成功的阶段立即提交，任一阶段失败时跳过其下游阶段
+
+        Returns:
+            PipelineResult
+        """
+        restored, unneeded = self._restore()
+        results = dict(restored)
+        failed = []
+        skipped = []
+        pending = {name: stage for name, stage in self.stages.items()
+                   if name not in restored and name not in unneeded}
+        running = {}
+        started = time.perf_counter()
+        if restored:
+            print(f"↺ 沿用上次运行已完成的阶段: {', '.join(restored)}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if any(dep in failed or dep in skipped for dep in stage.deps):
+                        skipped.append(name)
+                        del pending[name]
+                    elif all(dep in results for dep in stage.deps):
+                        running[executor.submit(self._execute, stage, dict(results))] = stage
+                        del pending[name]
+
+                if not running:
+                    # 剩余阶段的依赖都无法满足
+                    skipped.extend(pending)
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    value = future.result()
+                    if value is None or value is False:
+                        failed.append(stage.name)
+                        if stage.failure_message:
+                            print(stage.failure_message)
+                    else:
+                        results[stage.name] = value
+                        if self.journal is not None and self._should_record(stage, value, results):
+                            self.journal.record(stage.name, value)
+
+        return PipelineResult(self.stages, results, failed, skipped,
+                              started, time.perf_counter(), restored, unneeded)
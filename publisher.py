@@ -0,0 +1,638 @@
+# -*- coding: utf-8 -*-
+"""
+发布器核心与报告类型注册表
+功能：早报、晚报等报告类型共用一套发布流程（获取token、生成和上传封面、生成正文、创建草稿、
+多公众号分发、断点续跑、指标导出），每种报告只声明自己的数据需求、封面主题和版式，
+用 @register_report 登记后即可由命令行、调度器按名称运行。同一进程内运行多种报告时，
+HTTP连接池、access_token、字体和封面图层、历史库以及短时间内已获取的行情共用一份。
+报告日期（as_of）贯穿整个流程：当天的报告采集实时行情并归档，历史日期的报告读取归档行情，
+render() 不联网地重新生成某天的正文和封面（见 backfill.py）。
+"""
+
+import importlib
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+from cover_archive import CoverArchive
+from cover_cache import CoverCache, date_label
+from cover_encoder import CoverEncoder
+from drafts import build_article, check_batch, encode_draft
+from fanout import AccountFanout
+from history_store import HistoryStore, history_summary
+from http_client import WECHAT_API_BASE, get_client
+from market_data import MarketDataClient, MarketDataUnavailable, MarketSnapshot
+from media_cache import INVALID_MEDIA_ERRCODE, content_hash, get_media_cache
+from metrics import MetricsExporter
+from pipeline import Pipeline
+from run_journal import RunJournal
+from wechat_api import WeChatApi
+
+
+# 内置报告类型所在的模块（按需导入，导入时向注册表登记）
+BUILTIN_REPORTS = {
+    'morning': 'morning_report_publisher',
+    'evening': 'market_report_publisher',
+    'sectors': 'market_report_publisher',
+}
+
+# 已登记的报告类型：名称 -> 发布器类
+REPORT_TYPES = {}
+
+# 同一进程内其他报告在该时长（秒）内获取的行情直接复用（config.json 的 data_sources.share_seconds）
+SHARE_SECONDS = 60
+
+
+def register_report(cls):
+    """类装饰器：按类属性 name 登记报告类型"""
+    if not cls.name:
+        raise ValueError(f"报告类型 {cls.__name__} 缺少 name")
+    REPORT_TYPES[cls.name] = cls
+    return cls
+
+
+def load_report_modules(modules):
+    """导入 config.json 的 report_modules 中列出的模块（模块内用 @register_report 登记自定义报告）"""
+    for module in modules:
+        importlib.import_module(module)
+
+
+def report_names():
+    """全部可用的报告类型名称（内置的在前）"""
+    return list(dict.fromkeys(list(BUILTIN_REPORTS) + list(REPORT_TYPES)))
+
+
+def get_report_class(name):
+    """按名称获取报告类型（内置类型在第一次使用时导入）"""
+    if name not in REPORT_TYPES and name in BUILTIN_REPORTS:
+        importlib.import_module(BUILTIN_REPORTS[name])
+    try:
+        return REPORT_TYPES[name]
+    except KeyError:
+        raise ValueError(f"未知的报告类型: {name}（可选: {', '.join(report_names())}）") from None
+
+
+class SharedResources:
+    """同一份配置下各报告类型共用的资源"""
+
+    def __init__(self, config):
+        self.http = get_client()
+        self.media_cache = get_media_cache()
+        self.market_data = MarketDataClient.from_config(config)
+        self.history = HistoryStore.from_config(config)
+        self.cover_archive = CoverArchive.from_config(config)
+        self.cover_encoder = CoverEncoder.from_config(config)
+        self.cover_cache = CoverCache(encoder=self.cover_encoder)
+        self.metrics = MetricsExporter.from_config(config)
+        self.wechat = WeChatApi.from_config(config)
+        self.share_seconds = config.get('data_sources', {}).get('share_seconds', SHARE_SECONDS)
+        # 允许缺失的行情比例（config.json 的 data_sources.max_missing），默认只有全部缺失时才判定为失败
+        self.max_missing = config.get('data_sources', {}).get('max_missing')
+        self._quotes = {}   # 品种代码 -> (获取时间, Quote)
+        self._boards = {}   # 板块分类 -> (获取时间, [Quote])
+        self._fetch_lock = threading.Lock()
+
+    def fetch(self, keys, board_categories=()):
+        """
+        获取行情：share_seconds 内已获取的品种和板块直接复用，只请求其余部分
+
+        Returns:
+            (MarketSnapshot, 复用的品种和板块数量)
+        """
+        keys = list(dict.fromkeys(keys))
+        # 同时运行的报告依次采集，后到的报告可以复用先到的结果
+        with self._fetch_lock:
+            cutoff = time.time() - self.share_seconds
+            quotes = {key: self._quotes[key][1] for key in keys
+                      if key in self._quotes and self._quotes[key][0] >= cutoff}
+            boards = {category: self._boards[category][1] for category in board_categories
+                      if category in self._boards and self._boards[category][0] >= cutoff}
+            reused = len(quotes) + len(boards)
+            timings = {}
+            pending_keys = [key for key in keys if key not in quotes]
+            pending_boards = [category for category in board_categories if category not in boards]
+            if pending_keys or pending_boards:
+                fetched = self.market_data.fetch(pending_keys, pending_boards)
+                for key, quote in fetched.quotes.items():
+                    self._quotes[key] = (fetched.fetched_at, quote)
+                for category, rows in fetched.boards.items():
+                    self._boards[category] = (fetched.fetched_at, rows)
+                quotes.update(fetched.quotes)
+                boards.update(fetched.boards)
+                timings = fetched.timings
+
+        missing = [key for key in keys if key not in quotes]
+        missing += [category for category in board_categories if category not in boards]
+        return MarketSnapshot(quotes, boards, missing, timings, time.time()), reused
+
+
+_resources = {}
+_resources_lock = threading.Lock()
+
+
+def get_resources(config):
+    """获取某份配置对应的共用资源（配置内容相同即共用）"""
+    key = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    with _resources_lock:
+        resources = _resources.get(key)
+        if resources is None:
+            resources = _resources[key] = SharedResources(config)
+        return resources
+
+
+class ReportPublisher:
+    """
+    报告发布器基类
+
+    子类用类属性声明报告类型，并实现 report_generator 指定的正文生成方法
+    （签名为 (snapshot, stats, as_of)，as_of 为报告日期，返回HTML正文），再用 @register_report 登记。
+    """
+
+    # 报告类型名称（运行日志、指标、调度任务和命令行中使用）
+    name = None
+    # 运行时输出的标题
+    banner = "金融行情自动发布系统"
+    # 图文标题（前面加日期）
+    title = ""
+    # 正文的简称（用于进度输出，如“早报”）
+    report_label = "简报"
+    # 图文摘要
+    digest = ""
+    # 封面主题（见 cover_renderer.THEMES）及归档文件名前缀
+    theme = None
+    cover_prefix = None
+    # 数据需求：行情品种、板块分类、历史日线品种（见 market_data.py / history_store.py）
+    instruments = ()
+    boards = ()
+    history_symbols = ()
+    # 历史统计和日线补位的截止日比报告日期早的天数（早报报道的是前一天收盘的美股）
+    history_lag_days = 0
+    # 正文生成方法名
+    report_generator = None
+    # 可与主图文合并为一次草稿发布的附加图文：{名称: {'title', 'theme', 'digest', 'generator'}}，
+    # 在 config.json 的 <报告名称>.articles 中按顺序列出；generator 方法的签名为 (snapshot)
+    available_articles = {}
+
+    def __init__(self, config_path='config.json'):
+        """初始化配置"""
+        with open(config_path, 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        self.wechat_appid = self.config['wechat']['appid']
+        self.wechat_secret = self.config['wechat']['secret']
+        # 微信接口地址可改为本地替身服务（见 wechat_stub.py）
+        self.api_base = self.config['wechat'].get('api_base', WECHAT_API_BASE).rstrip('/')
+        self.access_token = None
+        self.token_expires_at = None
+        self.stale_media_ids = set()
+        self.resources = get_resources(self.config)
+        self.http = self.resources.http
+        self.media_cache = self.resources.media_cache
+        self.market_data = self.resources.market_data
+        self.history = self.resources.history
+        self.cover_archive = self.resources.cover_archive
+        self.cover_encoder = self.resources.cover_encoder
+        self.cover_cache = self.resources.cover_cache
+        self.metrics = self.resources.metrics
+        self.wechat = self.resources.wechat
+        self.extra_articles = self.config.get(self.name, {}).get('articles', [])
+        unknown = [name for name in self.extra_articles if name not in self.available_articles]
+        if unknown:
+            raise ValueError(f"未知的附加图文: {', '.join(unknown)}"
+                             f"（可选: {', '.join(self.available_articles) or '无'}）")
+
+    def get_wechat_access_token(self):
+        """获取微信公众号access_token（优先复用共享存储中未过期的token）"""
+        try:
+            token, expires_at = self.wechat.get_token(self.wechat_appid, self.wechat_secret,
+                                                      api_base=self.api_base)
+            if token:
+                self.access_token = token
+                self.token_expires_at = expires_at
+                remaining = int(expires_at - time.time())
+                print(f"✓ 获取access_token成功: {self.access_token[:20]}...（剩余有效期{remaining}秒）")
+                return self.access_token
+            return None
+        except Exception as e:
+            print(f"✗ 请求access_token异常: {e}")
+            return None
+
+    def render_cover_data(self, date_str, theme):
+        """
+        返回某个主题、日期的封面JPEG字节：优先使用预渲染的封面（见 cover_cache.py），否则渲染并编码
+
+        Returns:
+            (JPEG字节, 是否命中预渲染缓存)
+        """
+        image_data = self.cover_cache.get(theme, date_str)
+        if image_data:
+            return image_data, True
+        # 渲染引擎依赖PIL，只在需要渲染时导入；渐变背景、装饰和标题图层由渲染引擎缓存，这里只绘制日期
+        from cover_renderer import render_cover
+
+        image = render_cover(theme, date_str)
+        # 编码参数的SSIM搜索每个主题要几秒，不放在发布流程里（见 prepare_cover_encoding）
+        if not self.cover_encoder.is_searched(theme, image):
+            print(f"⚠ 封面主题 {theme} 还没有选定编码参数，按最高质量编码"
+                  f"（运行 cover_cache.py 预渲染或由调度器预热时选定）")
+        return self.cover_encoder.encode(image, theme, search=False), False
+
+    def prepare_cover_encoding(self, date_str):
+        """为各图文的封面主题选定编码参数（SSIM搜索，已缓存的主题跳过），在发布前的预热阶段调用"""
+        from cover_renderer import render_cover
+
+        for theme in self.article_themes():
+            self.cover_encoder.options_for(theme, render_cover(theme, date_str))
+
+    def generate_cover_image(self, date_str, theme=None):
+        """生成封面图片（本地生成，确保文字正确显示），theme 缺省为报告自己的主题"""
+        theme = theme or self.theme
+        try:
+            print(f"正在生成封面图片...")
+
+            image_data, cached = self.render_cover_data(date_str, theme)
+            if cached:
+                print(f"✓ 命中封面预渲染缓存（{len(image_data) // 1024}KB）")
+            else:
+                print(f"✓ 封面图片生成成功（{len(image_data) // 1024}KB）")
+
+            # 只在配置了归档目录时落盘
+            if self.cover_archive:
+                prefix = self.cover_prefix if theme == self.theme and self.cover_prefix else f"cover_{theme}"
+                path = self.cover_archive.save(f"{prefix}_{int(time.time())}.jpg", image_data)
+                print(f"✓ 封面已归档: {path}")
+
+            return image_data
+
+        except ImportError as e:
+            # 依赖在启动时检查（见 cli.py），这里不再在运行中安装
+            print(f"✗ 缺少PIL库（{e}），请先运行: pip install Pillow")
+            return None
+        except Exception as e:
+            print(f"✗ 图片生成异常: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def article_themes(self):
+        """与 _generate_articles 的图文一一对应的封面主题"""
+        return [self.theme] + [self.available_articles[name]['theme'] for name in self.extra_articles]
+
+    def generate_covers(self, date_str):
+        """生成主图文及附加图文的封面（流程阶段），返回JPEG字节列表，任一失败时返回None"""
+        covers = [self.generate_cover_image(date_str, theme) for theme in self.article_themes()]
+        return covers if all(covers) else None
+
+    def upload_image_to_wechat(self, image_data):
+        """上传封面图片（JPEG字节）到微信公众号"""
+        if not self.access_token:
+            print("✗ 缺少access_token，无法上传图片")
+            return None
+
+        try:
+            # 相同内容的封面已上传过时直接复用media_id，不再占用永久素材配额
+            digest = content_hash(image_data)
+            cached = self.media_cache.lookup(self.wechat_appid, digest)
+            if cached:
+                print(f"✓ 命中封面素材缓存，跳过上传，media_id: {cached['media_id']}")
+                return cached['media_id']
+
+            print(f"正在上传封面图片到微信...")
+
+            # 上传到微信（按接口额度排队，token失效时自动刷新并重传）
+            files = {
+                'media': ('cover.jpg', image_data, 'image/jpeg')
+            }
+
+            upload_result = self.wechat.call(self, 'POST', '/cgi-bin/material/add_material',
+                                             params={'type': 'image'}, files=files)
+
+            if 'media_id' in upload_result:
+                media_id = upload_result['media_id']
+                self.media_cache.store(self.wechat_appid, digest, media_id,
+                                       url=upload_result.get('url'), size=len(image_data))
+                print(f"✓ 图片上传成功，media_id: {media_id}")
+                return media_id
+            else:
+                print(f"✗ 图片上传失败: {upload_result}")
+                return None
+
+        except Exception as e:
+            print(f"✗ 图片上传异常: {e}")
+            return None
+
+    def upload_covers(self, covers):
+        """上传全部封面（流程阶段），返回media_id列表，任一失败时返回None"""
+        media_ids = []
+        for image_data in covers:
+            media_id = self.upload_image_to_wechat(image_data)
+            if not media_id:
+                return None
+            media_ids.append(media_id)
+        return media_ids
+
+    def fetch_market_data(self, as_of=None, live=None):
+        """
+        获取报告需要的全部行情（流程阶段）：当天的报告并发采集并归档，历史日期读取归档
+
+        Args:
+            as_of: 报告日期，默认今天
+            live: 是否联网采集（采集结果按 as_of 归档）；默认只有今天的报告联网采集
+        """
+        if live is None:
+            live = as_of is None or as_of == date.today()
+        if not live:
+            return self.load_market_data(as_of)
+        snapshot, reused = self.resources.fetch(self.instruments, self.boards)
+        timings = "，".join(f"{source} {elapsed * 1000:.0f}ms" for source, elapsed in snapshot.timings.items())
+        if reused:
+            timings = "，".join(part for part in (timings, f"复用{reused}项") if part)
+        print(f"✓ 行情数据获取完成：{len(snapshot.quotes)}个品种（{timings}）")
+        if snapshot.missing:
+            print(f"⚠ 以下品种未获取到数据: {', '.join(snapshot.missing)}")
+        # 数据源整体不可用时让本阶段失败，而不是生成一份全是“暂无数据”的报告；稍后重新运行即可
+        snapshot.require(self.resources.max_missing)
+        try:
+            self.history.save_snapshot(self.name, as_of or date.today(), snapshot)
+        except Exception as e:
+            print(f"⚠ 行情快照归档失败: {e}")
+        return snapshot
+
+    def load_market_data(self, as_of):
+        """
+        读取某天归档的行情（不联网）；没有归档的历史日线品种用本地日线补位
+
+        Returns:
+            MarketSnapshot；当天既没有归档也没有日线时返回None
+
+        Raises:
+            MarketDataUnavailable: 缺失的品种超过 data_sources.max_missing（与联网采集相同的完整性检查）
+        """
+        snapshot = self.history.load_snapshot(self.name, as_of, self.instruments, self.boards)
+        pending = [key for key in snapshot.missing if key in self.history_symbols]
+        if pending:
+            snapshot.quotes.update(self.history.bar_quotes(pending, self.history_cutoff(as_of)))
+            snapshot.missing = [key for key in snapshot.missing if key not in snapshot.quotes]
+        if not snapshot.quotes and not snapshot.boards:
+            print(f"⚠ {as_of:%Y-%m-%d} 没有归档的行情")
+            return None
+        print(f"✓ 读取归档行情：{len(snapshot.quotes)}个品种（{as_of:%Y-%m-%d}）")
+        if snapshot.missing:
+            print(f"⚠ 以下品种没有归档数据: {', '.join(snapshot.missing)}")
+        return snapshot.require(self.resources.max_missing)
+
+    def history_cutoff(self, as_of):
+        """历史统计的截止日"""
+        return as_of - timedelta(days=self.history_lag_days)
+
+    def fetch_history(self, as_of=None, update=True):
+        """
+        增量更新历史日线并计算统计（流程阶段）；失败时返回空统计，不阻塞发布
+
+        Args:
+            as_of: 报告日期，默认今天
+            update: 为False时只读取本地日线，不联网
+        """
+        if not self.history_symbols:
+            return {}
+        as_of = as_of or date.today()
+        try:
+            if not update:
+                return history_summary(self.history, self.history_symbols, self.history_cutoff(as_of))
+            added = self.history.update(self.history_symbols, as_of)
+            stats = history_summary(self.history, self.history_symbols, self.history_cutoff(as_of))
+            print(f"✓ 历史行情更新完成：新增{sum(added.values())}条日线")
+            return stats
+        except Exception as e:
+            print(f"⚠ 历史行情更新失败: {e}")
+            return {}
+
+    def _draft_payload(self, title, content, thumb_media_id):
+        """单篇草稿的请求体（UTF-8编码的JSON）"""
+        return encode_draft([build_article(title, content, thumb_media_id, self.digest)])
+
+    def create_wechat_draft(self, title, content, thumb_media_id):
+        """创建微信公众号草稿（单篇图文）"""
+        return self.create_wechat_draft_batch([{'title': title, 'content': content, 'digest': self.digest}],
+                                              [thumb_media_id])
+
+    def create_wechat_draft_batch(self, articles, thumb_media_ids):
+        """
+        把多篇图文合并为一次 draft/add 请求创建草稿
+
+        Args:
+            articles: [{'title', 'content', 'digest'}]，按草稿中的顺序排列
+            thumb_media_ids: 与 articles 一一对应的封面media_id
+
+        Returns:
+            草稿的media_id；失败时返回False
+        """
+        if not self.access_token:
+            print("✗ 缺少access_token，无法创建草稿")
+            return False
+
+        batch = [build_article(article['title'], article['content'], media_id, article.get('digest', ""))
+                 for article, media_id in zip(articles, thumb_media_ids)]
+        problems = check_batch(batch)
+        if problems:
+            print(f"✗ 草稿不满足接口限制，未发送: {'；'.join(problems)}")
+            return False
+
+        try:
+            print(f"正在创建微信公众号草稿（{len(batch)}篇图文）...")
+            # 确保使用UTF-8编码；按接口额度排队，token失效时自动刷新并重发
+            result = self.wechat.call(
+                self, 'POST', '/cgi-bin/draft/add',
+                data=encode_draft(batch),
+                headers={'Content-Type': 'application/json; charset=utf-8'}
+            )
+
+            if result.get('errcode') == 0 or 'media_id' in result:
+                print(f"✓ 草稿创建成功！media_id: {result.get('media_id')}")
+                print(f"✓ 请登录微信公众号后台查看草稿箱")
+                return result.get('media_id') or True
+            else:
+                print(f"✗ 草稿创建失败: {result}")
+                if result.get('errcode') == INVALID_MEDIA_ERRCODE:
+                    # 某个封面素材已在服务器上被删除（接口不指明是哪一个），清除本批全部缓存条目
+                    self.media_cache.evict_media(self.wechat_appid, thumb_media_ids)
+                    self.stale_media_ids = set(thumb_media_ids)
+                return False
+
+        except Exception as e:
+            print(f"✗ 创建草稿异常: {e}")
+            return False
+
+    def _generate_content(self, snapshot, stats, as_of):
+        """生成主图文正文"""
+        content = getattr(self, self.report_generator)(snapshot, stats, as_of)
+        print(f"✓ {self.report_label}内容生成完成，共{len(content)}字符")
+        return content
+
+    def _generate_articles(self, snapshot, stats, as_of):
+        """生成草稿中的全部图文（流程阶段）：主图文在前，附加图文按配置顺序在后"""
+        date_str = date_label(as_of)
+        articles = [{'title': f"{date_str} {self.title}",
+                     'content': self._generate_content(snapshot, stats, as_of), 'digest': self.digest}]
+        for name in self.extra_articles:
+            spec = self.available_articles[name]
+            content = getattr(self, spec['generator'])(snapshot)
+            print(f"✓ 附加图文「{spec['title']}」生成完成，共{len(content)}字符")
+            articles.append({'title': f"{date_str} {spec['title']}", 'content': content,
+                             'digest': spec['digest']})
+        return articles
+
+    def _publish_draft(self, articles, covers, thumb_media_ids):
+        """创建草稿（流程阶段），返回草稿media_id；缓存的封面素材已被删除时重新上传并重试一次"""
+        draft_id = self.create_wechat_draft_batch(articles, thumb_media_ids)
+        if draft_id or not self.stale_media_ids.intersection(thumb_media_ids):
+            return draft_id
+        print("⚠ 缓存的封面素材已失效，重新上传封面...")
+        thumb_media_ids = self.upload_covers(covers)
+        return bool(thumb_media_ids) and self.create_wechat_draft_batch(articles, thumb_media_ids)
+
+    def render(self, as_of):
+        """
+        离线生成某天的全部图文和封面（不联网、不发布）：行情读取归档，历史统计只读本地日线
+
+        Returns:
+            [{'title', 'content', 'digest', 'theme', 'cover'}]，cover 为JPEG字节；
+            当天没有归档数据或归档数据不完整时返回None
+        """
+        try:
+            snapshot = self.load_market_data(as_of)
+        except MarketDataUnavailable as e:
+            print(f"⚠ {as_of:%Y-%m-%d} 归档行情不完整，跳过: {e}")
+            return None
+        if snapshot is None:
+            return None
+        articles = self._generate_articles(snapshot, self.fetch_history(as_of, update=False), as_of)
+        for article, theme in zip(articles, self.article_themes()):
+            article['theme'] = theme
+            article['cover'] = self.render_cover_data(date_label(as_of), theme)[0]
+        return articles
+
+    def run(self, fresh=False, as_of=None, live=None):
+        """
+        执行完整流程
+
+        Args:
+            fresh: 为True时忽略该日期的运行日志，从头重新发布（默认从上次失败的阶段继续）
+            as_of: 报告日期（date），默认今天；历史日期使用归档的行情
+            live: 是否联网采集行情，默认只有今天的报告联网采集（见 fetch_market_data）
+        """
+        print("="*60)
+        print(self.banner)
+        print("="*60)
+
+        as_of = as_of or date.today()
+        date_str = date_label(as_of)
+
+        # 获取token、生成封面、生成正文互不依赖，并行执行；上传依赖token和封面，草稿依赖全部结果
+        # 配置了多个公众号时，封面和正文只生成一次，token、上传和草稿分发到各公众号
+        fanout = AccountFanout.from_config(self)
+        # 正文、封面上传和草稿是检查点阶段：同一天重新运行时沿用已完成的结果（见 run_journal.py）
+        journal = RunJournal.for_run(self.name, day=as_of, appid=self.wechat_appid, api_base=self.api_base,
+                                     fresh=fresh)
+        pipeline = Pipeline(name=self.name, journal=journal)
+        http_mark = self.http.mark()
+        if fanout is None:
+            pipeline.add('token', self.get_wechat_access_token,
+                         label="【步骤1】获取微信公众号access_token...",
+                         failure_message="✗ 流程终止：无法获取access_token")
+        else:
+            pipeline.add('token', fanout.prefetch_tokens,
+                         label=f"【步骤1】获取{len(fanout)}个公众号的access_token...",
+                         failure_message="✗ 流程终止：所有公众号都无法获取access_token")
+        pipeline.add('cover', lambda: self.generate_covers(date_str),
+                     label="【步骤2】生成封面图片...",
+                     failure_message="✗ 流程终止：封面图片生成失败")
+        pipeline.add('data', lambda: self.fetch_market_data(as_of, live),
+                     label=f"【步骤4】获取行情数据并生成行情{self.report_label}内容...",
+                     failure_message="✗ 流程终止：行情数据获取失败，请稍后重新运行")
+        pipeline.add('history', lambda: self.fetch_history(as_of))
+        # 有品种缺数据的正文不写入运行日志：同一天重新运行时重新获取行情，而不是沿用这份不完整的正文
+        pipeline.add('report', lambda data, history: self._generate_articles(data, history, as_of),
+                     deps=('data', 'history'), checkpoint=lambda report, data, history: not data.missing)
+        if fanout is None:
+            pipeline.add('upload', lambda token, cover: self.upload_covers(cover),
+                         deps=('token', 'cover'), checkpoint=True,
+                         label="【步骤3】上传封面到微信公众号...",
+                         failure_message="✗ 流程终止：封面图片上传失败")
+            pipeline.add('draft', lambda token, cover, upload, report: self._publish_draft(report, cover, upload),
+                         deps=('token', 'cover', 'upload', 'report'), checkpoint=True,
+                         label="【步骤5】创建微信公众号草稿...")
+        else:
+            pipeline.add('publish', lambda token, cover, report: fanout.publish(report, cover, journal),
+                         deps=('token', 'cover', 'report'),
+                         label=f"【步骤3】上传封面并创建草稿（{len(fanout)}个公众号，"
+                               f"并发{fanout.max_workers}）...")
+        result = pipeline.run()
+        success = result.success and (fanout is None or fanout.success)
+
+        if fanout is not None:
+            print("\n各公众号发布结果：")
+            for line in fanout.summary_lines():
+                print(f"  {line}")
+
+        if success:
+            print("\n" + "="*60)
+            print("✓✓✓ 所有步骤完成！")
+            print("="*60)
+            print("请登录微信公众号后台 -> 素材管理 -> 草稿箱 查看")
+        else:
+            print("\n✗ 发布失败，请检查错误信息")
+
+        # 输出各阶段耗时、关键路径和接口耗时
+        print("\n阶段耗时：")
+        for line in result.timing_lines():
+            print(f"  {line}")
+        http_records = self.http.records_since(http_mark, pipeline=self.name)
+        latency = self.http.latency_summary(http_records)
+        if latency:
+            print("\n接口耗时：")
+            for line in latency:
+                print(f"  {line}")
+        appids = [self.wechat_appid] if fanout is None else [publisher.wechat_appid for publisher in fanout.publishers]
+        headroom = self.wechat.headroom_lines(appids)
+        if headroom:
+            print("\n接口额度：")
+            for line in headroom:
+                print(f"  {line}")
+        self.metrics.export(self.name, result, http_records)
+
+        return success
+
+
+def run_reports(names, config_path='config.json', fresh=False, as_of=None):
+    """
+    在同一进程内依次发布多种报告（共用连接池、token、字体、封面图层、历史库和行情）
+
+    Args:
+        as_of: 报告日期（date），默认今天
+
+    Returns:
+        {报告名称: 是否成功}
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        load_report_modules(json.load(f).get('report_modules', []))
+    publishers = [get_report_class(name)(config_path) for name in names]
+    return {publisher.name: publisher.run(fresh=fresh, as_of=as_of) for publisher in publishers}
+
+
+def main(publisher_class):
+    """单个报告模块的命令行入口：python <模块>.py [--fresh]"""
+    import sys
+
+    try:
+        publisher = publisher_class('config.json')
+        # --fresh：忽略今天的运行日志，从头重新发布
+        publisher.run(fresh='--fresh' in sys.argv[1:])
+    except FileNotFoundError:
+        print("✗ 错误：找不到配置文件 config.json")
+        print("请先填写配置文件中的微信公众号和阿里云API信息")
+    except Exception as e:
+        print(f"✗ 程序异常: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+板块/个股排行
+功能：把整份板块或个股快照转换为按列存放的排行表，用 heapq 部分选择（O(n log k)）
+取涨跌幅、主力净流入或综合得分的前k名和后k名，支持过滤条件和并列时的次级排序，
+不对全量数据排序；板块和个股数量增加时排行耗时基本不变。
+"""
+
+import heapq
+import math
+
+
+def positive(value):
+    return value > 0
+
+
+def negative(value):
+    return value < 0
+
+
+class RankTable:
+    """按列存放的排行表"""
+
+    def __init__(self, records, columns):
+        """
+        Args:
+            records: 行记录（Quote / Board 等），排行结果按原记录返回
+            columns: {列名: 与 records 等长的数值列表}，缺失值为None
+        """
+        self.records = list(records)
+        self.columns = dict(columns)
+        for name, values in self.columns.items():
+            if len(values) != len(self.records):
+                raise ValueError(f"列 {name} 的长度与记录数不一致")
+
+    @classmethod
+    def from_records(cls, records, columns=('change_pct', 'net_inflow')):
+        """从带属性的记录创建排行表（记录没有该属性时该列为None）"""
+        records = list(records)
+        return cls(records, {name: [getattr(record, name, None) for record in records]
+                             for name in columns})
+
+    def __len__(self):
+        return len(self.records)
+
+    def add_score(self, name, weights):
+        """
+        增加综合得分列：各列标准化（z-score）后按权重加权求和，任一列缺失时得分为None
+
+        Args:
+            name: 得分列名称
+            weights: {列名: 权重}
+        """
+        normalized = []
+        for column, weight in weights.items():
+            values = self.columns[column]
+            present = [value for value in values if value is not None]
+            mean = sum(present) / len(present) if present else 0.0
+            spread = math.sqrt(sum((value - mean) ** 2 for value in present) / len(present)) if present else 0.0
+            spread = spread or 1.0
+            normalized.append([None if value is None else weight * (value - mean) / spread for value in values])
+        self.columns[name] = [None if None in parts else sum(parts) for parts in zip(*normalized)]
+        return self
+
+    def _candidates(self, by, where):
+        """满足过滤条件且排序列不缺失的行号"""
+        where = dict(where or {})
+        # 排序列自身的条件在第一遍扫描中一并判断
+        own = where.pop(by, None)
+        if own is None:
+            indices = [index for index, value in enumerate(self.columns[by]) if value is not None]
+        else:
+            indices = [index for index, value in enumerate(self.columns[by]) if value is not None and own(value)]
+        for column, predicate in where.items():
+            values = self.columns[column]
+            indices = [index for index in indices if values[index] is not None and predicate(values[index])]
+        return indices
+
+    def _select(self, k, by, where, tie_break, largest):
+        values = self.columns[by]
+        if tie_break:
+            columns = [values] + [self.columns[column] for column in tie_break]
+            # 次级排序列缺失时排在并列行的最后
+            missing = -math.inf if largest else math.inf
+
+            def key(index):
+                return tuple(missing if column[index] is None else column[index] for column in columns)
+        else:
+            key = values.__getitem__
+
+        select = heapq.nlargest if largest else heapq.nsmallest
+        # heapq 在键相同时保持原顺序，与 sorted(...)[:k] 的结果一致
+        return [self.records[index] for index in select(k, self._candidates(by, where), key=key)]
+
+    def top(self, k, by, where=None, tie_break=()):
+        """
+        取排序列最大的前k行
+
+        Args:
+            k: 行数
+            by: 排序列
+            where: {列名: 条件函数}，全部满足的行才参与排行（如 {'change_pct': positive}）
+            tie_break: 排序列相同时依次比较的列（同样取大者在前）
+
+        Returns:
+            记录列表，按排序列从大到小
+        """
+        return self._select(k, by, where, tie_break, largest=True)
+
+    def bottom(self, k, by, where=None, tie_break=()):
+        """取排序列最小的前k行（按从小到大），参数同 top，次级排序列同样取小者在前"""
+        return self._select(k, by, where, tie_break, largest=False)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+报告模板
+功能：用章节、小节、列表、观点等积木声明报告版式，进程内只编译一次为
+"静态片段 + 字段"序列；渲染时按结构化数据（指数、板块、期货、要闻等）
+一次性顺序写入列表，再拼接为公众号正文HTML。早报、晚报及以后的报告类型共用。
+字段值按纯文字转义后写入（板块、个股名称来自外部接口），已经是HTML的片段用 Markup 标记后原样写入。
+"""
+
+from html import escape
+from string import Formatter
+
+
+SECTION_STYLE = "font-size:16px;font-weight:bold;color:#000;"
+SUBSECTION_STYLE = "font-size:14px;font-weight:bold;color:#34495e;margin-top:15px;"
+COMMENTARY_STYLE = "color:#666;line-height:1.8;"
+FOOTNOTE_STYLE = "color:#999;font-size:12px;margin-top:20px;"
+
+LINE_BREAK = "<br/>\n"
+EMPTY_TEXT = "暂无数据"
+
+FOOTER = (f'<p style="{FOOTNOTE_STYLE}"><em>数据来源：公开市场数据整理</em>{LINE_BREAK}'
+          '<em>风险提示：市场有风险，投资需谨慎</em></p>')
+
+
+class Markup(str):
+    """已经是HTML的字段值：渲染时原样写入，不转义"""
+
+
+def lines(field, prefix=""):
+    """列表段落：字段值为多行文字列表，空列表显示暂无数据"""
+    return f"<p>{prefix}{{{field}}}</p>"
+
+
+def commentary(field, title=None):
+    """观点段落：字段值为整段文字，可带加粗小标题"""
+    heading = f"<strong>{title}</strong>{LINE_BREAK}" if title else ""
+    return f'<p style="{COMMENTARY_STYLE}">{heading}{{{field}}}</p>'
+
+
+def section(title, body=None, first=False):
+    """
+    一级章节标题（标题中可用 {字段} 占位）
+
+    Args:
+        title: 章节标题
+        body: 紧跟标题的段落（lines/commentary 的返回值）
+        first: 是否为正文第一个章节（不加上边距）
+    """
+    style = SECTION_STYLE if first else SECTION_STYLE + "margin-top:20px;"
+    block = f'<p style="{style}">{title}</p>'
+    return f"{block}\n{body}" if body else block
+
+
+def subsection(title, body):
+    """二级小节：标题加段落"""
+    return f'<p style="{SUBSECTION_STYLE}">{title}</p>\n{body}'
+
+
+class ReportTemplate:
+    """编译后的报告模板"""
+
+    def __init__(self, name, blocks):
+        """
+        Args:
+            name: 模板名称
+            blocks: 版式积木列表（section/subsection/lines/commentary 的返回值或静态HTML）
+        """
+        self.name = name
+        source = "\n\n".join(list(blocks) + [FOOTER]) + "\n"
+        # 解析一次：[(静态片段, 字段名或None), ...]
+        self._parts = [(literal, field) for literal, field, _, _ in Formatter().parse(source)]
+        self.fields = {field for _, field in self._parts if field is not None}
+
+    def render_into(self, data, out):
+        """
+        把报告按顺序写入 out（list），不做任何解析
+
+        Args:
+            data: {字段名: 文字或多行文字列表}；文字按纯文字转义，Markup 原样写入
+            out: 输出列表
+        """
+        append = out.append
+        for literal, field in self._parts:
+            if literal:
+                append(literal)
+            if field is None:
+                continue
+            value = data[field]
+            if isinstance(value, Markup):
+                append(value)
+            elif isinstance(value, str):
+                append(escape(value))
+            elif value:
+                append(LINE_BREAK.join(line if isinstance(line, Markup) else escape(line) for line in value))
+            else:
+                append(EMPTY_TEXT)
+        return out
+
+    def render(self, data):
+        """渲染为完整HTML字符串"""
+        return "".join(self.render_into(data, []))
+
+
+_templates = {}
+
+
+def compile_template(name, blocks):
+    """编译并登记模板（同名模板只编译一次）"""
+    if name not in _templates:
+        _templates[name] = ReportTemplate(name, blocks)
+    return _templates[name]
+
+
+def get_template(name):
+    """返回已编译的模板"""
+    return _templates[name]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+发布运行日志（断点续跑）
+功能：每次发布按 报告+日期 写一份持久化日志，记录已完成阶段的输出（正文、封面 media_id、
+草稿 media_id、各公众号的完成情况）。同一天重新运行时从第一个未完成的阶段继续，
+已完成的草稿不会重复创建，封面素材也不会重复上传。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import date
+
+from local_store import cache_path, read_json, write_json
+
+
+# 日志保留天数
+KEEP_DAYS = 14
+
+
+class RunJournal:
+    """一次发布（报告+日期）的阶段输出日志"""
+
+    def __init__(self, path, fresh=False):
+        """
+        Args:
+            path: 日志文件路径
+            fresh: 为True时忽略已有日志，从头开始（会覆盖旧日志）
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        data = {} if fresh else read_json(path, {})
+        self.stages = data.get('stages', {})
+        self.accounts = data.get('accounts', {})
+        self.attempts = data.get('attempts', 0) + 1
+        self.resumed = bool(self.stages or self.accounts)
+
+    @classmethod
+    def for_run(cls, report, day=None, appid=None, api_base=None, directory=None, fresh=False):
+        """
+        打开某个报告某一天的日志
+
+        Args:
+            report: 报告名称（'evening' / 'morning'）
+            day: date，默认今天
+            appid: 发布的公众号AppID；不同公众号的日志互不沿用（封面 media_id、草稿只属于各自的公众号）
+            api_base: 微信接口地址，指向替身服务的运行不会沿用正式环境的日志
+            directory: 日志目录，默认为缓存目录下的 journal
+            fresh: 为True时从头开始
+        """
+        directory = directory or cache_path('journal')
+        day = day or date.today()
+        prune(directory)
+        name = report
+        if appid:
+            name += f"-{appid}"
+        if api_base:
+            name += "-" + hashlib.sha256(api_base.encode('utf-8')).hexdigest()[:8]
+        return cls(os.path.join(directory, f"{name}-{day:%Y%m%d}.json"), fresh)
+
+    def get(self, stage):
+        """返回 (是否已完成, 输出)"""
+        with self._lock:
+            if stage in self.stages:
+                return True, self.stages[stage]['value']
+            return False, None
+
+    def record(self, stage, value):
+        """记录阶段输出（值必须可以JSON序列化）并立即落盘"""
+        with self._lock:
+            self.stages[stage] = {'value': value, 'at': time.time()}
+            self._save()
+
+    def account_done(self, appid):
+        with self._lock:
+            return appid in self.accounts
+
+    def record_account(self, appid, value=True):
+        """记录某个公众号已发布完成"""
+        with self._lock:
+            self.accounts[appid] = {'value': value, 'at': time.time()}
+            self._save()
+
+    def _save(self):
+        try:
+            write_json(self.path, {'attempts': self.attempts, 'stages': self.stages,
+                                   'accounts': self.accounts})
+        except OSError as e:
+            # 日志写入失败不影响本次发布，只是下次无法续跑
+            print(f"⚠ 运行日志写入失败: {e}")
+
+
+def prune(directory, keep_days=KEEP_DAYS):
+    """删除过期的日志文件，返回删除的数量"""
+    cutoff = time.time() - keep_days * 86400
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
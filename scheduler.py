@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+常驻调度进程
+功能：在一个长期运行的进程内按 cron 表达式定时发布早报和晚报，HTTP连接池、字体、
+封面图层、报告模板和 access_token 在两次发布之间保持加载状态，触发时只做实际工作；
+进程停止或休眠期间错过的触发在重新运行后统一补发。可作为 systemd 服务运行（见 mip-scheduler.service）。
+
+用法: python scheduler.py [--config config.json] [--list]
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from local_store import cache_path, read_json, write_json
+
+
+# 默认发布时间（与原 Windows 定时任务一致）
+DEFAULT_JOBS = {
+    'morning': "0 7 * * *",
+    'evening': "30 15 * * *",
+}
+
+# 错过的触发在该时长（分钟）内补发，超过则跳过，等待下一次触发
+CATCHUP_MINUTES = 60
+
+# 在触发前提前多少秒预热（检查字体和图层缓存、刷新access_token）
+WARMUP_SECONDS = 120
+
+# 主循环最长休眠时间（秒），系统时间调整后最迟在此时间内重新计算
+MAX_SLEEP = 60
+
+_FIELDS = (
+    ('分钟', 0, 59),
+    ('小时', 0, 23),
+    ('日', 1, 31),
+    ('月', 1, 12),
+    ('星期', 0, 7),
+)
+
+
+def _parse_field(text, name, low, high):
+    """解析 cron 的一个字段，返回允许值的集合"""
+    values = set()
+    for part in text.split(','):
+        spec, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if spec == '*':
+            start, end = low, high
+        elif '-' in spec:
+            start, end = (int(value) for value in spec.split('-', 1))
+        else:
+            start = int(spec)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"cron {name}字段超出范围: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """5段 cron 表达式：分 时 日 月 星期（0和7都表示周日），按本地时间计算"""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式需要5个字段: {expression}")
+        try:
+            parsed = [_parse_field(text, *spec) for text, spec in zip(fields, _FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"无效的 cron 表达式 '{expression}': {e}") from None
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (sorted(values) for values in parsed)
+        self.weekdays = {day % 7 for day in weekdays}
+        # 与 cron 一致：日和星期都有限制时满足其一即可
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, day):
+        in_month = day.day in self.days
+        # datetime.weekday() 周一为0，cron 周日为0
+        in_week = (day.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """返回严格晚于 moment 的下一次触发时间"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = moment.replace(hour=0, minute=0)
+        # 最多向后查找8年（覆盖2月29日等最稀疏的表达式）
+        for _ in range(366 * 8):
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= moment:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"cron 表达式没有可触发的时间: {self.expression}")
+
+
+class Job:
+    """一个定时发布任务"""
+
+    def __init__(self, name, schedule, publisher, last_fire, now):
+        """
+        Args:
+            name: 任务名称（报告类型，见 publisher.py 的注册表）
+            schedule: CronSchedule
+            publisher: 发布器实例（常驻复用）
+            last_fire: 上一次触发的计划时间，None表示从现在开始计算
+            now: 当前时间
+        """
+        self.name = name
+        self.schedule = schedule
+        self.publisher = publisher
+        self.due = schedule.next_after(last_fire or now)
+        self.thread = None
+        self.warmed_for = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def latest_due(self, now):
+        """把计划时间推进到不晚于 now 的最后一次触发（多次错过的触发合并为一次）"""
+        due = self.due
+        following = self.schedule.next_after(due)
+        while following <= now:
+            due, following = following, self.schedule.next_after(following)
+        self.due = following
+        return due
+
+
+class Scheduler:
+    """按 cron 表达式运行发布任务的常驻调度器"""
+
+    def __init__(self, config_path='config.json', state_path=None):
+        self.config_path = config_path
+        self.state_path = state_path or cache_path('scheduler_state.json')
+        self.jobs = {}
+        self.catchup = timedelta(minutes=CATCHUP_MINUTES)
+        self.warmup = timedelta(seconds=WARMUP_SECONDS)
+        self._stop = threading.Event()
+        self._reload = threading.Event()
+
+    def load(self):
+        """读取配置并创建发布器（启动时和收到 SIGHUP 时调用）"""
+        # 发布程序导入 PIL 等较重的依赖，只在需要时导入
+        from publisher import get_report_class, load_report_modules
+
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        settings = config.get('scheduler', {})
+        load_report_modules(config.get('report_modules', []))
+        self.catchup = timedelta(minutes=settings.get('catchup_minutes', CATCHUP_MINUTES))
+        self.warmup = timedelta(seconds=settings.get('warmup_seconds', WARMUP_SECONDS))
+        expressions = settings.get('jobs', DEFAULT_JOBS)
+        classes = {name: get_report_class(name) for name in expressions}
+
+        state = read_json(self.state_path, {})
+        now = datetime.now()
+        jobs = {}
+        for name, expression in expressions.items():
+            publisher = classes[name](self.config_path)
+            last_fire = datetime.fromisoformat(state[name]) if name in state else None
+            job = Job(name, CronSchedule(expression), publisher, last_fire, now)
+            previous = self.jobs.get(name)
+            if previous is not None and previous.running:
+                job.thread = previous.thread
+            jobs[name] = job
+        self.jobs = jobs
+
+    def _save_state(self, job, fired):
+        state = read_json(self.state_path, {})
+        state[job.name] = fired.isoformat()
+        write_json(self.state_path, state)
+
+    def warm_up(self, job):
+        """加载字体、封面图层和日期字形，选定封面编码参数，并确保 access_token 在触发时仍然有效"""
+        from cover_cache import date_label
+        from cover_renderer import THEMES, get_base_layer, load_cover_fonts, warm_glyphs
+
+        title_font, date_font, font_key = load_cover_fonts()
+        for theme in THEMES:
+            get_base_layer(theme, title_font, font_key)
+        warm_glyphs(date_font)
+        job.publisher.prepare_cover_encoding(date_label(job.due.date()))
+        if job.publisher.config.get('accounts'):
+            from fanout import AccountFanout
+            AccountFanout.from_config(job.publisher).prefetch_tokens()
+        else:
+            job.publisher.get_wechat_access_token()
+
+    def _run_job(self, job, fired):
+        print(f"\n[{datetime.now():%Y-%m-%d %H:%M:%S}] 开始执行 {job.name}（计划时间 {fired:%H:%M}）")
+        try:
+            # 报告日期取计划触发的日期：跨过零点补发的仍是触发当天的报告，运行日志也按这一天续跑；
+            # 错过的任务当天没有归档行情，补发时照常联网采集
+            success = job.publisher.run(as_of=fired.date(), live=True)
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {job.name} {'完成' if success else '失败'}")
+        except Exception as e:
+            print(f"✗ 任务 {job.name} 异常: {e}")
+            traceback.print_exc()
+
+    def _warm_job(self, job):
+        try:
+            self.warm_up(job)
+        except Exception as e:
+            print(f"⚠ 任务 {job.name} 预热失败: {e}")
+
+    def tick(self, now):
+        """处理到期和即将到期的任务，返回到下一次需要处理的时间（秒）"""
+        for job in self.jobs.values():
+            if job.due <= now:
+                fired = job.latest_due(now)
+                if job.running:
+                    print(f"⚠ {job.name} 上一次发布仍在执行，跳过 {fired:%Y-%m-%d %H:%M} 的触发")
+                elif now - fired > self.catchup:
+                    print(f"⚠ {job.name} 错过了 {fired:%Y-%m-%d %H:%M} 的触发（超过补发时限），"
+                          f"下一次 {job.due:%Y-%m-%d %H:%M}")
+                else:
+                    job.thread = threading.Thread(target=self._run_job, args=(job, fired),
+                                                  name=f"job-{job.name}")
+                    job.thread.start()
+                self._save_state(job, fired)
+            elif job.due - now <= self.warmup and job.warmed_for != job.due and not job.running:
+                job.warmed_for = job.due
+                threading.Thread(target=self._warm_job, args=(job,), name=f"warmup-{job.name}",
+                                 daemon=True).start()
+
+        moments = []
+        for job in self.jobs.values():
+            moments.append(job.due)
+            if job.warmed_for != job.due:
+                moments.append(job.due - self.warmup)
+        wait = (min(moments) - now).total_seconds() if moments else MAX_SLEEP
+        return min(max(wait, 0.0), MAX_SLEEP)
+
+    def stop(self):
+        self._stop.set()
+
+    def reload(self):
+        self._reload.set()
+        self._stop.set()
+
+    def serve(self):
+        """运行调度循环，直到 stop() 被调用（SIGTERM / SIGINT）"""
+        self.load()
+        self._print_schedule()
+        while True:
+            while not self._stop.is_set():
+                self._stop.wait(self.tick(datetime.now()))
+            if not self._reload.is_set():
+                break
+            self._reload.clear()
+            self._stop.clear()
+            try:
+                self.load()
+                print("✓ 已重新加载配置")
+                self._print_schedule()
+            except Exception as e:
+                print(f"✗ 重新加载配置失败，继续使用原配置: {e}")
+
+        running = [job for job in self.jobs.values() if job.running]
+        if running:
+            print(f"等待 {', '.join(job.name for job in running)} 发布完成...")
+        for job in running:
+            job.thread.join()
+
+    def _print_schedule(self):
+        for job in self.jobs.values():
+            print(f"  {job.name}: {job.schedule.expression}，下一次 {job.due:%Y-%m-%d %H:%M}")
+
+
+def install_signal_handlers(scheduler):
+    """SIGTERM/SIGINT 停止（等待正在执行的发布完成），SIGHUP 重新加载配置"""
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: scheduler.stop())
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: scheduler.reload())
+
+
+def print_upcoming(config_path, count=5):
+    """列出各任务接下来的触发时间（不导入发布程序）"""
+    settings = (read_json(config_path, {}) or {}).get('scheduler', {})
+    for name, expression in settings.get('jobs', DEFAULT_JOBS).items():
+        schedule = CronSchedule(expression)
+        moment, upcoming = datetime.now(), []
+        for _ in range(count):
+            moment = schedule.next_after(moment)
+            upcoming.append(f"{moment:%Y-%m-%d %H:%M}")
+        print(f"{name}（{expression}）: {', '.join(upcoming)}")
+
+
+def serve_forever(config_path):
+    """启动调度器并运行到收到停止信号，返回退出码"""
+    print("=" * 60)
+    print(f"定时发布调度器启动（PID {os.getpid()}，{time.strftime('%Y-%m-%d %H:%M:%S')}）")
+    print("=" * 60)
+    scheduler = Scheduler(config_path)
+    install_signal_handlers(scheduler)
+    try:
+        scheduler.serve()
+    except FileNotFoundError:
+        print(f"✗ 错误：找不到配置文件 {config_path}")
+        return 1
+    print("调度器已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="常驻进程定时发布早报和晚报")
+    parser.add_argument('--config', default='config.json', help="配置文件路径")
+    parser.add_argument('--list', action='store_true', help="只列出各任务接下来的触发时间")
+    args = parser.parse_args()
+
+    if args.list:
+        print_upcoming(args.config)
+    else:
+        raise SystemExit(serve_forever(args.config))
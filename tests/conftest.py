@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共设置
+功能：把项目根目录加入导入路径（项目模块都在根目录下平铺），并把缓存目录指向临时目录，
+测试不会读写本机的 token、额度和历史库。
+"""
+
+import os
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """每个测试使用独立的缓存目录"""
+    monkeypatch.setenv('MIP_CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
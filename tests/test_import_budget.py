@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+启动导入耗时预算测试
+功能：对 benchmarks/import_budget.py 中的每个入口做同样的 -X importtime 测量，超出预算或导入了
+PIL/requests 时测试失败。较慢的机器上用环境变量 IMPORT_BUDGET_SCALE 放宽预算（如 2）。
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import import_budget  # noqa: E402
+
+
+SCALE = float(os.environ.get('IMPORT_BUDGET_SCALE', '1'))
+REPEAT = 3
+
+
+@pytest.fixture(scope='module')
+def baseline():
+    """解释器启动本身的顶层导入，不计入各入口的耗时"""
+    return {name for name, _, top in import_budget.import_profile(['-c', 'pass']) if top}
+
+
+@pytest.mark.parametrize('name, args, budget_ms, forbidden', import_budget.CASES,
+                         ids=[case[0] for case in import_budget.CASES])
+def test_import_budget(baseline, name, args, budget_ms, forbidden):
+    elapsed_ms, modules = import_budget.measure(args, baseline, REPEAT)
+    loaded = sorted(module for module in forbidden if module in modules)
+    assert not loaded, f"{name} 不应导入 {', '.join(loaded)}"
+    assert elapsed_ms <= budget_ms * SCALE, f"{name} 导入耗时 {elapsed_ms:.1f} ms，超出预算 {budget_ms * SCALE:.0f} ms"
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+行情采集测试
+功能：启动行情替身服务（market_data_stub，数据来自 fixtures/market_data 下的录制文件），
+检查东方财富/新浪行情和板块的解析结果、缺失品种与 require() 的完整性检查，以及各数据源的耗时预算。
+"""
+
+import time
+
+import pytest
+
+import market_data_stub
+from http_client import HttpClient
+from market_data import (EVENING_BOARDS, EVENING_INSTRUMENTS, MarketDataClient, MarketDataUnavailable,
+                         MarketSnapshot, Quote)
+
+
+@pytest.fixture(scope='module')
+def stub():
+    server, base_url = market_data_stub.start_stub_server()
+    yield base_url
+    server.shutdown()
+
+
+@pytest.fixture(scope='module')
+def slow_stub():
+    """每个响应延迟1秒的替身服务，用来触发耗时预算"""
+    server, base_url = market_data_stub.start_stub_server(latency=1.0)
+    yield base_url
+    server.shutdown()
+
+
+def make_client(eastmoney_base, sina_base, budgets=None):
+    # 不重试：超出预算的请求不在后台反复重放
+    return MarketDataClient(eastmoney_base=eastmoney_base, sina_base=sina_base, budgets=budgets,
+                            http=HttpClient(max_retries=0))
+
+
+def test_eastmoney_quotes(stub):
+    snapshot = make_client(stub, stub).fetch(['sh_index', 'dji'])
+    assert snapshot.missing == []
+    assert snapshot.get('sh_index') == Quote('sh_index', '上证指数', 4082.07, -1.26, amount=892000000000.0,
+                                             net_inflow=None, unit='点', decimals=2, source='eastmoney')
+    # 东方财富缺失值为 '-'
+    assert snapshot.get('dji').amount is None
+    assert snapshot.get('dji').price == 49451.98
+
+
+def test_sina_quotes(stub):
+    snapshot = make_client(stub, stub).fetch(['comex_gold', 'wti'])
+    gold = snapshot.get('comex_gold')
+    assert (gold.name, gold.price, gold.unit, gold.decimals, gold.source) == \
+        ('COMEX黄金', 4941.4, '美元/盎司', 1, 'sina')
+    # 涨跌幅相对昨结算
+    assert gold.change_pct == round((4941.4 - 5098.41) / 5098.41 * 100, 2)
+    assert snapshot.get('wti').price == 62.84
+
+
+def test_boards_sorted_by_change(stub):
+    snapshot = make_client(stub, stub).fetch([], ['industry'])
+    boards = snapshot.boards['industry']
+    assert len(boards) == 30
+    assert all(isinstance(board, Quote) and board.source == 'eastmoney' for board in boards)
+    changes = [board.change_pct for board in boards]
+    assert changes == sorted(changes, reverse=True)
+
+
+def test_evening_snapshot_complete(stub):
+    snapshot = make_client(stub, stub).fetch(EVENING_INSTRUMENTS, EVENING_BOARDS)
+    assert snapshot.missing == []
+    assert set(snapshot.quotes) == set(EVENING_INSTRUMENTS)
+    assert set(snapshot.timings) == {'eastmoney', 'sina'}
+    assert snapshot.require() is snapshot
+
+
+def test_sina_budget_exceeded(stub, slow_stub):
+    client = make_client(stub, slow_stub, budgets={'eastmoney': 3.0, 'sina': 0.2})
+    start = time.perf_counter()
+    snapshot = client.fetch(EVENING_INSTRUMENTS, EVENING_BOARDS)
+    elapsed = time.perf_counter() - start
+    # 不等慢数据源的响应，超出预算的品种记入 missing
+    assert elapsed < 0.8
+    assert snapshot.missing == ['comex_gold', 'wti']
+    assert snapshot.timings['sina'] == 0.2
+    assert 'sh_index' in snapshot.quotes and 'industry' in snapshot.boards
+    # 2/15 缺失：默认只拒绝全部缺失，max_missing 可以收紧
+    assert snapshot.require() is snapshot
+    assert snapshot.require(max_missing=0.2) is snapshot
+    with pytest.raises(MarketDataUnavailable):
+        snapshot.require(max_missing=0.1)
+
+
+def test_all_sources_unavailable(slow_stub):
+    client = make_client(slow_stub, slow_stub, budgets={'eastmoney': 0.2, 'sina': 0.2})
+    start = time.perf_counter()
+    snapshot = client.fetch(EVENING_INSTRUMENTS, EVENING_BOARDS)
+    assert time.perf_counter() - start < 0.8
+    assert snapshot.quotes == {} and snapshot.boards == {}
+    assert snapshot.missing == EVENING_INSTRUMENTS + EVENING_BOARDS
+    with pytest.raises(MarketDataUnavailable, match='15/15'):
+        snapshot.require()
+
+
+def test_require_empty_snapshot():
+    # 没有要求任何品种时不算缺失
+    snapshot = MarketSnapshot({}, {}, [], {}, None)
+    assert snapshot.require(max_missing=0) is snapshot
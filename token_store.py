@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+微信公众号 access_token 共享存储
+功能：把 access_token 及其过期时间持久化到缓存目录，早报、晚报等多个进程共用；
+在过期前提前刷新，刷新时持有文件锁，保证同一公众号同一时刻只有一个刷新请求。
+
+微信 access_token 有效期7200秒，重新获取会使旧token失效，且接口有每日调用次数限制。
+"""
+
+import os
+import threading
+import time
+
+from http_client import WECHAT_API_BASE, get_client
+from local_store import FileLock, cache_path, read_json, write_json
+
+
+# 距离过期不足该秒数时提前刷新（微信新旧token有5分钟共存期）
+REFRESH_MARGIN = 300
+
+
+def fetch_access_token(appid, secret, api_base=WECHAT_API_BASE):
+    """调用 /cgi-bin/token 获取新的 access_token，返回接口响应字典"""
+    params = {'grant_type': 'client_credential', 'appid': appid, 'secret': secret}
+    response = get_client().get(f"{api_base}/cgi-bin/token", params=params, timeout=(5, 10))
+    return response.json()
+
+
+class TokenStore:
+    """按 appid 持久化 access_token 的存储"""
+
+    def __init__(self, directory=None, refresh_margin=REFRESH_MARGIN, fetch=fetch_access_token):
+        """
+        Args:
+            directory: token文件目录，默认为缓存目录下的 tokens/
+            refresh_margin: 提前刷新的秒数
+            fetch: 获取新token的函数，签名为 (appid, secret, api_base) -> 接口响应字典
+        """
+        self.directory = directory or cache_path('tokens')
+        self.refresh_margin = refresh_margin
+        self.fetch = fetch
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _paths(self, appid):
+        base = os.path.join(self.directory, appid)
+        return base + '.json', base + '.lock'
+
+    def _thread_lock(self, appid):
+        with self._locks_guard:
+            return self._locks.setdefault(appid, threading.Lock())
+
+    def _valid(self, record):
+        return bool(record and record.get('access_token')
+                    and record.get('expires_at', 0) - self.refresh_margin > time.time())
+
+    def peek(self, appid):
+        """返回当前缓存的token记录（不刷新），无有效记录时返回None"""
+        record = read_json(self._paths(appid)[0])
+        return record if self._valid(record) else None
+
+    def get_token(self, appid, secret, stale_token=None, api_base=WECHAT_API_BASE, limiter=None):
+        """
+        获取有效的 access_token
+
+        Args:
+            appid: 公众号AppID
+            secret: 公众号AppSecret
+            stale_token: 调用方确认已失效的token；仅当缓存中仍是该token时才强制刷新，
+                避免多个调用方同时发现失效后重复刷新
+            api_base: 微信接口地址（可指向本地替身服务）
+            limiter: 真正请求 /cgi-bin/token 前调用的排队函数，签名为 (appid, 接口路径)，
+                额度不足时抛出异常（见 wechat_api.WeChatApi.get_token）
+
+        Returns:
+            (access_token, expires_at)，失败时返回 (None, None)
+        """
+        token_path, lock_path = self._paths(appid)
+
+        record = read_json(token_path)
+        if self._valid(record) and record['access_token'] != stale_token:
+            return record['access_token'], record['expires_at']
+
+        with self._thread_lock(appid), FileLock(lock_path):
+            # 等锁期间其他进程可能已经完成刷新
+            record = read_json(token_path)
+            if self._valid(record) and record['access_token'] != stale_token:
+                return record['access_token'], record['expires_at']
+
+            if limiter is not None:
+                limiter(appid, '/cgi-bin/token')
+            result = self.fetch(appid, secret, api_base)
+            if 'access_token' not in result:
+                print(f"✗ 获取access_token失败: {result}")
+                return None, None
+
+            record = {
+                'access_token': result['access_token'],
+                'expires_at': time.time() + int(result.get('expires_in', 7200)),
+                'fetched_at': time.time(),
+            }
+            write_json(token_path, record)
+            return record['access_token'], record['expires_at']
+
+    def invalidate(self, appid):
+        """删除缓存的token（例如更换了AppSecret）"""
+        token_path, lock_path = self._paths(appid)
+        with self._thread_lock(appid), FileLock(lock_path):
+            if os.path.exists(token_path):
+                os.remove(token_path)
+
+
+_store = None
+_store_guard = threading.Lock()
+
+
+def get_token_store():
+    """返回进程内共享的 TokenStore"""
+    global _store
+    with _store_guard:
+        if _store is None:
+            _store = TokenStore()
+        return _store
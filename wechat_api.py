@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+微信接口调度
+功能：需要 access_token 的微信接口统一经过这里调用。每个 公众号+接口 按自然日计数，
+达到该接口的每日调用额度后不再请求，零点重置（计数落盘到缓存目录，早报、晚报等多个进程共用），
+可再叠加一个每秒速率的令牌桶平滑突发；令牌不足时排队等待，而不是发出注定失败的请求。
+接口返回频率限制（45009/45011）时退避后重放，返回 token 失效或过期（40001/40014/42001）时
+刷新一次 token 并透明重放；运行结束时输出各接口今天的调用次数和额度余量。
+"""
+
+import os
+import random
+import threading
+import time
+from datetime import date
+
+from http_client import WECHAT_API_BASE, get_client
+from local_store import FileLock, cache_path, read_json, write_json
+from token_store import get_token_store
+
+
+# token 失效、不合法或过期：刷新一次后重放
+TOKEN_ERRCODES = (40001, 40014, 42001)
+# 调用频率或额度受限：退避后重放
+RATE_LIMIT_ERRCODES = (45009, 45011)
+
+# 各接口的默认额度：daily 为每日调用上限，per_second 为平滑突发的每秒速率（None 表示不限）。
+# 获取access_token 的 2000次/天 出自微信公众平台文档《接口调用频次限制说明》；永久素材、图文内图片和草稿、
+# 发布接口不在该表中，额度随账号类型不同，以公众号后台「设置与开发 - 接口权限」中显示的为准，
+# 这里取 1000次/天 作为保守的缺省值。可在 config.json 的 wechat.quotas 中按接口覆盖，某个接口设为 null 表示不限速
+DEFAULT_QUOTAS = {
+    '/cgi-bin/token': {'daily': 2000, 'per_second': None},
+    '/cgi-bin/material/add_material': {'daily': 1000, 'per_second': None},
+    '/cgi-bin/media/uploadimg': {'daily': 1000, 'per_second': None},
+    '/cgi-bin/draft/add': {'daily': 1000, 'per_second': None},
+    '/cgi-bin/freepublish/submit': {'daily': 1000, 'per_second': None},
+}
+
+# 令牌不足时最长排队的秒数，超出时不再等待
+MAX_WAIT = 60.0
+
+# 频率限制的最大重放次数和退避时间（秒），第n次退避最长 BACKOFF_BASE * 2**(n-1)
+RATE_LIMIT_RETRIES = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class QuotaExceeded(RuntimeError):
+    """接口额度不足，需要排队的时间超过上限"""
+
+
+class TokenBucket:
+    """进程内令牌桶（线程安全），按预约方式排队：令牌可以透支，透支部分换算为等待时间"""
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: 每秒回填的令牌数
+            capacity: 桶容量（允许的突发请求数），默认为1秒的令牌数
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        预约一个令牌
+
+        Returns:
+            发出请求前需要等待的秒数；超过 max_wait 时不预约，返回None
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def cancel(self):
+        """归还一个已预约但没有使用的令牌"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class WeChatApi:
+    """按接口额度排队、自动刷新token的微信接口调用器（线程安全）"""
+
+    def __init__(self, quotas=None, max_wait=MAX_WAIT, rate_limit_retries=RATE_LIMIT_RETRIES,
+                 backoff_base=BACKOFF_BASE, http=None, token_store=None, directory=None):
+        """
+        Args:
+            quotas: {接口路径: {'daily', 'per_second'} 或 None}，与 DEFAULT_QUOTAS 合并
+            max_wait: 令牌不足时最长排队的秒数
+            rate_limit_retries: 频率限制的最大重放次数
+            backoff_base: 频率限制退避的基数（秒）
+            http: HttpClient，缺省使用共享客户端
+            token_store: TokenStore，缺省使用共享存储
+            directory: 每日额度余量的存储目录，默认为缓存目录下的 wechat_quota
+        """
+        self.quotas = dict(DEFAULT_QUOTAS)
+        self.quotas.update(quotas or {})
+        self.max_wait = max_wait
+        self.rate_limit_retries = rate_limit_retries
+        self.backoff_base = backoff_base
+        self.http = http or get_client()
+        self.token_store = token_store or get_token_store()
+        self.directory = directory or cache_path('wechat_quota')
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._buckets = {}     # (appid, 接口) -> 每秒速率的 TokenBucket
+        self._cooldowns = {}   # (appid, 接口) -> 频率受限后恢复请求的时间
+        self._stats = {}       # (appid, 接口) -> 本进程内的调用统计
+
+    @classmethod
+    def from_config(cls, config):
+        """从 config.json 的 wechat 段读取 quotas / max_wait / rate_limit_retries / backoff（均可省略）"""
+        wechat = config.get('wechat', {})
+        return cls(quotas=wechat.get('quotas'),
+                   max_wait=wechat.get('max_wait', MAX_WAIT),
+                   rate_limit_retries=wechat.get('rate_limit_retries', RATE_LIMIT_RETRIES),
+                   backoff_base=wechat.get('backoff', BACKOFF_BASE))
+
+    # ------------------------------------------------------------ 额度
+
+    def _paths(self, appid):
+        base = os.path.join(self.directory, appid)
+        return base + '.json', base + '.lock'
+
+    def _appid_lock(self, appid):
+        with self._lock:
+            return self._locks.setdefault(appid, threading.Lock())
+
+    def _stat(self, appid, path):
+        with self._lock:
+            return self._stats.setdefault((appid, path), {'calls': 0, 'waited': 0.0, 'limited': 0, 'refreshed': 0})
+
+    @staticmethod
+    def _used_today(entry, today):
+        """今天已调用的次数：计数记录的不是今天时额度已经重置"""
+        return entry.get('used', 0) if entry and entry.get('day') == today else 0
+
+    def _reserve_daily(self, appid, path, daily):
+        """在落盘的每日计数中占用一次调用"""
+        data_path, lock_path = self._paths(appid)
+        today = date.today().isoformat()
+        with self._appid_lock(appid), FileLock(lock_path):
+            state = read_json(data_path, {}) or {}
+            used = self._used_today(state.get(path), today)
+            if used >= daily:
+                raise QuotaExceeded(f"{path} 今日额度已用完（上限{daily}次），零点后重置")
+            state[path] = {'day': today, 'used': used + 1}
+            write_json(data_path, state)
+
+    def _acquire(self, appid, path):
+        """排队直到可以发出请求，返回等待的秒数"""
+        quota = self.quotas.get(path)
+        waits = [0.0]
+        bucket = None
+        # 先在进程内的每秒令牌桶排队，通过后再占用落盘的每日额度：排队超时的调用不消耗当天额度
+        if quota and quota.get('per_second'):
+            with self._lock:
+                bucket = self._buckets.get((appid, path))
+                if bucket is None:
+                    bucket = self._buckets[(appid, path)] = TokenBucket(quota['per_second'])
+            wait = bucket.reserve(self.max_wait)
+            if wait is None:
+                raise QuotaExceeded(f"{path} 排队请求过多（每秒{quota['per_second']}次）")
+            waits.append(wait)
+        if quota and quota.get('daily'):
+            try:
+                self._reserve_daily(appid, path, quota['daily'])
+            except QuotaExceeded:
+                if bucket is not None:
+                    bucket.cancel()
+                raise
+        with self._lock:
+            waits.append(self._cooldowns.get((appid, path), 0.0) - time.monotonic())
+        wait = max(waits)
+        if wait > 0:
+            time.sleep(wait)
+        return max(0.0, wait)
+
+    def _acquire_token(self, appid, path):
+        """共享存储真正请求新token前排队，并计入本调用器的统计"""
+        waited = self._acquire(appid, path)
+        stat = self._stat(appid, path)
+        with self._lock:
+            stat['calls'] += 1
+            stat['waited'] += waited
+
+    def _backoff(self, attempt):
+        """频率受限后的退避时间：[一半, 全部] 上限内随机，避免并发调用方同时重放"""
+        limit = min(BACKOFF_MAX, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(limit / 2, limit)
+
+    # ------------------------------------------------------------ 调用
+
+    def get_token(self, appid, secret, stale_token=None, api_base=WECHAT_API_BASE):
+        """
+        从共享存储获取 access_token（参数和返回值见 TokenStore.get_token）；
+        需要请求新token时按本调用器的 /cgi-bin/token 额度排队
+
+        Raises:
+            QuotaExceeded: 获取token的额度不足
+        """
+        return self.token_store.get_token(appid, secret, stale_token=stale_token, api_base=api_base,
+                                          limiter=self._acquire_token)
+
+    def call(self, client, method, path, params=None, **kwargs):
+        """
+        调用需要 access_token 的微信接口
+
+        Args:
+            client: 持有 wechat_appid / wechat_secret / api_base / access_token 的对象（发布器），
+                刷新token后写回它的 access_token 和 token_expires_at
+            method: HTTP方法
+            path: 接口路径，如 /cgi-bin/draft/add
+            params: access_token 以外的查询参数
+            **kwargs: 透传给 HttpClient.request（data / files / headers 等）
+
+        Returns:
+            接口响应字典；重放次数用尽或token刷新失败时为最后一次的响应
+
+        Raises:
+            QuotaExceeded: 额度不足，排队时间超过 max_wait
+        """
+        appid = client.wechat_appid
+        stat = self._stat(appid, path)
+        refreshed = False
+        limited = 0
+        while True:
+            waited = self._acquire(appid, path)
+            response = self.http.request(method, f"{client.api_base}{path}",
+                                         params=dict(params or {}, access_token=client.access_token), **kwargs)
+            result = response.json()
+            errcode = result.get('errcode')
+            with self._lock:
+                stat['calls'] += 1
+                stat['waited'] += waited
+
+            if errcode in TOKEN_ERRCODES and not refreshed:
+                # 只刷新一次：共享存储中仍是这个token时才真正请求新token，其他调用方已刷新时直接复用
+                refreshed = True
+                print(f"⚠ access_token已失效（errcode {errcode}），刷新后重试...")
+                token, expires_at = self.get_token(appid, client.wechat_secret,
+                                                   stale_token=client.access_token, api_base=client.api_base)
+                if token:
+                    with self._lock:
+                        stat['refreshed'] += 1
+                    client.access_token, client.token_expires_at = token, expires_at
+                    continue
+            elif errcode in RATE_LIMIT_ERRCODES and limited < self.rate_limit_retries:
+                # 同一公众号的同一接口在退避期间全部排队，不再继续触发限制
+                limited += 1
+                delay = self._backoff(limited)
+                with self._lock:
+                    stat['limited'] += 1
+                    key = (appid, path)
+                    self._cooldowns[key] = max(self._cooldowns.get(key, 0.0), time.monotonic() + delay)
+                print(f"⚠ 接口调用受限（errcode {errcode}），{delay:.1f}秒后重试...")
+                continue
+            return result
+
+    def headroom(self, appid):
+        """
+        某个公众号各接口的额度余量
+
+        Returns:
+            [{'path', 'daily', 'used', 'remaining', 'calls', 'waited', 'limited', 'refreshed'}]，
+            只包含今天调用过或本进程内调用过的接口
+        """
+        state = read_json(self._paths(appid)[0], {}) or {}
+        today = date.today().isoformat()
+        with self._lock:
+            stats = {path: dict(stat) for (stat_appid, path), stat in self._stats.items() if stat_appid == appid}
+        rows = []
+        for path in dict.fromkeys(list(state) + list(stats)):
+            quota = self.quotas.get(path) or {}
+            used = self._used_today(state.get(path), today)
+            daily = quota.get('daily')
+            remaining = daily - used if daily else daily
+            stat = stats.get(path, {'calls': 0, 'waited': 0.0, 'limited': 0, 'refreshed': 0})
+            if not used and not stat['calls']:
+                continue
+            rows.append(dict(stat, path=path, daily=daily, used=used, remaining=remaining))
+        return rows
+
+    def headroom_lines(self, appids):
+        """额度余量的摘要行"""
+        lines = []
+        for appid in dict.fromkeys(appids):
+            for row in self.headroom(appid):
+                quota = (f"今日已用{row['used']}次，剩余约{max(0, row['remaining'])}次（上限{row['daily']}）"
+                         if row['daily'] else "不限额度")
+                extra = [f"排队{row['waited']:.1f}秒" if row['waited'] >= 0.05 else "",
+                         f"限流重试{row['limited']}次" if row['limited'] else "",
+                         f"刷新token{row['refreshed']}次" if row['refreshed'] else ""]
+                extra = "，".join(part for part in extra if part)
+                lines.append(f"{appid} {row['path']}：{quota}" + (f"；{extra}" if extra else ""))
+        return lines
+
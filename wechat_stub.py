@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+微信公众号接口本地替身服务
+功能：模拟 access_token、永久素材上传、图文图片上传、素材列表、草稿和发布接口，
+并可注入延迟分布、频率限制（45009）、token失效（40001/42001）和连接中断，
+用于离线运行发布流程、压测发布链路的吞吐和尾延迟、基准测试和调试。
+
+用法: python wechat_stub.py [--port 18081] [--latency lognormal:0.05:0.5] [--rate-limit 0.05]
+      [--invalid-token 0.01] [--drop 0.01] [--token-ttl 7200] [--seed 1]
+然后在 config.json 的 wechat.api_base 中填写替身服务地址。
+"""
+
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+TOKEN_PATH = '/cgi-bin/token'
+
+ERRORS = {
+    40001: "invalid credential, access_token is invalid or not latest",
+    42001: "access_token expired",
+    45009: "reach max api daily quota limit",
+}
+
+
+def parse_latency(spec):
+    """
+    解析延迟分布
+
+    Args:
+        spec: 秒数（固定延迟），或 "uniform:最小:最大"、"lognormal:中位数:sigma" 形式的字符串，
+            或接收 random.Random 返回秒数的函数
+
+    Returns:
+        接收 random.Random 返回秒数的函数
+    """
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    kind, *params = str(spec).split(':')
+    if not params:
+        return lambda rng: float(kind)
+    params = [float(value) for value in params]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == 'lognormal':
+        median, sigma = params
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+class FaultConfig:
+    """故障注入配置（概率均为 0~1）"""
+
+    def __init__(self, latency=0.0, rate_limit=0.0, invalid_token=0.0, drop=0.0,
+                 token_ttl=7200, seed=None):
+        """
+        Args:
+            latency: 响应延迟分布（见 parse_latency）
+            rate_limit: 返回 45009 频率限制的概率
+            invalid_token: 吊销请求所带token并返回 40001 的概率
+            drop: 不返回响应直接断开连接的概率
+            token_ttl: 签发的token有效秒数，过期后返回 42001
+            seed: 随机数种子，便于复现
+        """
+        self.latency = parse_latency(latency)
+        self.rate_limit = rate_limit
+        self.invalid_token = invalid_token
+        self.drop = drop
+        self.token_ttl = token_ttl
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def roll(self, probability):
+        with self._rng_lock:
+            return probability > 0 and self.rng.random() < probability
+
+    def delay(self):
+        with self._rng_lock:
+            return max(0.0, self.latency(self.rng))
+
+
+class WeChatStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drop(self):
+        """模拟连接中断：不返回任何响应直接关闭连接"""
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _check_token(self, token):
+        """校验access_token，返回错误码或None"""
+        server = self.server
+        with server.lock:
+            issued_at = server.tokens.get(token)
+            if issued_at is None:
+                return 40001
+            if time.time() - issued_at > server.faults.token_ttl:
+                return 42001
+            if server.faults.roll(server.faults.invalid_token):
+                del server.tokens[token]
+                return 40001
+        return None
+
+    def _handle(self, path, body):
+        server = self.server
+        if path == TOKEN_PATH:
+            token = uuid.uuid4().hex * 2
+            with server.lock:
+                server.tokens[token] = time.time()
+            return {'access_token': token, 'expires_in': server.faults.token_ttl}
+        if path == '/cgi-bin/material/add_material':
+            media_id = uuid.uuid4().hex
+            with server.lock:
+                server.materials.append(media_id)
+            return {'media_id': media_id, 'url': f"http://mmbiz.qpic.cn/stub/{media_id}/0"}
+        if path == '/cgi-bin/media/uploadimg':
+            return {'url': f"http://mmbiz.qpic.cn/stub/{uuid.uuid4().hex}/0"}
+        if path == '/cgi-bin/material/batchget_material':
+            request = json.loads(body or b'{}')
+            offset, count = request.get('offset', 0), request.get('count', 20)
+            with server.lock:
+                items = [{'media_id': media_id} for media_id in server.materials[offset:offset + count]]
+                total = len(server.materials)
+            return {'item': items, 'total_count': total, 'item_count': len(items)}
+        if path == '/cgi-bin/draft/add':
+            media_id = uuid.uuid4().hex
+            with server.lock:
+                server.drafts.append(media_id)
+            return {'media_id': media_id}
+        if path == '/cgi-bin/freepublish/submit':
+            media_id = json.loads(body or b'{}').get('media_id')
+            with server.lock:
+                if media_id not in server.drafts:
+                    return {'errcode': 40007, 'errmsg': "invalid media_id"}
+                publish_id = str(len(server.publishes) + 1)
+                server.publishes[publish_id] = media_id
+            return {'errcode': 0, 'errmsg': "ok", 'publish_id': publish_id}
+        if path == '/cgi-bin/freepublish/get':
+            publish_id = str(json.loads(body or b'{}').get('publish_id'))
+            with server.lock:
+                found = publish_id in server.publishes
+            if not found:
+                return {'errcode': 40007, 'errmsg': "invalid publish_id"}
+            return {'publish_id': publish_id, 'publish_status': 0,
+                    'article_id': f"stub_article_{publish_id}"}
+        return None
+
+    def _dispatch(self, body=b''):
+        server = self.server
+        parts = urlsplit(self.path)
+        path = parts.path
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+
+        with server.lock:
+            server.calls[path] = server.calls.get(path, 0) + 1
+        time.sleep(server.faults.delay())
+
+        if server.faults.roll(server.faults.drop):
+            server.record_fault('drop')
+            return self._drop()
+        if server.faults.roll(server.faults.rate_limit):
+            server.record_fault(45009)
+            return self._send_json({'errcode': 45009, 'errmsg': ERRORS[45009]})
+        if path != TOKEN_PATH:
+            errcode = self._check_token(query.get('access_token'))
+            if errcode:
+                server.record_fault(errcode)
+                return self._send_json({'errcode': errcode, 'errmsg': ERRORS[errcode]})
+
+        result = self._handle(path, body)
+        if result is None:
+            self.send_error(404)
+        else:
+            self._send_json(result)
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self._dispatch(self.rfile.read(length))
+
+
+class WeChatStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, faults):
+        super().__init__(address, WeChatStubHandler)
+        self.faults = faults
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.fault_counts = {}
+        self.tokens = {}
+        self.materials = []
+        self.drafts = []
+        self.publishes = {}
+
+    def record_fault(self, kind):
+        with self.lock:
+            self.fault_counts[kind] = self.fault_counts.get(kind, 0) + 1
+
+    def invalidate_tokens(self):
+        """吊销已签发的全部token（模拟在其他地方重新获取了token）"""
+        with self.lock:
+            self.tokens.clear()
+
+
+def start_stub_server(port=0, latency=0.0, **faults):
+    """
+    在后台线程启动替身服务
+
+    Args:
+        port: 监听端口（0表示随机端口）
+        latency: 响应延迟分布（见 parse_latency）
+        faults: 其余故障注入参数（见 FaultConfig）
+
+    Returns:
+        (server, base_url)。server.calls / server.fault_counts 记录各接口调用次数和注入的故障，
+        用 server.shutdown() 停止
+    """
+    server = WeChatStubServer(('127.0.0.1', port), FaultConfig(latency=latency, **faults))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="微信公众号接口本地替身服务")
+    parser.add_argument('--port', type=int, default=18081)
+    parser.add_argument('--latency', default='0', help="延迟分布：秒数 / uniform:最小:最大 / lognormal:中位数:sigma")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="45009 频率限制概率")
+    parser.add_argument('--invalid-token', type=float, default=0.0, help="40001 token吊销概率")
+    parser.add_argument('--drop', type=float, default=0.0, help="连接中断概率")
+    parser.add_argument('--token-ttl', type=int, default=7200, help="token有效秒数（过期返回42001）")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, rate_limit=args.rate_limit,
+                                         invalid_token=args.invalid_token, drop=args.drop,
+                                         token_ttl=args.token_ttl, seed=args.seed)
+    print(f"✓ 微信接口替身服务已启动: {base_url}")
+    print("  在 config.json 中配置 wechat.api_base 指向该地址")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"调用次数: {server.calls}")
+        print(f"注入故障: {server.fault_counts}")